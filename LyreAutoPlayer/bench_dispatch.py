@@ -0,0 +1,136 @@
+"""
+调度延迟基准：进程内调度 vs 独立调度进程
+在 UI 线程模拟重绘负载，比较两种模式下输出调度器的迟到、丢弃与首音延迟 (含子进程启动)。
+使用 debug 输入后端，不会向任何窗口发送按键。
+
+负载类型:
+    python  纯 Python 忙循环：解释器每 5ms (sys.getswitchinterval) 让出一次 GIL
+    gil     一次长 C 调用 (大列表排序)，期间一直持有 GIL，进程内调度线程只能等待
+
+用法:
+    python bench_dispatch.py [--notes 400] [--interval 0.02] [--load 0.004] [--load-kind gil] [--runs 3]
+    python bench_dispatch.py --load-kind gil --load 0.03 --check   # 独立进程没有明显改善时返回 1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QCoreApplication, QTimer
+
+from player import PlayerConfig
+from player.midi_parser import NoteEvent
+
+IMPROVEMENT_RATIO = 0.8  # --check: 独立进程的最大迟到须低于进程内的 80% 且不多丢事件
+
+
+def make_events(count: int, interval: float):
+    """等间隔音阶，时值为间隔的一半"""
+    scale = [60, 62, 64, 65, 67, 69, 71, 72]
+    return [
+        NoteEvent(time=i * interval, note=scale[i % len(scale)], duration=interval / 2)
+        for i in range(count)
+    ]
+
+
+def ui_load(stop: threading.Event, burst_s: float, kind: str):
+    """模拟 UI 负载：每 16ms 帧内忙算 burst_s 秒"""
+    if kind == "gil":
+        # 校准：排序多长的列表约耗时 burst_s
+        size = 100_000
+        data = list(range(size, 0, -1))
+        t0 = time.perf_counter()
+        sorted(data, reverse=True)
+        size = max(1000, int(size * burst_s / max(1e-6, time.perf_counter() - t0)))
+        data = [(i * 7919) % size for i in range(size)]
+    while not stop.is_set():
+        if kind == "gil":
+            sorted(data)  # 单次 C 调用，不释放 GIL
+        else:
+            end = time.perf_counter() + burst_s
+            x = 0
+            while time.perf_counter() < end:
+                x += 1
+        time.sleep(0.016)
+
+
+def run_once(app, events, dispatch_process: bool, burst_s: float, kind: str) -> dict:
+    from player.thread import PlayerThread
+
+    cfg = PlayerConfig(
+        countdown_sec=0,
+        input_backend="debug",
+        dispatch_process=dispatch_process,
+        bar_duration_override=2.0,
+    )
+    thread = PlayerThread(events, cfg)
+    thread.finished.connect(app.quit)
+
+    stop = threading.Event()
+    loader = threading.Thread(target=ui_load, args=(stop, burst_s, kind), daemon=True)
+    loader.start()
+    thread.start()
+    QTimer.singleShot(600_000, app.quit)  # 兜底
+    app.exec()
+    thread.wait()
+    stop.set()
+    loader.join()
+    stats = dict(thread.scheduler_stats)
+    stats["first_note_ms"] = thread.time_to_first_note_ms or 0.0
+    return stats
+
+
+def summarize(runs: list) -> dict:
+    return {
+        "avg_late_ms": sum(r.get("avg_late_ms", 0.0) for r in runs) / len(runs),
+        "max_late_ms": max(r.get("max_late_ms", 0.0) for r in runs),
+        "events_dropped": sum(r.get("events_dropped", 0) for r in runs),
+        "first_note_ms": sum(r["first_note_ms"] for r in runs) / len(runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dispatch latency benchmark")
+    parser.add_argument("--notes", type=int, default=400, help="音符数")
+    parser.add_argument("--interval", type=float, default=0.02, help="音符间隔（秒）")
+    parser.add_argument("--load", type=float, default=0.004, help="每帧 UI 忙算时间（秒）")
+    parser.add_argument("--load-kind", choices=("python", "gil"), default="python", help="负载类型")
+    parser.add_argument("--runs", type=int, default=3, help="每种模式运行次数")
+    parser.add_argument("--check", action="store_true", help="独立进程没有明显改善时返回 1")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    events = make_events(args.notes, args.interval)
+
+    print(
+        f"{args.notes} notes @ {args.interval * 1000:.0f}ms, UI load {args.load * 1000:.1f}ms/frame "
+        f"({args.load_kind}), {args.runs} run(s), {os.cpu_count()} CPU(s)"
+    )
+    results = {}
+    for label, dispatch_process in (("in-process", False), ("dispatcher process", True)):
+        runs = [run_once(app, events, dispatch_process, args.load, args.load_kind) for _ in range(args.runs)]
+        stats = results[dispatch_process] = summarize(runs)
+        print(
+            f"  {label:<20} avg late {stats['avg_late_ms']:6.2f}ms  "
+            f"max late {stats['max_late_ms']:6.2f}ms  "
+            f"dropped {stats['events_dropped']}  "
+            f"first note {stats['first_note_ms']:6.0f}ms"
+        )
+
+    local, remote = results[False], results[True]
+    improved = (
+        remote["max_late_ms"] < local["max_late_ms"] * IMPROVEMENT_RATIO
+        and remote["events_dropped"] <= local["events_dropped"]
+    )
+    print(
+        f"  -> {'dispatcher process improves max lateness' if improved else 'no measurable improvement'} "
+        f"({remote['max_late_ms']:.2f}ms vs {local['max_late_ms']:.2f}ms); "
+        f"startup cost {remote['first_note_ms'] - local['first_note_ms']:+.0f}ms before the first note"
+    )
+    if args.check and not improved:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,42 @@ TRANSLATIONS = {
     "use_midi_duration": {LANG_EN: "Use MIDI note duration", LANG_ZH: "使用MIDI音符时值"},
     "keyboard_preset": {LANG_EN: "Keyboard preset", LANG_ZH: "键盘预设"},
     "countdown": {LANG_EN: "Countdown (sec)", LANG_ZH: "倒计时 (秒)"},
+    "ab_loop": {LANG_EN: "A-B Loop (bars)", LANG_ZH: "A-B 循环 (小节)"},
+    "ab_loop_hint": {
+        LANG_EN: "Repeat the bar range until unchecked (takes effect during playback)",
+        LANG_ZH: "反复播放该小节范围，取消勾选后继续往下播放（播放中立即生效）",
+    },
+    "ab_loop_speedup_hint": {
+        LANG_EN: "Speed up by this percentage on every pass",
+        LANG_ZH: "每循环一遍提速的百分比",
+    },
+    "playlist": {LANG_EN: "Playlist", LANG_ZH: "播放列表"},
+    "playlist_add": {LANG_EN: "Add...", LANG_ZH: "添加..."},
+    "playlist_clear": {LANG_EN: "Clear", LANG_ZH: "清空"},
+    "playlist_count": {LANG_EN: "+{count} song(s)", LANG_ZH: "+{count} 首"},
+    "playlist_hint": {
+        LANG_EN: "Played after the loaded song without countdown; the next song is compiled in the background",
+        LANG_ZH: "在当前曲目之后依次播放（无倒计时），下一首在后台预编译",
+    },
+    "playlist_gap_hint": {LANG_EN: "Gap between songs", LANG_ZH: "曲目间隔"},
+    "lan_sync": {LANG_EN: "LAN sync", LANG_ZH: "局域网同步"},
+    "lan_sync_off": {LANG_EN: "Off", LANG_ZH: "关闭"},
+    "lan_sync_leader": {LANG_EN: "Leader", LANG_ZH: "主机"},
+    "lan_sync_follow": {LANG_EN: "Follower", LANG_ZH: "从机"},
+    "lan_sync_hint": {
+        LANG_EN: "Leader: Start also starts every follower at the same moment (clock offsets measured over UDP).\n"
+                 "Follower: enter the leader's address; playback starts when the leader presses Start.",
+        LANG_ZH: "主机: 按开始时所有从机同时开始 (通过 UDP 测量时钟偏差)。\n"
+                 "从机: 填写主机地址, 主机按开始时自动开始播放。",
+    },
+    "midi_in": {LANG_EN: "MIDI keyboard", LANG_ZH: "MIDI 键盘"},
+    "midi_in_connect": {LANG_EN: "Connect", LANG_ZH: "连接"},
+    "midi_in_none": {LANG_EN: "(no MIDI input; pip install python-rtmidi)", LANG_ZH: "(无 MIDI 输入; pip install python-rtmidi)"},
+    "midi_in_hint": {
+        LANG_EN: "Play the game instrument live from a MIDI keyboard (same key mapping and octave as playback)",
+        LANG_ZH: "用 MIDI 键盘实时演奏游戏乐器 (按键映射与八度同播放)",
+    },
+    "lan_sync_leader_hint": {LANG_EN: "Leader address (host or host:port)", LANG_ZH: "主机地址 (host 或 host:port)"},
     "target_window": {LANG_EN: "Target window", LANG_ZH: "目标窗口"},
     "target_window_hint": {
         LANG_EN: "Note: The target window MUST be in foreground (visible and focused).\n"
@@ -198,6 +234,11 @@ TRANSLATIONS = {
     "diag_status_ready": {LANG_EN: "Ready", LANG_ZH: "就绪"},
     "diag_status_count": {LANG_EN: "{count} entries", LANG_ZH: "{count} 条记录"},
     "diag_copied": {LANG_EN: "Copied to clipboard", LANG_ZH: "已复制到剪贴板"},
+    "diag_stalls": {LANG_EN: "Stalls (late deadlines)", LANG_ZH: "卡顿快照 (超时截止)"},
+    "diag_stalls_none": {LANG_EN: "No stalls recorded", LANG_ZH: "无卡顿记录"},
+    "diag_stalls_count": {LANG_EN: "{count} stall snapshot(s)", LANG_ZH: "{count} 个卡顿快照"},
+    "diag_stalls_export": {LANG_EN: "Export Report...", LANG_ZH: "导出报告..."},
+    "diag_stalls_saved": {LANG_EN: "Report saved: {path}", LANG_ZH: "报告已保存: {path}"},
     "show_diagnostics": {LANG_EN: "Diagnostics", LANG_ZH: "诊断"},
     # Editor window
     "original_file": {LANG_EN: "Original (原始文件)", LANG_ZH: "原始文件"},
@@ -222,6 +263,27 @@ TRANSLATIONS = {
         LANG_EN: "Skip key events that are too far behind schedule (prevents dense chord pile-up)",
         LANG_ZH: "跳过超时过久的按键事件（防止密集和弦堆积）",
     },
+    "late_policy_drop": {LANG_EN: "Drop", LANG_ZH: "丢弃"},
+    "late_policy_compress": {LANG_EN: "Catch up", LANG_ZH: "追赶压缩"},
+    "late_policy_melody": {LANG_EN: "Keep melody", LANG_ZH: "保留旋律"},
+    "late_policy_hint": {
+        LANG_EN: "Late presses: drop them, compress the following gaps to catch up, or drop inner chord voices before the top note",
+        LANG_ZH: "超时按键：直接丢弃、压缩后续间隔追赶、或优先丢弃和弦内声部保留最高音",
+    },
+    "late_adaptive": {LANG_EN: "Adaptive", LANG_ZH: "自适应"},
+    "late_adaptive_hint": {
+        LANG_EN: "Derive the threshold from the measured latency p99 (the value above is the starting point)",
+        LANG_ZH: "根据实测延迟 p99 自动调整阈值（上方数值为初始值）",
+    },
+    "speed_governor": {LANG_EN: "Speed Governor", LANG_ZH: "自动调速"},
+    "speed_governor_hint": {
+        LANG_EN: "When key output falls behind, slow the tempo down smoothly instead of missing notes; recovers over the following bars",
+        LANG_ZH: "按键输出跟不上时平滑放慢速度而不是漏音，随后几小节内恢复原速",
+    },
+    "governor_min_rate_hint": {
+        LANG_EN: "Slowest allowed tempo (percent of the original)",
+        LANG_ZH: "允许的最低速度（原速的百分比）",
+    },
     "enable_diagnostics": {LANG_EN: "Enable Diagnostics", LANG_ZH: "启用诊断"},
     "enable_diagnostics_hint": {
         LANG_EN: "Write playback trace logs (expected/actual) for debugging",
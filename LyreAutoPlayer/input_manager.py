@@ -12,6 +12,7 @@ Author: LyreAutoPlayer Refactor v2
 """
 
 import time
+import heapq
 import ctypes
 import threading
 import atexit
@@ -102,12 +103,19 @@ class INPUT(ctypes.Structure):
         ("union", INPUT_UNION),
     ]
 
-# Windows API 函数
-user32 = ctypes.windll.user32
-SendInput = user32.SendInput
-MapVirtualKeyW = user32.MapVirtualKeyW
-GetAsyncKeyState = user32.GetAsyncKeyState
-GetForegroundWindow = user32.GetForegroundWindow
+# Windows API 函数 (非 Windows 下为空实现，仅 debug 后端可用: 离线工具/基准测试/子进程自检)
+try:
+    user32 = ctypes.windll.user32
+    SendInput = user32.SendInput
+    MapVirtualKeyW = user32.MapVirtualKeyW
+    GetAsyncKeyState = user32.GetAsyncKeyState
+    GetForegroundWindow = user32.GetForegroundWindow
+except AttributeError:
+    user32 = None
+    SendInput = lambda *args: 0
+    MapVirtualKeyW = lambda *args: 0
+    GetAsyncKeyState = lambda *args: 0
+    GetForegroundWindow = lambda: 0
 
 # IME 相关 API (用于禁用输入法，防止时间戳快捷输入)
 try:
@@ -257,6 +265,10 @@ class InputStats:
     avg_latency_ms: float = 0.0
     chord_count: int = 0          # 和弦计数
     max_simultaneous_keys: int = 0  # 最大同时按下数
+    deferred_releases: int = 0    # 因最小保持时间而延后的释放次数
+    deferred_total_ms: float = 0.0  # 累计延后时长
+    deferred_max_ms: float = 0.0    # 单次最大延后时长
+    deferred_flushed: int = 0       # 同键重新按下时提前执行的延后释放次数
 
     # 延迟分布
     latency_buckets: Dict[str, int] = field(default_factory=lambda: {
@@ -291,6 +303,10 @@ class InputStats:
         self.avg_latency_ms = 0.0
         self.chord_count = 0
         self.max_simultaneous_keys = 0
+        self.deferred_releases = 0
+        self.deferred_total_ms = 0.0
+        self.deferred_max_ms = 0.0
+        self.deferred_flushed = 0
         self.latency_buckets = {
             "<1ms": 0, "1-2ms": 0, "2-5ms": 0, "5-10ms": 0, ">10ms": 0
         }
@@ -501,6 +517,14 @@ class InputManager:
         self._key_codes: Dict[str, Tuple[int, int]] = {}  # key -> (vk_code, scan_code)
         self._last_key_time: Dict[str, float] = {}  # 防抖用
 
+        # 延后释放（最小保持时间未到时不在锁内 sleep，而是交给定时线程）
+        self._deferred_heap: List[Tuple[float, int, str, Optional[int]]] = []  # (due, seq, key, note)
+        self._deferred_due: Dict[str, float] = {}  # key -> due (仅最新有效)
+        self._deferred_seq = 0
+        self._deferred_cond = threading.Condition(self._lock)
+        self._deferred_thread: Optional[threading.Thread] = None
+        self._deferred_stop = False
+
         # 诊断
         self._event_log: Deque[InputEvent] = deque(maxlen=self.config.log_buffer_size)
         self._stats = InputStats()
@@ -600,6 +624,37 @@ class InputManager:
                 self._release_key_internal(key, reason=InputEventType.STUCK_RECOVERY)
                 self._stats.stuck_key_recoveries += 1
 
+    def _schedule_deferred_release(self, key: str, note: Optional[int], due: float):
+        """登记一次延后释放（需要已持有锁）"""
+        self._deferred_due[key] = due
+        self._deferred_seq += 1
+        heapq.heappush(self._deferred_heap, (due, self._deferred_seq, key, note))
+        if self._deferred_thread is None:
+            self._deferred_stop = False
+            self._deferred_thread = threading.Thread(target=self._deferred_release_loop, daemon=True)
+            self._deferred_thread.start()
+        self._deferred_cond.notify()
+
+    def _deferred_release_loop(self):
+        """延后释放定时线程：到期后执行释放，等待期间不持有锁"""
+        with self._deferred_cond:
+            while not self._deferred_stop:
+                if not self._deferred_heap:
+                    self._deferred_cond.wait()
+                    continue
+                due, _, key, note = self._deferred_heap[0]
+                wait_s = due - self._clock()
+                if wait_s > 0:
+                    self._deferred_cond.wait(wait_s)
+                    continue
+                heapq.heappop(self._deferred_heap)
+                if self._deferred_due.get(key) != due:
+                    continue  # 已被强制释放或重新按下取消
+                try:
+                    self._release_key_internal(key, note=note, force=True)
+                except Exception:
+                    self._deferred_due.pop(key, None)
+
     def set_target_window(self, hwnd: Optional[int]):
         """设置目标窗口句柄"""
         self.config.target_hwnd = hwnd
@@ -612,6 +667,14 @@ class InputManager:
             self._focus_thread.join(timeout=1.0)
             self._focus_thread = None
 
+        # 停止延后释放线程（剩余的延后释放由下面的 release_all 立即执行）
+        with self._deferred_cond:
+            self._deferred_stop = True
+            self._deferred_cond.notify()
+        if self._deferred_thread is not None:
+            self._deferred_thread.join(timeout=1.0)
+            self._deferred_thread = None
+
         # 释放所有按键
         self.release_all()
 
@@ -638,6 +701,11 @@ class InputManager:
                     # 间隔太短，跳过但不算失败
                     return True
 
+            # 上一次释放仍在等待最小保持时间：立即释放，再重新按下
+            if key in self._deferred_due:
+                self._release_key_internal(key, force=True)
+                self._stats.deferred_flushed += 1
+
             # 如果已经按下，不重复发送
             if key in self._active_keys:
                 return True
@@ -699,6 +767,12 @@ class InputManager:
         now = self._clock()
 
         with self._lock:
+            # 重触发：上一次释放仍在等待最小保持时间，先立即释放 (key_up)，
+            # 否则 key_down 落在仍按住的键上，这次重复不会被游戏识别
+            if key in self._deferred_due:
+                self._release_key_internal(key, force=True)
+                self._stats.deferred_flushed += 1
+
             vk_code = get_vk_code(key)
             if vk_code is None:
                 self._stats.failed_press += 1
@@ -763,6 +837,12 @@ class InputManager:
         if key not in self._active_keys:
             return True
 
+        # 已登记延后释放：普通释放幂等，强制释放则取消登记并立即执行
+        if key in self._deferred_due:
+            if not force:
+                return True
+            del self._deferred_due[key]
+
         # 获取键码
         vk_code, scan_code = self._key_codes.get(key, (0, 0))
         if vk_code == 0:
@@ -773,10 +853,13 @@ class InputManager:
         press_time = self._active_keys.get(key, now)
         hold_time_ms = (now - press_time) * 1000
         if not force and hold_time_ms < self.config.min_key_hold_ms:
-            # 等待达到最小保持时间
+            # 未达到最小保持时间：延后到期释放，不在锁内 sleep
             wait_ms = self.config.min_key_hold_ms - hold_time_ms
-            time.sleep(wait_ms / 1000.0)
-            now = self._clock()
+            self._schedule_deferred_release(key, note, press_time + self.config.min_key_hold_ms / 1000.0)
+            self._stats.deferred_releases += 1
+            self._stats.deferred_total_ms += wait_ms
+            self._stats.deferred_max_ms = max(self._stats.deferred_max_ms, wait_ms)
+            return True
 
         # 发送释放
         success = self._backend.key_up(key, vk_code, scan_code)
@@ -828,7 +911,7 @@ class InputManager:
         released = 0
 
         for key in keys_to_release:
-            if self._release_key_internal(key, reason=reason):
+            if self._release_key_internal(key, reason=reason, force=True):
                 released += 1
 
         if self.config.enable_diagnostics and released > 0:
@@ -905,6 +988,11 @@ class InputManager:
                     "avg_latency_ms": round(self._stats.avg_latency_ms, 2),
                     "max_simultaneous": self._stats.max_simultaneous_keys,
                     "chord_count": self._stats.chord_count,
+                    "deferred_releases": self._stats.deferred_releases,
+                    "deferred_total_ms": round(self._stats.deferred_total_ms, 2),
+                    "deferred_max_ms": round(self._stats.deferred_max_ms, 2),
+                    "deferred_flushed": self._stats.deferred_flushed,
+                    "pending_deferred": len(self._deferred_due),
                     "latency_distribution": dict(self._stats.latency_buckets),
                 },
                 "recent_events": [
@@ -982,10 +1070,39 @@ def self_test():
     assert mgr.get_active_count() == 1, "Should have 1 active key"
 
     assert mgr.release('a'), "Release 'a' should succeed"
+    time.sleep(mgr.config.min_key_hold_ms / 1000.0 + 0.05)  # 可能被延后到最小保持时间
     assert not mgr.is_pressed('a'), "'a' should not be pressed"
     assert mgr.get_active_count() == 0, "Should have 0 active keys"
     print("Basic press/release: OK")
 
+    # 测试最小保持时间（延后释放，不阻塞其他按键）
+    print("\n--- Min-Hold Deferral Test ---")
+    before = mgr.get_stats().deferred_releases
+    mgr.press('q')
+    t0 = time.perf_counter()
+    assert mgr.release('q'), "Early release should succeed (deferred)"
+    assert mgr.press('w'), "Other keys must not wait for the deferred release"
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    assert elapsed_ms < mgr.config.min_key_hold_ms, f"release() blocked for {elapsed_ms:.1f}ms"
+    assert mgr.get_stats().deferred_releases == before + 1, "Deferred release should be counted"
+    time.sleep(mgr.config.min_key_hold_ms / 1000.0 + 0.05)
+    assert not mgr.is_pressed('q'), "'q' should be released after min hold"
+    mgr.release_all()
+    print(f"Min-hold deferral: OK (release+press took {elapsed_ms:.2f}ms)")
+
+    # 重触发落在延后释放期间：先 key_up 再 key_down
+    if isinstance(mgr._backend, DebugBackend):
+        mgr._backend.clear_log()
+        flushed = mgr.get_stats().deferred_flushed
+        mgr.press_force('r')
+        mgr.release('r')  # 未达最小保持时间，延后
+        mgr.press_force('r')
+        actions = [is_down for _, key, is_down, _, _ in mgr._backend.log if key == 'r']
+        assert actions == [True, False, True], f"Retrigger must send key_up first: {actions}"
+        assert mgr.get_stats().deferred_flushed == flushed + 1, "Flushed release should be counted"
+        mgr.release_all()
+        print("Retrigger during deferral: OK")
+
     # 测试和弦
     print("\n--- Chord Test ---")
     mgr.press('c')
@@ -1004,7 +1121,7 @@ def self_test():
     mgr.press('a')
     result = mgr.press('a')  # 应该因为防抖而返回 True 但不重复发送
     assert result, "Debounced press should return True"
-    mgr.release('a')
+    mgr.release_force('a')
     print("Debounce test: OK")
 
     # 显示诊断信息
@@ -38,7 +38,7 @@ from i18n import tr, LANG_EN, LANG_ZH, set_language, get_language, TRANSLATIONS
 
 # Import player module (thread, config, data classes, utilities)
 from player import (
-    PlayerThread, PlayerConfig,
+    PlayerThread, PlayerConfig, PlaybackSession,
     ErrorConfig, ErrorType, DEFAULT_ERROR_TYPES, plan_errors_for_group,
     NoteEvent, midi_to_events_with_duration,
     KeyEvent, quantize_note, get_octave_shift, build_available_notes,
@@ -169,6 +169,8 @@ class MainWindow(
     sig_toggle_duration = pyqtSignal()
     sig_speed_up = pyqtSignal()
     sig_speed_down = pyqtSignal()
+    sig_lan_start = pyqtSignal(float)  # LAN sync follower: agreed start (local perf_counter)
+    sig_log = pyqtSignal(str)  # append_log from worker threads (LAN sync, MIDI input)
 
     def __init__(self):
         super().__init__()
@@ -176,7 +178,14 @@ class MainWindow(
 
         self.mid_path: Optional[str] = None
         self.events: List[NoteEvent] = []
+        self.playlist: List[str] = []  # MIDI files played after the loaded one
+        self._lan_sync = None  # SyncLeader / SyncFollower (LAN sync mode)
+        self._lan_start_at: Optional[float] = None  # Start received from the leader
+        self._midi_in = None  # (port, MidiPassthrough, InputManager) while the MIDI keyboard is connected
         self.thread: Optional[PlayerThread] = None
+        self.playback_session = PlaybackSession()  # Warm input manager / synth across plays
+        self._render_thread = None  # Offline audio export (RenderThread)
+        self._playhead = None  # PlayheadFollower for the running thread
         self.soundfont_path = ""
         self.floating_controller: Optional[FloatingController] = None
         self.diagnostics_window: Optional[DiagnosticsWindow] = None
@@ -247,6 +256,17 @@ class MainWindow(
         self.sig_speed_up.connect(self.on_speed_up)
         self.sig_speed_down.connect(self.on_speed_down)
         self.sp_speed.valueChanged.connect(self._on_speed_changed)
+        self.cmb_octave.currentIndexChanged.connect(self._on_octave_changed)
+        self.chk_loop.toggled.connect(self._on_loop_changed)
+        self.sp_loop_start.valueChanged.connect(self._on_loop_changed)
+        self.sp_loop_end.valueChanged.connect(self._on_loop_changed)
+        self.sp_loop_speedup.valueChanged.connect(self._on_loop_changed)
+        self.btn_playlist_add.clicked.connect(self.on_playlist_add)
+        self.btn_playlist_clear.clicked.connect(self.on_playlist_clear)
+        self.cmb_lan_sync.currentIndexChanged.connect(self._on_lan_sync_changed)
+        self.sig_lan_start.connect(self._on_lan_start)
+        self.sig_log.connect(self.append_log)
+        self.btn_midi_in.toggled.connect(self._on_midi_in_toggled)
         self.chk_octave_range_auto.stateChanged.connect(self._on_octave_range_mode_changed)
         self.sp_octave_min.valueChanged.connect(self._on_octave_range_changed)
         self.sp_octave_max.valueChanged.connect(self._on_octave_range_changed)
@@ -324,6 +344,23 @@ class MainWindow(
         self.lbl_midi_duration.setText(tr("use_midi_duration", self.lang))
         self.lbl_preset.setText(tr("keyboard_preset", self.lang))
         self.lbl_countdown.setText(tr("countdown", self.lang))
+        self.lbl_loop.setText(tr("ab_loop", self.lang))
+        self.chk_loop.setToolTip(tr("ab_loop_hint", self.lang))
+        self.sp_loop_speedup.setToolTip(tr("ab_loop_speedup_hint", self.lang))
+        self.lbl_playlist.setText(tr("playlist", self.lang))
+        self.btn_playlist_add.setText(tr("playlist_add", self.lang))
+        self.btn_playlist_add.setToolTip(tr("playlist_hint", self.lang))
+        self.btn_playlist_clear.setText(tr("playlist_clear", self.lang))
+        self.lbl_playlist_count.setText(tr("playlist_count", self.lang).format(count=len(self.playlist)))
+        self.sp_playlist_gap.setToolTip(tr("playlist_gap_hint", self.lang))
+        self.lbl_lan_sync.setText(tr("lan_sync", self.lang))
+        for i in range(self.cmb_lan_sync.count()):
+            self.cmb_lan_sync.setItemText(i, tr(f"lan_sync_{self.cmb_lan_sync.itemData(i)}", self.lang))
+        self.cmb_lan_sync.setToolTip(tr("lan_sync_hint", self.lang))
+        self.txt_lan_leader.setToolTip(tr("lan_sync_leader_hint", self.lang))
+        self.lbl_midi_in.setText(tr("midi_in", self.lang))
+        self.btn_midi_in.setText(tr("midi_in_connect", self.lang))
+        self.cmb_midi_in.setToolTip(tr("midi_in_hint", self.lang))
         self.lbl_window.setText(tr("target_window", self.lang))
         self.cmb_window.setToolTip(tr("target_window_hint", self.lang))
         self.btn_refresh.setText(tr("refresh", self.lang))
@@ -375,6 +412,14 @@ class MainWindow(
         self.lbl_auto_resume_countdown.setText(tr("auto_resume_countdown", self.lang))
         self.lbl_late_drop.setText(tr("late_drop", self.lang))
         self.chk_late_drop.setToolTip(tr("late_drop_hint", self.lang))
+        for i in range(self.cmb_late_policy.count()):
+            self.cmb_late_policy.setItemText(i, tr(f"late_policy_{self.cmb_late_policy.itemData(i)}", self.lang))
+        self.cmb_late_policy.setToolTip(tr("late_policy_hint", self.lang))
+        self.chk_late_adaptive.setText(tr("late_adaptive", self.lang))
+        self.chk_late_adaptive.setToolTip(tr("late_adaptive_hint", self.lang))
+        self.lbl_speed_governor.setText(tr("speed_governor", self.lang))
+        self.chk_speed_governor.setToolTip(tr("speed_governor_hint", self.lang))
+        self.sp_governor_min_rate.setToolTip(tr("governor_min_rate_hint", self.lang))
         if hasattr(self, 'lbl_enable_diagnostics'):
             self.lbl_enable_diagnostics.setText(tr("enable_diagnostics", self.lang))
         if hasattr(self, 'chk_enable_diagnostics'):
@@ -548,6 +593,7 @@ class MainWindow(
             self.append_log(f"[INFO] Loaded style plugins: {', '.join(plugin_styles)}")
 
     def refresh_windows(self):
+        self._refresh_midi_inputs()
         self.cmb_window.clear()
         if win32gui is None:
             self.cmb_window.addItem(tr("pywin32_unavail", self.lang), None)
@@ -640,6 +686,10 @@ class MainWindow(
             self.editor_window.midi_loaded.connect(self._on_editor_midi_loaded)
             self.editor_window.bpm_changed.connect(self._on_editor_bpm_changed)
             self.editor_window.audio_changed.connect(self._on_editor_audio_changed)
+            self.editor_window.export_audio_requested.connect(self.on_export_audio)
+            # Follow mode: edits (and undo/redo) are hot-swapped into the running plan
+            self.editor_window.piano_roll.sig_notes_changed.connect(self._on_editor_notes_changed)
+            self.editor_window.piano_roll.undo_stack.indexChanged.connect(self._on_editor_notes_changed)
 
         self.editor_window.load_midi(path)
         # Sync keyboard config (effective root = root + octave_shift * 12)
@@ -791,10 +841,13 @@ class MainWindow(
                 kb.unhook_all_hotkeys()
             except Exception:
                 pass
+        self._stop_lan_sync()
+        self._disconnect_midi_in()
         # Stop player thread if running
         if self.thread and self.thread.isRunning():
             self.thread.stop()
             self.thread.wait(1000)
+        self.playback_session.close()
         # Close floating controller
         if self.floating_controller:
             self.floating_controller.close()
@@ -4,12 +4,28 @@ Player module for LyreAutoPlayer.
 
 Contains:
 - thread: PlayerThread for playback control
+- session: PlaybackSession (warm resources reused across plays)
+- compiler: PlanCompiler (notes + config -> playback plan)
+- collisions: resolve_collisions (same-key collisions, sweep line per key)
+- render: Offline audio render of a compiled plan
 - quantize: Note quantization strategies
 - midi_parser: MIDI parsing with duration
 - scheduler: Event scheduling with priority queue
+- watchdog: Stall watchdog (thread stacks of overrun deadlines)
+- gc_control: GcGuard (performance mode: frozen, deferred GC)
+- late_policy: LatePolicy (adaptive late-press handling)
+- governor: SpeedGovernor (clock-rate warp while dispatch is behind)
+- timemap: TimeMap (piecewise-linear running time -> plan time)
+- key_tables: per-octave pitch -> key tables (live octave switching)
+- plan_patch: PlanPatch (hot-swap of edited bars into a running plan)
+- playlist: PlanPrecompiler (next playlist song compiled in the background)
+- ensemble: EnsemblePlayer (one output per part, one master clock)
+- lan_sync: SyncLeader/SyncFollower (UDP clock sync, agreed start across PCs)
+- midi_input: MidiPassthrough (MIDI keyboard -> key injection, live)
+- planfile: .lyreplan compiled plans (save, mmap load, diff)
 """
 
-from .thread import PlayerThread
+from .session import PlaybackSession
 from .config import PlayerConfig
 from .quantize import (
     quantize_note,
@@ -20,14 +36,39 @@ from .quantize import (
     MIDI_C2,
     MIDI_C6,
 )
-from .midi_parser import NoteEvent, midi_to_events_with_duration
+from .midi_parser import NoteEvent, midi_to_events_with_duration, midi_to_events_by_track
 from .scheduler import KeyEvent
+from .watchdog import StallWatchdog, StallSnapshot, format_stall_report
+from .gc_control import GcGuard, format_gc_stats
+from .late_policy import LatePolicy, LatencyHistogram, BarLateStats, LATE_POLICY_MODES
+from .governor import SpeedGovernor, WarpDecision
+from .timemap import TimeMap, TimeSegment
+from .key_tables import KeyTable, build_key_table, build_key_tables, plan_pitches
+from .plan_patch import PlanPatch, build_patch, dirty_bar_range
+from .playlist import PlanPrecompiler, PreparedSong, prepare_song
 from .errors import ErrorConfig, ErrorType, DEFAULT_ERROR_TYPES, plan_errors_for_group
 from .bar_utils import calculate_bar_and_beat_duration, calculate_bar_duration
+from .compiler import PlanCompiler, CompiledPlan, build_note_to_key
+from .collisions import NoteIntent, CollisionStats, resolve_collisions
+from .render import render_plan, render_events
+from .ensemble import EnsemblePart, EnsemblePlayer, parts_from_midi, create_part_output
+from .lan_sync import SyncLeader, SyncFollower, PeerReport
+from .midi_input import MidiPassthrough, PassthroughStats, LoopbackInput, list_midi_inputs, open_midi_input
+from .planfile import PlanFile, PlanDiff, save_plan, load_plan, diff_plans, config_hash, plan_layout
+
+
+def __getattr__(name):
+    # PlayerThread pulls in PyQt6 and the Windows input backend; import it on
+    # first use so headless tools (python -m player.render) work without them.
+    if name == "PlayerThread":
+        from .thread import PlayerThread
+        return PlayerThread
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     # Thread
     'PlayerThread',
+    'PlaybackSession',
     # Config
     'PlayerConfig',
     # Quantize
@@ -41,8 +82,40 @@ __all__ = [
     # MIDI Parser
     'NoteEvent',
     'midi_to_events_with_duration',
+    'midi_to_events_by_track',
     # Scheduler
     'KeyEvent',
+    # Stall watchdog
+    'StallWatchdog',
+    'StallSnapshot',
+    'format_stall_report',
+    # GC control
+    'GcGuard',
+    'format_gc_stats',
+    # Late policy
+    'LatePolicy',
+    'LatencyHistogram',
+    'BarLateStats',
+    'LATE_POLICY_MODES',
+    # Speed governor
+    'SpeedGovernor',
+    'WarpDecision',
+    # Time map
+    'TimeMap',
+    'TimeSegment',
+    # Live octave switching
+    'KeyTable',
+    'build_key_table',
+    'build_key_tables',
+    'plan_pitches',
+    # Plan patching
+    'PlanPatch',
+    'build_patch',
+    'dirty_bar_range',
+    # Playlist
+    'PlanPrecompiler',
+    'PreparedSong',
+    'prepare_song',
     # Errors
     'ErrorConfig',
     'ErrorType',
@@ -51,4 +124,36 @@ __all__ = [
     # Bar utilities
     'calculate_bar_and_beat_duration',
     'calculate_bar_duration',
+    # Compiler / offline render
+    'PlanCompiler',
+    'CompiledPlan',
+    'build_note_to_key',
+    'NoteIntent',
+    'CollisionStats',
+    'resolve_collisions',
+    'render_plan',
+    'render_events',
+    # Ensemble
+    'EnsemblePart',
+    'EnsemblePlayer',
+    'parts_from_midi',
+    'create_part_output',
+    # LAN sync
+    'SyncLeader',
+    'SyncFollower',
+    'PeerReport',
+    # MIDI input pass-through
+    'MidiPassthrough',
+    'PassthroughStats',
+    'LoopbackInput',
+    'list_midi_inputs',
+    'open_midi_input',
+    # Plan files
+    'PlanFile',
+    'PlanDiff',
+    'save_plan',
+    'load_plan',
+    'diff_plans',
+    'config_hash',
+    'plan_layout',
 ]
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Audio worker thread for FluidSynth monitoring.
+
+Synth calls (noteon/noteoff) can take a noticeable fraction of a
+millisecond and occasionally much longer when the audio driver stalls.
+AudioWorker owns the synth on its own thread: producers (the playback
+dispatcher, the editor's GUI timer) only append commands to a deque, which
+is a lock-free handoff under the GIL, and set an Event.
+
+Commands may carry a due time (`at=`, a time.perf_counter reading). The
+playback dispatcher passes the wall time of each plan event, so notes of a
+batch dispatched together still sound at their own times. When pyfluidsynth's
+Sequencer is available, future commands are handed to it so FluidSynth
+renders them sample-exact; otherwise the worker waits for the due time
+itself. Commands without a due time (the editor, all-notes-off) play at once.
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+# Optional: FluidSynth sequencer for ahead-of-time scheduling
+try:
+    import fluidsynth
+except ImportError:
+    fluidsynth = None
+
+# GM (General MIDI) instrument programs
+GM_PROGRAM = {
+    "Piano": 1, "Harpsichord": 7, "Celesta": 9, "Glockenspiel": 10,
+    "Music Box": 11, "Vibraphone": 12, "Marimba": 13, "Xylophone": 14,
+    "Organ": 20, "Accordion": 22, "Harmonica": 23, "Guitar": 25,
+    "Harp": 47, "Strings": 49, "Choir": 53, "Trumpet": 57,
+    "Flute": 74, "Pan Flute": 76, "Shakuhachi": 78, "Whistle": 79,
+}
+
+# Command kinds
+_NOTE_ON = 0
+_NOTE_OFF = 1
+_CC = 2
+_STOP = 3
+
+CC_ALL_NOTES_OFF = 123
+
+# Commands due sooner than this are sent directly instead of via the sequencer
+SEQUENCER_MIN_LEAD_S = 0.002
+
+
+class AudioWorker:
+    """
+    Thread that owns a fluidsynth.Synth and plays queued note commands.
+
+    Exposes the subset of the Synth API used by the player (noteon, noteoff,
+    cc, delete) so it can be passed wherever a synth was used before; every
+    call returns immediately.
+
+    Usage:
+        audio = AudioWorker(fs, use_sequencer=True)
+        audio.start()
+        audio.noteon(0, 60, 90)                           # now
+        audio.noteoff(0, 60, at=time.perf_counter() + 0.5)  # later
+        audio.stop()
+    """
+
+    def __init__(self, synth, use_sequencer: bool = True, owns_synth: bool = False,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        Args:
+            synth: fluidsynth.Synth (already started, SoundFont loaded)
+            use_sequencer: Schedule future commands with fluidsynth.Sequencer if possible
+            owns_synth: delete() also deletes the synth
+            clock: Clock used for command due times
+        """
+        self._synth = synth
+        self._owns_synth = owns_synth
+        self._clock = clock
+        self._commands: Deque[Tuple[int, int, int, int, Optional[float]]] = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self._sequencer = None
+        self._seq_dest = None
+        if use_sequencer and fluidsynth is not None and hasattr(fluidsynth, "Sequencer"):
+            try:
+                self._sequencer = fluidsynth.Sequencer(time_scale=1000, use_system_timer=False)
+                self._seq_dest = self._sequencer.register_fluidsynth(synth)
+            except Exception:
+                self._sequencer = None
+                self._seq_dest = None
+
+        # Stats
+        self.commands_processed = 0
+        self.commands_sequenced = 0
+        self.max_backlog = 0
+
+    # ---- producer side (any thread, never blocks) ----
+
+    def noteon(self, chan: int, note: int, velocity: int, at: Optional[float] = None):
+        self._push((_NOTE_ON, chan, note, velocity, at))
+
+    def noteoff(self, chan: int, note: int, at: Optional[float] = None):
+        self._push((_NOTE_OFF, chan, note, 0, at))
+
+    def cc(self, chan: int, ctrl: int, value: int, at: Optional[float] = None):
+        self._push((_CC, chan, ctrl, value, at))
+
+    def all_notes_off(self, chan: int):
+        self.cc(chan, CC_ALL_NOTES_OFF, 0)
+
+    def _push(self, command: Tuple[int, int, int, int, Optional[float]]):
+        self._commands.append(command)
+        self._wake.set()
+
+    # ---- lifecycle ----
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="AudioWorker")
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker after draining already-due commands."""
+        if not self._running:
+            return
+        self._push((_STOP, 0, 0, 0, None))
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._running = False
+        if self._sequencer is not None:
+            try:
+                self._sequencer.delete()
+            except Exception:
+                pass
+            self._sequencer = None
+
+    def delete(self):
+        """Stop the worker (and delete the synth if owned)."""
+        self.stop()
+        if self._owns_synth and self._synth is not None:
+            self._synth.delete()
+            self._synth = None
+
+    # ---- worker side ----
+
+    def _run(self):
+        pending: List[Tuple[float, int, Tuple[int, int, int, int, Optional[float]]]] = []  # (due, seq, cmd)
+        seq_no = 0
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, pending[0][0] - self._clock())
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+            backlog = len(self._commands)
+            if backlog > self.max_backlog:
+                self.max_backlog = backlog
+            while self._commands:
+                command = self._commands.popleft()
+                if command[0] == _STOP:
+                    return
+                due = command[4]
+                if due is not None:
+                    lead = due - self._clock()
+                    if lead > SEQUENCER_MIN_LEAD_S:
+                        if self._sequence(command, lead):
+                            continue
+                        seq_no += 1
+                        heapq.heappush(pending, (due, seq_no, command))
+                        continue
+                if command[0] == _CC and command[2] == CC_ALL_NOTES_OFF and pending:
+                    # Seek / pause / stop: notes queued for later must not sound afterwards
+                    pending = [item for item in pending if item[2][1] != command[1]]
+                    heapq.heapify(pending)
+                self._execute(command)
+
+            now = self._clock()
+            while pending and pending[0][0] <= now:
+                self._execute(heapq.heappop(pending)[2])
+
+    def _sequence(self, command: Tuple[int, int, int, int, Optional[float]], lead_s: float) -> bool:
+        """Hand a future note command to the FluidSynth sequencer (True if done)."""
+        if self._sequencer is None or command[0] == _CC:
+            return False
+        kind, chan, note, velocity, _ = command
+        delay_ms = int(lead_s * 1000)
+        try:
+            if kind == _NOTE_ON:
+                self._sequencer.note_on(delay_ms, chan, note, velocity, dest=self._seq_dest, absolute=False)
+            else:
+                self._sequencer.note_off(delay_ms, chan, note, dest=self._seq_dest, absolute=False)
+        except Exception:
+            return False
+        self.commands_sequenced += 1
+        self.commands_processed += 1
+        return True
+
+    def _execute(self, command: Tuple[int, int, int, int, Optional[float]]):
+        kind, chan, a, b, _ = command
+        try:
+            if kind == _NOTE_ON:
+                self._synth.noteon(chan, a, b)
+            elif kind == _NOTE_OFF:
+                self._synth.noteoff(chan, a)
+            elif kind == _CC:
+                self._synth.cc(chan, a, b)
+        except Exception:
+            pass
+        self.commands_processed += 1
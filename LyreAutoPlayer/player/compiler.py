@@ -0,0 +1,758 @@
+# -*- coding: utf-8 -*-
+"""
+Plan compiler: NoteEvents + PlayerConfig -> time-sorted KeyEvent plan.
+
+Quantization, humanization, 8-bar variation, key collisions (collisions.py)
+and simulated errors are all decided here, ahead of playback. The compiler has no Qt or input-backend
+dependency, so the same plan can be played live by PlayerThread or
+rendered offline (see render.py).
+"""
+
+import os
+import heapq
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import mido
+
+from style_manager import INPUT_STYLES
+
+from .config import PlayerConfig
+from .midi_parser import NoteEvent
+from .scheduler import KeyEvent
+from .quantize import build_available_notes, quantize_note, get_octave_shift
+from .key_tables import quantize_range
+from .collisions import NoteIntent, CollisionStats, resolve_collisions
+from .errors import compile_errors
+from .rng import STREAM_TIMING, STREAM_DURATION, STREAM_EIGHT_BAR, stream_uniform, stream_uniform_batch
+from .bar_utils import calculate_bar_and_beat_duration
+
+# InputManager's default min_key_hold_ms (used when no input backend is involved)
+DEFAULT_MIN_KEY_HOLD_MS = 8.0
+
+# Gap between a key's release and its next press (timeline normalization)
+POST_RELEASE_S = 0.010
+
+
+@dataclass
+class CompiledPlan:
+    """Result of PlanCompiler.compile()."""
+    events: List[KeyEvent]
+    seed: int
+    bar_duration: float
+    bar_boundaries_sec: List[float] = field(default_factory=list)
+    applied_errors: list = field(default_factory=list)  # AppliedError
+    notes_scheduled: int = 0
+    notes_dropped: int = 0
+    notes_dropped_accidental: int = 0
+    notes_dropped_octave_conflict: int = 0
+    collisions: CollisionStats = field(default_factory=CollisionStats)
+
+
+def build_note_to_key(cfg: PlayerConfig) -> Dict[int, str]:
+    """MIDI note -> key mapping for cfg's keyboard preset and root/octave."""
+    effective_root = cfg.root_mid_do + (cfg.octave_shift * 12)
+    return {n: k for n, k in build_available_notes(effective_root, cfg.keyboard_preset)}
+
+
+class PlanCompiler:
+    """
+    Compiles one performance of `events` under `cfg` and `seed`.
+
+    The same (events, cfg, seed) always compiles to the same plan.
+
+    Usage:
+        compiler = PlanCompiler(events, cfg, seed, log_fn=print)
+        compiled = compiler.compile(build_note_to_key(cfg))
+        plan = PlaybackPlan(compiled.events)
+    """
+
+    def __init__(self, events: List[NoteEvent], cfg: PlayerConfig, seed: int,
+                 log_fn: Optional[Callable[[str], None]] = None,
+                 min_key_hold_ms: float = DEFAULT_MIN_KEY_HOLD_MS,
+                 bar_and_beat_fn: Optional[Callable[[], Tuple[float, float]]] = None):
+        """
+        Args:
+            events: Source notes (time-sorted)
+            cfg: Player configuration
+            seed: Humanization seed
+            log_fn: Optional logging function
+            min_key_hold_ms: Input backend's minimum key hold (notes are held >= 3x this)
+            bar_and_beat_fn: Returns (bar, beat) duration of cfg.midi_path; the
+                player passes a session-cached version, default reads the file
+        """
+        self.events = events
+        self.cfg = cfg
+        self._seed = seed
+        self._log_fn = log_fn
+        self.min_key_hold_ms = min_key_hold_ms
+        self._bar_and_beat_fn = bar_and_beat_fn
+        self.bar_duration = 2.0  # Default bar duration (120BPM 4/4)
+        self.bar_boundaries_sec: list = []  # 可变小节边界时间列表 (秒)
+        self.applied_errors: list = []
+        self.next_free_time: Dict[str, float] = {}  # Per-key next free time after the last compile
+        self.collisions = CollisionStats()
+
+    def _log(self, msg: str):
+        if self._log_fn is not None:
+            self._log_fn(msg)
+
+    def _bar_and_beat(self) -> Tuple[float, float]:
+        if self._bar_and_beat_fn is not None:
+            return self._bar_and_beat_fn()
+        return calculate_bar_and_beat_duration(mido.MidiFile(self.cfg.midi_path, clip=True))
+
+    def compile(self, note_to_key: Dict[int, str], start_at_time: float = 0.0) -> CompiledPlan:
+        """Compile notes, pause markers and simulated errors into one plan."""
+        avail_notes = list(note_to_key.keys())
+        speed = max(1e-9, self.cfg.speed)
+        event_queue, scheduled, dropped, dropped_accidental, dropped_octave = self._build_event_queue(
+            note_to_key, avail_notes, start_at_time
+        )
+        event_queue = self._compile_errors(event_queue, note_to_key, speed)
+        event_queue = self._resolve_error_collisions(event_queue)
+        if self.collisions.delayed or self.collisions.shortened or self.collisions.merged:
+            self._log(self.collisions.describe())
+        return CompiledPlan(
+            events=event_queue,
+            seed=self._seed,
+            bar_duration=self.bar_duration,
+            bar_boundaries_sec=list(self.bar_boundaries_sec),
+            applied_errors=list(self.applied_errors),
+            notes_scheduled=scheduled,
+            notes_dropped=dropped,
+            notes_dropped_accidental=dropped_accidental,
+            notes_dropped_octave_conflict=dropped_octave,
+            collisions=self.collisions,
+        )
+
+    def compile_bars(self, note_to_key: Dict[int, str], first_bar: int, last_bar: int,
+                     next_free: Optional[Dict[str, float]] = None) -> List[KeyEvent]:
+        """Compile only the notes of bars first_bar..last_bar (no pause markers or errors).
+
+        Humanization draws are addressed by (bar, note), so the result equals
+        the same bars of a full compile when `next_free` is the per-key state
+        the earlier bars left (see plan_patch.key_state). The state after
+        the last bar is left in self.next_free_time. Tokens start at 1.
+        The bars after last_bar (collision_reach_bars) are compiled as context,
+        so the last notes' holds are shortened as in a full compile.
+        """
+        event_queue, *_ = self._build_event_queue(
+            note_to_key, list(note_to_key.keys()), bars=(first_bar, last_bar), next_free=next_free
+        )
+        return sorted(event_queue)
+
+    def collision_reach_bars(self) -> int:
+        """Bars a note's hold can span: how far a collision can reach back or ahead."""
+        self._resolve_bar_timing()
+        if self.bar_duration <= 1e-9:
+            return 0
+        style = self._input_style()
+        hold = max(0.001, self.cfg.press_ms / 1000.0)
+        if self.cfg.use_midi_duration and self.events:
+            hold = max(hold, max(ev.duration for ev in self.events))
+        hold = max(hold, self._min_hold_s()) * (1 + abs(style.duration_variation))
+        eight_bar = self.cfg.eight_bar_style
+        if eight_bar.enabled:
+            hold *= max(1.0, eight_bar.duration_mult_max)
+        # Offsets, stagger and 8-bar time warps move presses across bar lines
+        margin = 2 if eight_bar.enabled else 1
+        return int(hold / self.bar_duration) + margin
+
+    def _input_style(self):
+        if self.cfg.strict_midi_timing:
+            return INPUT_STYLES.get("mechanical", INPUT_STYLES["mechanical"])
+        return INPUT_STYLES.get(self.cfg.input_style, INPUT_STYLES["mechanical"])
+
+    def _min_hold_s(self) -> float:
+        return max(30.0, self.min_key_hold_ms * 3) / 1000.0
+
+    def _resolve_bar_timing(self) -> float:
+        """Set bar_duration / bar_boundaries_sec from the MIDI file and overrides; returns the beat duration."""
+        beat_duration = 0.5
+        if self.cfg.midi_path and os.path.isfile(self.cfg.midi_path):
+            try:
+                self.bar_duration, beat_duration = self._bar_and_beat()
+            except Exception:
+                pass
+        if self.cfg.bar_duration_override > 0:
+            self.bar_duration = self.cfg.bar_duration_override
+        if self.cfg.bar_boundaries_sec:
+            self.bar_boundaries_sec = list(self.cfg.bar_boundaries_sec)
+        return beat_duration
+
+    def _build_event_queue(self, note_to_key: Dict[int, str], avail_notes: List[int],
+                           start_at_time: float = 0.0, bars: Optional[Tuple[int, int]] = None,
+                           next_free: Optional[Dict[str, float]] = None) -> Tuple[List[KeyEvent], int, int, int, int]:
+        """Build the event queue with all press/release events.
+
+        start_at_time > 0 compiles only the part from that score time on
+        (notes overlapping it are trimmed); playback compiles the full plan
+        and seeks instead. `bars` limits the notes to that bar range and
+        skips pause markers (see compile_bars).
+        """
+        event_queue: List[KeyEvent] = []
+        default_press_s = max(0.001, self.cfg.press_ms / 1000.0)
+        speed = max(1e-9, self.cfg.speed)
+        start_at_time = max(0.0, start_at_time)
+        start_at_time_scaled = start_at_time / speed
+
+        # Timeline normalization
+        next_free_time: Dict[str, float] = dict(next_free or {})
+        self.next_free_time = next_free_time
+        self.collisions = CollisionStats()
+        min_hold_s = self._min_hold_s()
+        post_release_s = POST_RELEASE_S
+        max_delay_s = max(0.0, self.cfg.max_collision_delay_ms) / 1000.0
+        token_counter = 0
+
+        # Get input style
+        style = self._input_style()
+        self._log(f"Input style: {self.cfg.input_style} (seed={self._seed})")
+
+        notes_scheduled = 0
+        notes_dropped = 0
+        notes_dropped_accidental = 0  # 黑键/无法映射到布局
+        notes_dropped_octave_conflict = 0  # 八度冲突
+
+        # Calculate bar duration (editor BPM override, Pitfall #2: must be before event queue build)
+        beat_duration_for_filter = self._resolve_bar_timing()
+        if self.cfg.bar_duration_override > 0:
+            self._log(f"Using editor bar duration: {self.bar_duration:.3f}s")
+        if self.cfg.bar_boundaries_sec:
+            self._log(f"Using {len(self.bar_boundaries_sec)} variable bar boundaries")
+
+        # Bar-range compile: the following bars are compiled as collision context, not emitted
+        context_bars = self.collision_reach_bars() if bars is not None else 0
+
+        # 8-bar style setup
+        eight_bar = self.cfg.eight_bar_style
+        eight_bar_segments, segment_duration, beat_duration, warp_start = self._setup_eight_bar(eight_bar, speed)
+        use_warp = eight_bar.enabled and eight_bar.mode == "warp"
+        use_beat_lock = eight_bar.enabled and eight_bar.mode == "beat_lock"
+
+        # Pre-filter/trim events for start_at_time (preserve overlaps)
+        source_events = []
+        source_rng_keys: List[Tuple[int, int]] = []  # (bar, note ordinal in bar) per source event
+        bar_first_index: Dict[int, int] = {}
+        for src_idx, ev in enumerate(self.events):
+            ev_time = ev.time
+            ev_duration = max(0.0, ev.duration)
+            if start_at_time > 0:
+                ev_end = ev_time + ev_duration
+                if ev_duration > 0:
+                    if ev_end <= start_at_time:
+                        continue
+                    if ev_time < start_at_time:
+                        ev_duration = max(0.0, ev_end - start_at_time)
+                        ev_time = start_at_time
+                elif ev_time < start_at_time:
+                    continue
+            rng_bar = int(ev.time / self.bar_duration) if self.bar_duration > 0 else 0
+            if bars is not None and not bars[0] <= rng_bar <= bars[1] + context_bars:
+                continue
+            source_events.append((ev_time, ev_duration, ev))
+            if rng_bar not in bar_first_index:
+                bar_first_index[rng_bar] = self._first_event_index(rng_bar * self.bar_duration)
+            source_rng_keys.append((rng_bar, src_idx - bar_first_index[rng_bar]))
+
+        # Humanization draws, addressed by (bar, note) so any bar reproduces on its own
+        rng_bars = [k[0] for k in source_rng_keys]
+        rng_notes = [k[1] for k in source_rng_keys]
+        timing_draws: List[float] = []
+        if style.timing_offset_ms != (0, 0):
+            timing_draws = stream_uniform_batch(
+                self._seed, STREAM_TIMING, rng_bars, rng_notes,
+                style.timing_offset_ms[0], style.timing_offset_ms[1]
+            )
+        duration_draws: List[float] = []
+        if style.duration_variation > 0:
+            duration_draws = stream_uniform_batch(
+                self._seed, STREAM_DURATION, rng_bars, rng_notes,
+                -style.duration_variation, style.duration_variation
+            )
+        elif style.duration_variation < 0:
+            duration_draws = stream_uniform_batch(
+                self._seed, STREAM_DURATION, rng_bars, rng_notes,
+                style.duration_variation, 0
+            )
+
+        # Precompute chord info for octave policy
+        chord_tolerance = 0.005
+        is_chord_note = [False] * len(source_events)
+        i = 0
+        while i < len(source_events):
+            chord_start = source_events[i][0]
+            j = i + 1
+            while j < len(source_events) and abs(source_events[j][0] - chord_start) < chord_tolerance:
+                j += 1
+            if j - i > 1:
+                for idx in range(i, j):
+                    is_chord_note[idx] = True
+            i = j
+
+        # Build beat pitch info for octave policy
+        beat_pitch_best: Dict[Tuple[int, int], Tuple[float, int]] = {}
+        beat_highest: Dict[int, int] = {}
+        beat_lowest: Dict[int, int] = {}
+
+        if beat_duration_for_filter > 1e-9:
+            for idx, (ev_time, ev_duration, ev) in enumerate(source_events):
+                if is_chord_note[idx]:
+                    continue
+                pitch = ev.note + self.cfg.transpose
+                beat_idx = int(ev_time / beat_duration_for_filter)
+                key = (beat_idx, pitch)
+                best = beat_pitch_best.get(key)
+                if best is None or ev_duration > best[0]:
+                    beat_pitch_best[key] = (ev_duration, idx)
+
+            for (beat_idx, pitch), (duration, idx) in beat_pitch_best.items():
+                if beat_idx not in beat_highest or pitch > beat_highest[beat_idx]:
+                    beat_highest[beat_idx] = pitch
+                if beat_idx not in beat_lowest or pitch < beat_lowest[beat_idx]:
+                    beat_lowest[beat_idx] = pitch
+
+        # First pass: collect notes with quantization
+        effective_policy = self.cfg.accidental_policy if self.cfg.enable_accidental_policy else "drop"
+        processed_notes = []
+        avail_set = set(avail_notes)
+        oct_min, oct_max = quantize_range(self.cfg, avail_notes, effective_policy)
+
+        for idx, (ev_time, ev_duration, ev) in enumerate(source_events):
+            note = ev.note + self.cfg.transpose
+            shifted = False
+            if effective_policy == "octave":
+                beat_idx = None
+                if beat_duration_for_filter > 1e-9 and not is_chord_note[idx]:
+                    beat_idx = int(ev.time / beat_duration_for_filter)
+                shift = get_octave_shift(note, oct_min, oct_max)
+                if shift is not None:
+                    shifted = True
+                    # Avoid dropping octave-shifted notes in strict timing mode.
+                    if not self.cfg.strict_midi_timing:
+                        if beat_idx is None and beat_duration_for_filter > 1e-9 and not is_chord_note[idx]:
+                            beat_idx = int(ev.time / beat_duration_for_filter)
+                        if beat_idx is not None:
+                            if shift < 0:
+                                higher = beat_highest.get(beat_idx)
+                                if higher is not None and higher > note:
+                                    notes_dropped += 1
+                                    notes_dropped_octave_conflict += 1
+                                    continue
+                            else:
+                                lower = beat_lowest.get(beat_idx)
+                                if lower is not None and lower < note:
+                                    notes_dropped += 1
+                                    notes_dropped_octave_conflict += 1
+                                    continue
+
+            q = quantize_note(note, avail_notes, effective_policy, oct_min, oct_max)
+            if q is None:
+                notes_dropped += 1
+                notes_dropped_accidental += 1
+                continue
+
+            key = note_to_key[q]
+            if effective_policy == "octave":
+                shifted = (q != note)
+            processed_notes.append((ev_time, ev_duration, key, q, shifted, idx, note))
+
+        # Second pass: apply humanization, then resolve key collisions and schedule events
+        placed: List[Tuple[NoteIntent, dict, int]] = []   # (intent, note info, bar index)
+        i = 0
+        while i < len(processed_notes):
+            chord_start = processed_notes[i][0]
+            chord_notes = []
+
+            while i < len(processed_notes) and abs(processed_notes[i][0] - chord_start) < chord_tolerance:
+                chord_notes.append(processed_notes[i])
+                i += 1
+
+            chord_start_scaled = chord_start / speed
+
+            # Get 8-bar multipliers for this chord (use scaled timeline)
+            speed_mult, timing_mult, duration_8bar_mult, section_selected = self._get_section_multipliers(
+                chord_start_scaled, eight_bar_segments, segment_duration
+            )
+
+            bar_index = int(chord_start / self.bar_duration) if self.bar_duration > 0 else 0
+            seg_start = int(chord_start_scaled / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
+
+            # Process each note in chord
+            chord_processed = []
+            for note_idx, (orig_time, orig_duration, key, q, shifted, src_pos, pitch) in enumerate(chord_notes):
+                base_time = orig_time
+
+                # Apply timing offset (humanization)
+                offset_s = 0.0
+                if timing_draws:
+                    offset_s += timing_draws[src_pos] / 1000.0
+
+                # Apply stagger for chords
+                if style.stagger_ms > 0 and len(chord_notes) > 1:
+                    stagger_offset = note_idx * (style.stagger_ms / 1000.0)
+                    offset_s += stagger_offset
+
+                base_time += offset_s
+                base_time /= speed
+
+                if eight_bar.enabled:
+                    base_time = seg_start + (base_time - seg_start) * timing_mult
+                    if use_warp:
+                        base_time, _ = self._map_time_warp(
+                            base_time, 1.0, eight_bar_segments, segment_duration, warp_start
+                        )
+                    elif use_beat_lock:
+                        base_time, _ = self._map_time_beat_lock(
+                            base_time, 1.0, eight_bar_segments, segment_duration, beat_duration
+                        )
+
+                desired_time = max(start_at_time_scaled, base_time)
+
+                # Determine note duration
+                if self.cfg.use_midi_duration and orig_duration > 0:
+                    duration = orig_duration
+                else:
+                    duration = default_press_s
+
+                # Apply duration variation
+                if duration_draws:
+                    duration *= (1 + duration_draws[src_pos])
+                    duration = max(0.01, duration)
+
+                duration = max(duration, min_hold_s)
+                duration /= speed
+                if eight_bar.enabled:
+                    duration *= duration_8bar_mult
+
+                chord_processed.append({
+                    'key': key,
+                    'key_lower': key.lower(),
+                    'q': q,
+                    'pitch': pitch,
+                    'desired_time': desired_time,
+                    'duration': duration,
+                    'order': note_idx,
+                    'shifted': shifted,
+                })
+
+            # Same-key notes within a chord: unshifted notes win over octave-shifted ones
+            key_groups: Dict[str, List[dict]] = {}
+            for note_info in chord_processed:
+                key_groups.setdefault(note_info['key_lower'], []).append(note_info)
+
+            chord_placed = []
+            for key_lower, notes in key_groups.items():
+                has_unshifted = any(not item['shifted'] for item in notes)
+                if has_unshifted:
+                    notes = [item for item in notes if not item['shifted']]
+                elif len(notes) > 1:
+                    best = max(notes, key=lambda item: (item['duration'], -item['order']))
+                    notes = [best]
+                for note_info in notes:
+                    intent = NoteIntent(key_lower, note_info['desired_time'], note_info['duration'],
+                                        order=len(placed) + len(chord_placed))
+                    chord_placed.append((intent, note_info, bar_index))
+
+            if self.cfg.strict_midi_timing:
+                # Strict timing: only notes of the same chord are serialized
+                self.collisions.merge(resolve_collisions(
+                    [item[0] for item in chord_placed], {}, min_hold_s, post_release_s, max_delay_s
+                ))
+            placed.extend(chord_placed)
+
+        # Key collisions (sweep line per key): shorten holds first, delay a press only when needed,
+        # merge repeats that would be later than max_collision_delay_ms
+        if not self.cfg.strict_midi_timing:
+            self.collisions = resolve_collisions(
+                [item[0] for item in placed], next_free_time, min_hold_s, post_release_s, max_delay_s
+            )
+
+        for intent, note_info, bar_index in placed:
+            if intent.merged:
+                continue  # The previous press of the key covers it
+            if bars is not None and bar_index > bars[1]:
+                continue  # Collision context after the requested bars
+            token_counter += 1
+            heapq.heappush(event_queue, KeyEvent(
+                intent.start, 2, "press", note_info['key'], note_info['q'], bar_index=bar_index,
+                token=token_counter, pitch=note_info['pitch']
+            ))
+            heapq.heappush(event_queue, KeyEvent(
+                intent.release, 1, "release", note_info['key'], note_info['q'], bar_index=bar_index,
+                token=token_counter, pitch=note_info['pitch']
+            ))
+            notes_scheduled += 1
+            if not self.cfg.strict_midi_timing:
+                next_free_time[intent.key] = max(next_free_time.get(intent.key, 0.0),
+                                                 intent.release + post_release_s)
+
+        # Insert pause markers at bar boundaries (for pause-at-bar)
+        # 优先使用可变小节边界列表 (支持拉长/压缩的小节)
+        if bars is not None:
+            pass  # Bar-range compile: the plan keeps its markers
+        elif self.bar_boundaries_sec and self.events:
+            # 使用预计算的小节边界时间
+            for bar_idx, boundary_orig in enumerate(self.bar_boundaries_sec, start=1):
+                if boundary_orig <= 0:
+                    continue  # 跳过 0 时刻 (第 1 小节起点不需要暂停标记)
+                boundary_time = boundary_orig / speed
+                if eight_bar.enabled:
+                    _, timing_mult, _, _ = self._get_section_multipliers(
+                        boundary_time, eight_bar_segments, segment_duration
+                    )
+                    seg_start = int(boundary_time / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
+                    mapped_time = seg_start + (boundary_time - seg_start) * timing_mult
+                    if use_warp:
+                        mapped_time, _ = self._map_time_warp(
+                            mapped_time, 1.0, eight_bar_segments, segment_duration, warp_start
+                        )
+                    elif use_beat_lock:
+                        mapped_time, _ = self._map_time_beat_lock(
+                            mapped_time, 1.0, eight_bar_segments, segment_duration, beat_duration
+                        )
+                    boundary_time = mapped_time
+                pause_marker_time = max(0.0, boundary_time - 0.001)
+                heapq.heappush(
+                    event_queue,
+                    KeyEvent(pause_marker_time, 0, "pause_marker", "", 0, bar_index=bar_idx)
+                )
+        elif self.bar_duration > 1e-9 and self.events:
+            # 兜底: 使用固定小节时长计算边界
+            total_time = max(e.time + e.duration for e in self.events)
+            num_bars = int(total_time / self.bar_duration) + 1
+            for bar_idx in range(1, num_bars + 1):
+                boundary_orig = bar_idx * self.bar_duration
+                boundary_time = boundary_orig / speed
+                if eight_bar.enabled:
+                    _, timing_mult, _, _ = self._get_section_multipliers(
+                        boundary_time, eight_bar_segments, segment_duration
+                    )
+                    seg_start = int(boundary_time / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
+                    mapped_time = seg_start + (boundary_time - seg_start) * timing_mult
+                    if use_warp:
+                        mapped_time, _ = self._map_time_warp(
+                            mapped_time, 1.0, eight_bar_segments, segment_duration, warp_start
+                        )
+                    elif use_beat_lock:
+                        mapped_time, _ = self._map_time_beat_lock(
+                            mapped_time, 1.0, eight_bar_segments, segment_duration, beat_duration
+                        )
+                    boundary_time = mapped_time
+                pause_marker_time = max(0.0, boundary_time - 0.001)
+                heapq.heappush(
+                    event_queue,
+                    KeyEvent(pause_marker_time, 0, "pause_marker", "", 0, bar_index=bar_idx)
+                )
+
+        return event_queue, notes_scheduled, notes_dropped, notes_dropped_accidental, notes_dropped_octave_conflict
+
+    def _compile_errors(self, event_queue: List[KeyEvent], note_to_key: Dict[int, str], speed: float) -> List[KeyEvent]:
+        """Compile ErrorConfig mistakes into the event queue."""
+        error_cfg = self.cfg.error_config
+        self.applied_errors = []
+        if not error_cfg.enabled:
+            return event_queue
+
+        seed = error_cfg.seed if error_cfg.seed is not None else self._seed
+        group_duration = self.bar_duration * 8 / speed
+        event_queue, self.applied_errors = compile_errors(
+            event_queue, error_cfg, note_to_key, group_duration, seed
+        )
+        self._log(
+            f"Error simulation: ON ({error_cfg.errors_per_8bars}/8bars, seed={seed}, "
+            f"{len(self.applied_errors)} planned)"
+        )
+        return event_queue
+
+    def _resolve_error_collisions(self, event_queue: List[KeyEvent]) -> List[KeyEvent]:
+        """Re-run key collision resolution on the keys simulated errors pressed.
+
+        Wrong and extra notes are added after the notes were placed, so they can
+        land inside another note's hold on their key. Those keys are swept again
+        with the same gap / minimum hold / max delay; the other keys are already
+        resolved and a resolved key is left as it is. An error note merged there
+        is not played, so its error_marker and AppliedError are dropped too.
+        """
+        keys = {error.key.lower() for error in self.applied_errors
+                if error.error_type in ("wrong_note", "extra_note") and error.key}
+        if not keys or self.cfg.strict_midi_timing:
+            return event_queue
+
+        presses: Dict[int, KeyEvent] = {}
+        releases: Dict[int, KeyEvent] = {}
+        for ev in event_queue:
+            if ev.key.lower() in keys and ev.token:
+                if ev.event_type == "press":
+                    presses[ev.token] = ev
+                elif ev.event_type == "release":
+                    releases[ev.token] = ev
+        pairs = [(presses[token], releases[token]) for token in presses if token in releases]
+        intents = [
+            NoteIntent(press.key.lower(), press.time, release.time - press.time, order=i)
+            for i, (press, release) in enumerate(pairs)
+        ]
+        stats = resolve_collisions(intents, {}, self._min_hold_s(), POST_RELEASE_S,
+                                   max(0.0, self.cfg.max_collision_delay_ms) / 1000.0)
+        stats.notes = 0  # Already counted by the first pass
+
+        removed = set()
+        merged_notes = set()
+        for intent, (press, release) in zip(intents, pairs):
+            if intent.merged:
+                removed.update((id(press), id(release)))
+                merged_notes.add((press.time, press.key.lower(), press.note))
+            else:
+                press.time, release.time = intent.start, intent.release
+        self.collisions.merge(stats)
+
+        # Errors whose note was merged never happen: drop them, renumber the other markers
+        dropped = set()
+        for ev in event_queue:
+            if (ev.event_type == "error_marker" and ev.error in ("wrong_note", "extra_note")
+                    and (ev.time, ev.key.lower(), ev.note) in merged_notes):
+                removed.add(id(ev))
+                dropped.add(ev.token)
+        if dropped:
+            new_index = {}
+            kept_errors = []
+            for index, error in enumerate(self.applied_errors):
+                if index not in dropped:
+                    new_index[index] = len(kept_errors)
+                    kept_errors.append(error)
+            self.applied_errors = kept_errors
+            for ev in event_queue:
+                if ev.event_type == "error_marker" and id(ev) not in removed:
+                    ev.token = new_index[ev.token]
+            self._log(f"Error simulation: {len(dropped)} error note(s) merged by key collisions, not played")
+        return sorted(ev for ev in event_queue if id(ev) not in removed)
+
+    def _first_event_index(self, t: float) -> int:
+        """Index of the first source event with time >= t (events are time-sorted)."""
+        lo, hi = 0, len(self.events)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.events[mid].time < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _setup_eight_bar(self, eight_bar, speed: float):
+        """Setup 8-bar style variation parameters."""
+        eight_bar_segments: Dict[int, Tuple[float, float, float, bool]] = {}
+        segment_duration = 16.0
+        beat_duration = 0.5
+        warp_start: List[float] = []
+
+        if not eight_bar.enabled or not self.events:
+            return eight_bar_segments, segment_duration, beat_duration, warp_start
+
+        # Calculate real bar and beat duration from MIDI
+        bar_duration = 2.0
+        if self.cfg.midi_path and os.path.isfile(self.cfg.midi_path):
+            try:
+                bar_duration, beat_duration = self._bar_and_beat()
+                self._log(f"8-Bar: bar_duration={bar_duration:.3f}s, beat_duration={beat_duration:.3f}s")
+            except Exception as e:
+                self._log(f"8-Bar: using defaults (error: {e})")
+
+        if speed > 1e-9:
+            bar_duration /= speed
+            beat_duration /= speed
+
+        segment_duration = bar_duration * 8
+        total_duration = max(e.time + e.duration for e in self.events)
+        num_segments = max(1, int(total_duration / segment_duration) + 1)
+
+        # Determine selection pattern
+        pattern = eight_bar.selection_pattern
+        if pattern == "continuous":
+            period, pick_mod = 1, 0
+        elif pattern == "skip3_pick1":
+            period, pick_mod = 4, 3
+        elif pattern == "skip2_pick1":
+            period, pick_mod = 3, 2
+        else:  # skip1_pick1
+            period, pick_mod = 2, 1
+
+        # Pre-generate multipliers
+        for seg_idx in range(num_segments):
+            selected = (seg_idx % period == pick_mod)
+            if selected:
+                speed_mult = stream_uniform(self._seed, STREAM_EIGHT_BAR, seg_idx, 0,
+                                            eight_bar.speed_mult_min, eight_bar.speed_mult_max)
+                timing_mult = stream_uniform(self._seed, STREAM_EIGHT_BAR, seg_idx, 1,
+                                             eight_bar.timing_mult_min, eight_bar.timing_mult_max)
+                duration_mult = stream_uniform(self._seed, STREAM_EIGHT_BAR, seg_idx, 2,
+                                               eight_bar.duration_mult_min, eight_bar.duration_mult_max)
+                if eight_bar.clamp_enabled:
+                    clamp_min = min(eight_bar.clamp_min, eight_bar.clamp_max)
+                    clamp_max = max(eight_bar.clamp_min, eight_bar.clamp_max)
+                    speed_mult = max(clamp_min, min(speed_mult, clamp_max))
+                    timing_mult = max(clamp_min, min(timing_mult, clamp_max))
+                    duration_mult = max(clamp_min, min(duration_mult, clamp_max))
+            else:
+                speed_mult, timing_mult, duration_mult = 1.0, 1.0, 1.0
+            eight_bar_segments[seg_idx] = (speed_mult, timing_mult, duration_mult, selected)
+
+        # Build warp_start array
+        warp_start = [0.0]
+        for seg_idx in range(num_segments):
+            speed_mult_i = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))[0]
+            actual_seg_duration = segment_duration / max(1e-9, speed_mult_i)
+            warp_start.append(warp_start[-1] + actual_seg_duration)
+
+        selected_count = sum(1 for v in eight_bar_segments.values() if v[3])
+        mode_str = "Tempo Warp" if eight_bar.mode == "warp" else "Beat-Lock"
+        self._log(f"8-Bar {mode_str}: {selected_count}/{num_segments} segments selected ({pattern})")
+
+        return eight_bar_segments, segment_duration, beat_duration, warp_start
+
+    def _get_section_multipliers(self, orig_time: float, eight_bar_segments: Dict, segment_duration: float) -> Tuple[float, float, float, bool]:
+        """Get multipliers for the segment at orig_time."""
+        if not eight_bar_segments:
+            return (1.0, 1.0, 1.0, False)
+        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
+        return eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))
+
+    def _map_time_warp(self, orig_time: float, base_speed: float, eight_bar_segments: Dict, segment_duration: float, warp_start: List[float]) -> Tuple[float, float]:
+        """Tempo Warp time mapping."""
+        if not eight_bar_segments or not warp_start:
+            return (orig_time / max(1e-9, base_speed), base_speed)
+
+        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
+        seg_idx = min(seg_idx, len(warp_start) - 2)
+
+        speed_mult = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))[0]
+        effective_speed = base_speed * speed_mult
+
+        seg_start_orig = seg_idx * segment_duration
+        offset_in_seg = orig_time - seg_start_orig
+        mapped_offset = offset_in_seg / max(1e-9, speed_mult)
+        mapped_time = (warp_start[seg_idx] + mapped_offset) / max(1e-9, base_speed)
+
+        return (mapped_time, effective_speed)
+
+    def _map_time_beat_lock(self, orig_time: float, base_speed: float, eight_bar_segments: Dict, segment_duration: float, beat_duration: float) -> Tuple[float, float]:
+        """Beat-Lock time mapping."""
+        if not eight_bar_segments or beat_duration <= 1e-9:
+            return (orig_time / max(1e-9, base_speed), base_speed)
+
+        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
+
+        speed_mult, timing_mult, _, _ = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))
+        effective_speed = base_speed * speed_mult
+
+        seg_start_orig = seg_idx * segment_duration
+        offset_in_seg = orig_time - seg_start_orig
+
+        beat_index = int(offset_in_seg / beat_duration)
+        frac_in_beat = offset_in_seg - (beat_index * beat_duration)
+        scaled_frac = frac_in_beat * timing_mult
+
+        mapped_offset = (beat_index * beat_duration) + scaled_frac
+        mapped_time = (seg_start_orig + mapped_offset) / max(1e-9, base_speed * speed_mult)
+
+        return (mapped_time, effective_speed)
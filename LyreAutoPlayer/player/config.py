@@ -37,6 +37,7 @@ class PlayerConfig:
 
     # Input style (humanization)
     input_style: str = "mechanical"  # mechanical, natural, expressive, aggressive
+    humanize_seed: Optional[int] = None  # 人性化随机种子 (None=每次播放新种子)
 
     # Error simulation (human-like mistakes)
     error_config: ErrorConfig = field(default_factory=ErrorConfig)
@@ -46,10 +47,12 @@ class PlayerConfig:
 
     # Diagnostics (for debugging input issues)
     enable_diagnostics: bool = False
+    stall_threshold_ms: float = 20.0      # 卡顿看门狗阈值 (毫秒), 诊断模式下超时即抓取线程堆栈
 
     # Unified playback engine (统一播放引擎)
     strict_mode: bool = True              # 严格跟谱模式 (默认开启)
     strict_midi_timing: bool = False      # 严格遵循 MIDI 时序（禁用风格演奏）
+    max_collision_delay_ms: float = 50.0  # 同键冲突: 按下最多推迟 (毫秒), 更晚则并入上一次按下 (不再重按)
     pause_every_bars: int = 0             # 自动暂停间隔 (0=禁用, 1/2/4/8)
     auto_resume_countdown: int = 3        # 倒计时秒数
     bar_duration_override: float = 0.0    # 覆盖小节时长 (秒), 0=自动计算
@@ -57,7 +60,24 @@ class PlayerConfig:
     editor_bpm: int = 0                   # 编辑器 BPM, 0=使用 MIDI 原始值
     start_at_time: float = 0.0            # 从指定时间开始播放 (秒)
     skip_countdown: bool = False          # 跳过倒计时 (用于从上一小节恢复)
+    loop_enabled: bool = False            # A-B 循环练习: 反复播放 loop_start_bar..loop_end_bar
+    loop_start_bar: int = 0               # 循环起始小节 (0-based, 含)
+    loop_end_bar: int = 0                 # 循环结束小节 (0-based, 含)
+    loop_speedup_pct: float = 0.0         # 每循环一遍提速百分比 (0=不变)
+    playlist: List[str] = field(default_factory=list)  # 播放列表: 当前曲目之后依次播放的 MIDI 文件
+    playlist_gap_s: float = 2.0           # 曲目间隔 (秒), 下一首在后台预编译, 无倒计时
+    plan_path: str = ""                   # 播放已保存的 .lyreplan 计划 (不重新编译, 使用文件中的键位/速度/种子)
+    sync_start_at: Optional[float] = None  # 局域网同步: 本机 perf_counter 开始时刻 (lan_sync 换算), 代替倒计时
 
     # Output scheduler (key injection timing)
     late_drop_ms: float = 25.0            # 丢弃超时阈值 (毫秒), 超过则跳过该按键
     enable_late_drop: bool = True         # 启用延迟丢弃策略 (防止密集和弦堆积)
+    late_policy: str = "drop"             # 超时处理: drop (丢弃) / compress (追赶压缩) / melody (优先保留旋律)
+    adaptive_late_drop: bool = True       # 阈值随实测延迟 p99 自适应 (late_drop_ms 为初始值)
+    speed_governor: bool = False          # 调速器: 派发落后时平滑放慢播放时钟, 之后几小节内恢复
+    governor_min_rate: float = 0.8        # 调速器最低速率 (0.8 = 最多放慢 20%)
+
+    # Key injection backend / isolation
+    input_backend: str = "sendinput"      # sendinput, pydirectinput, keyboard, debug (不发送按键)
+    dispatch_process: bool = False        # 在独立进程中派发按键 (UI 卡顿不影响按键时序)
+    performance_mode: bool = False        # 性能模式: 冻结 GC, 仅在空闲窗口/小节边界回收
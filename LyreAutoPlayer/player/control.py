@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Playback control state machine (clock + pause/resume/stop/countdown-skip).
+
+A single PlaybackControl is shared by the PlayerThread dispatcher and the
+OutputScheduler. Both block on its condition variable until their next
+deadline or a state change, so pause, resume, stop and countdown-skip take
+effect immediately instead of at the next polling tick.
+
+Every state change also publishes an immutable ClockSnapshot. UI timers
+read it without locks or signals and interpolate the playhead themselves.
+
+Playback time is running time (real seconds, pauses excluded) mapped
+through a piecewise-linear TimeMap. Its rate is the live tempo factor
+(set_tempo, speed hotkeys) times the governor warp (set_rate, SpeedGovernor);
+either change appends a segment at "now". Deadlines stay in playback time,
+so waiters only stretch or shrink their real-time waits.
+"""
+
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from .timemap import TimeMap
+
+# Deadlines closer than this are finished with a yielding spin instead of a
+# condition wait (OS timer granularity is too coarse for sub-ms dispatch).
+SPIN_THRESHOLD_S = 0.0015
+
+
+class ClockSnapshot(NamedTuple):
+    """
+    Published playback clock: position(t) = base + (t - anchor) * rate.
+
+    Replaced as a whole on every state change; a single attribute read is
+    atomic, so readers on any thread get a consistent snapshot.
+    """
+    base: float        # Playback time at `anchor`
+    anchor: float      # Clock reading when published
+    rate: float        # Playback seconds per real second while running
+    running: bool      # False before start, while paused and after stop
+    duration: float    # Total playback duration (0 = unknown)
+
+    def position(self, now: float) -> float:
+        """Playback time at clock reading `now`."""
+        if not self.running:
+            return self.base
+        return self.base + (now - self.anchor) * self.rate
+
+
+class PlaybackControl:
+    """
+    Playback clock with pause accounting and interruptible waits.
+
+    States: running, paused, stopped. Every state change bumps a generation
+    counter and wakes all waiters, which then re-evaluate their deadline.
+
+    Usage:
+        control = PlaybackControl()
+        control.start(time.perf_counter())
+        if control.wait_until(event_time):
+            ...  # deadline reached
+        else:
+            ...  # paused / stopped / state changed: re-check
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self.condition = threading.Condition()
+        self._origin = clock()
+        self._total_pause = 0.0
+        self._pause_start = 0.0
+        self._paused = False
+        self._stopped = False
+        self._skip_requested = False
+        self._generation = 0
+        self._started = False
+        self._duration = 0.0
+        # Running time -> playback time; rate = tempo * warp
+        self._tempo = 1.0
+        self._warp_rate = 1.0
+        self._map = TimeMap()
+        self.snapshot = ClockSnapshot(0.0, self._origin, 1.0, False, 0.0)
+        # Optional listener for every published snapshot (called under the lock; keep it short)
+        self.on_publish: Optional[Callable[[ClockSnapshot], None]] = None
+
+    # ---- state changes ----
+
+    def _changed(self):
+        """Bump generation, publish the clock and wake every waiter (lock must be held)."""
+        self._generation += 1
+        self._publish()
+        self.condition.notify_all()
+
+    def _publish(self):
+        """Replace the published ClockSnapshot (lock must be held)."""
+        anchor = self._clock()
+        running = self._started and not self._paused and not self._stopped
+        base = self._position(anchor) if self._started else 0.0
+        self.snapshot = ClockSnapshot(base, anchor, self._map.rate, running, self._duration)
+        if self.on_publish is not None:
+            self.on_publish(self.snapshot)
+
+    def set_duration(self, duration: float):
+        """Publish the total duration (no waiter is woken)."""
+        with self.condition:
+            self._duration = max(0.0, duration)
+            self._publish()
+
+    def start(self, origin: Optional[float] = None):
+        """(Re)start the clock: playback time 0 corresponds to `origin`."""
+        with self.condition:
+            self._origin = self._clock() if origin is None else origin
+            self._total_pause = 0.0
+            self._paused = False
+            self._stopped = False
+            self._skip_requested = False
+            self._started = True
+            self._map = TimeMap(rate=self._tempo * self._warp_rate)
+            self._changed()
+
+    def pause(self) -> bool:
+        """Freeze the clock. Returns False if already paused/stopped."""
+        with self.condition:
+            if self._paused or self._stopped:
+                return False
+            self._paused = True
+            self._pause_start = self._clock()
+            self._changed()
+            return True
+
+    def resume(self) -> float:
+        """Unfreeze the clock. Returns the pause duration (0 if not paused)."""
+        with self.condition:
+            if not self._paused:
+                return 0.0
+            duration = self._clock() - self._pause_start
+            self._total_pause += duration
+            self._paused = False
+            self._changed()
+            return duration
+
+    def stop(self):
+        """Stop: every current and future wait returns immediately."""
+        with self.condition:
+            self._stopped = True
+            self._changed()
+
+    def seek(self, t: float):
+        """Rebase the clock so that now() == t (keeps the paused state)."""
+        with self.condition:
+            reference = self._pause_start if self._paused else self._clock()
+            self._origin = reference - self._total_pause - t
+            self._map.rebase(t, t)
+            self._changed()
+
+    def set_rate(self, rate: float):
+        """Governor warp: playback advances `rate` (times the tempo) seconds per real second."""
+        with self.condition:
+            self._warp_rate = max(0.05, rate)
+            self._retime()
+
+    def set_tempo(self, factor: float):
+        """Live tempo change relative to the compiled plan (1.0 = speed at Start)."""
+        with self.condition:
+            self._tempo = max(0.05, factor)
+            self._retime()
+
+    def _retime(self):
+        """
+        Append a time-map segment at now with the current rate (lock must be
+        held). now() stays continuous; waiters are woken to re-evaluate their
+        waits, but their deadlines stay valid (no generation bump).
+        """
+        rate = self._tempo * self._warp_rate
+        if rate == self._map.rate:
+            return
+        self._map.append(self._running_time(self._clock()), rate)
+        self._publish()
+        self.condition.notify_all()
+
+    def request_skip(self):
+        """Ask a running countdown (wait_interval) to finish early."""
+        with self.condition:
+            self._skip_requested = True
+            self._changed()
+
+    def notify(self):
+        """Wake waiters without changing state (e.g. new work queued)."""
+        with self.condition:
+            self._changed()
+
+    # ---- queries ----
+
+    def _running_time(self, reading: float) -> float:
+        """Unwarped seconds since the origin, pauses excluded (frozen while paused)."""
+        if self._paused:
+            return self._pause_start - self._origin - self._total_pause
+        return reading - self._origin - self._total_pause
+
+    def _position(self, reading: float) -> float:
+        segment = self._map.last
+        return segment.position + (self._running_time(reading) - segment.running) * segment.rate
+
+    def now(self) -> float:
+        """Current playback time in seconds (frozen while paused)."""
+        return self._position(self._clock())
+
+    def wall_time(self, target: float) -> float:
+        """Clock reading at which playback reaches `target` at the current rate (now if paused)."""
+        reading = self._clock()
+        if self._paused or self._stopped:
+            return reading
+        return reading + (target - self._position(reading)) / max(1e-9, self._map.rate)
+
+    @property
+    def rate(self) -> float:
+        """Current clock rate: tempo * warp (1.0 = as compiled)."""
+        return self._map.rate
+
+    @property
+    def warp_rate(self) -> float:
+        """Governor part of the rate."""
+        return self._warp_rate
+
+    @property
+    def tempo(self) -> float:
+        """Live tempo factor (1.0 = speed at Start)."""
+        return self._tempo
+
+    @property
+    def time_map(self) -> TimeMap:
+        return self._map
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+    def is_stopped(self) -> bool:
+        return self._stopped
+
+    # ---- waits ----
+
+    def wait_until(self, target: float, max_wait: Optional[float] = None,
+                   interrupt: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Block until playback time reaches `target`.
+
+        Args:
+            target: Playback time to wait for (seconds)
+            max_wait: Optional cap on real time spent waiting (seconds)
+            interrupt: Optional predicate checked on every wake-up (under the
+                lock); the wait ends early when it returns True
+
+        Returns:
+            True if the deadline was reached, False if the wait was cut short
+            (pause, stop, any other state change, interrupt, or max_wait).
+        """
+        give_up = None if max_wait is None else self._clock() + max_wait
+        with self.condition:
+            generation = self._generation
+        while True:
+            with self.condition:
+                if self._stopped or self._paused or self._generation != generation:
+                    return False
+                if interrupt is not None and interrupt():
+                    return False
+                remaining = target - self.now()
+                if remaining <= 0:
+                    return True
+                remaining /= self._map.rate  # Real seconds at the current rate
+                if give_up is not None:
+                    left = give_up - self._clock()
+                    if left <= 0:
+                        return False
+                    if left < remaining:
+                        self.condition.wait(left)
+                        continue
+                if remaining > SPIN_THRESHOLD_S:
+                    self.condition.wait(remaining - SPIN_THRESHOLD_S)
+                    continue
+            time.sleep(0)
+
+    def wait_resumed(self, interrupt: Optional[Callable[[], bool]] = None) -> bool:
+        """Block while paused (or until `interrupt()`). Returns False if stopped."""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self._stopped or not self._paused or (interrupt is not None and interrupt())
+            )
+            return not self._stopped
+
+    def wait_interval(self, seconds: float, until: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Block for `seconds` of real time (used for countdown ticks).
+
+        Returns early on stop, on request_skip(), or when `until()` becomes
+        true (evaluated on every state change).
+
+        Returns:
+            True if the full interval elapsed, False if interrupted.
+        """
+        def interrupted() -> bool:
+            return self._stopped or self._skip_requested or (until is not None and until())
+
+        with self.condition:
+            return not self.condition.wait_for(interrupted, timeout=seconds)
+
+    def consume_skip(self) -> bool:
+        """Return and clear a pending countdown-skip request."""
+        with self.condition:
+            skipped = self._skip_requested
+            self._skip_requested = False
+            return skipped
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Dispatcher process: key injection isolated from the UI process's GIL.
+
+With PlayerConfig.dispatch_process the compiled plan is written to
+multiprocessing.shared_memory (see shared_plan.py) and a spawned child runs
+PlayerThread._dispatch() on it: the same output scheduler and playback loop
+as in-process playback, with its own input manager. Repaints and editor
+operations in the UI process can then no longer delay key injection.
+
+The parent PlayerThread relays control commands (pause/resume/stop/seek)
+over a pipe; the child's command thread blocks on it, so a command is
+applied as soon as it arrives. Telemetry comes back on the same pipe
+(relayed signals, clock snapshots). The pause-pending flag and the current
+bar live in a small shared array that both processes read and write
+directly. Both processes read time.perf_counter(), which is a system-wide
+monotonic clock on Windows, Linux and macOS, so the child's clock origin is
+the parent's playback start.
+
+Not available in this mode: diagnostics traces and sound monitoring (the
+trace writers and the synth live in the parent). PlayerThread dispatches
+in-process when either is on.
+"""
+
+import multiprocessing
+import threading
+from typing import Callable, List, Optional, Sequence
+
+from .config import PlayerConfig
+from .plan import PlaybackPlan
+from .scheduler import KeyEvent
+from .shared_plan import SharedPlan, read_shared_plan
+
+# Parent -> child commands
+CMD_PAUSE = "pause"
+CMD_RESUME = "resume"
+CMD_STOP = "stop"
+CMD_SEEK = "seek"          # ("seek", time_sec or None, bar or None)
+CMD_TEMPO = "tempo"        # ("tempo", speed) live tempo change
+CMD_OCTAVE = "octave"      # ("octave", shift) live octave change
+CMD_PATCH = "patch"        # ("patch", PlanPatch) edited bars to splice into the plan
+CMD_LOOP = "loop"          # ("loop", first_bar, last_bar, speedup_pct) or ("loop", None) to clear
+CMD_SONG = "song"          # ("song", PreparedSong with events in shared memory) or ("song", None): playlist end
+CMD_START = "start"        # ("start", playback_start_time) once the parent has seen MSG_READY
+
+# Child -> parent messages
+MSG_READY = "ready"        # Plan read and player set up; the shared block may be released
+MSG_SIGNAL = "signal"      # ("signal", name, args)
+MSG_CLOCK = "clock"        # ("clock", ClockSnapshot fields)
+MSG_DONE = "done"          # ("done", errors_applied, {result attribute: value})
+
+# PlayerThread attributes reported back with MSG_DONE
+RESULT_ATTRS = ("scheduler_stats", "time_to_first_note_ms", "stall_snapshots", "gc_stats", "late_report", "warp_decisions")
+
+# PlayerThread signals forwarded from the child
+RELAYED_SIGNALS = ("log", "paused", "resumed", "countdown_tick", "auto_pause_at_bar", "playback_key", "song_changed")
+
+# Shared state slots (RawArray of ints, read and written by both processes)
+STATE_PAUSE_PENDING = 0
+STATE_CURRENT_BAR = 1
+
+
+class DispatcherProcess:
+    """
+    Parent-side handle of the dispatcher child.
+
+    Usage:
+        remote = DispatcherProcess(plan.events, cfg, init)
+        remote.start()
+        while True:
+            msg = remote.poll(0.1)
+            ...
+        remote.close()
+    """
+
+    def __init__(self, events: List[KeyEvent], cfg: PlayerConfig, init: dict):
+        """
+        Args:
+            events: Compiled plan events
+            cfg: Player configuration (pickled to the child)
+            init: Dispatcher state to restore in the child (seed, bar
+                duration, applied errors, seek request, ...); the start time
+                follows with CMD_START after MSG_READY
+        """
+        self._shared: Optional[SharedPlan] = SharedPlan(events)
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._send_lock = threading.Lock()
+        self.state = ctx.RawArray("i", 2)
+        self.state[STATE_CURRENT_BAR] = -1
+        self._process = ctx.Process(
+            target=dispatcher_main,
+            args=(self._shared.name, cfg, init, child_conn, self.state),
+            name="LyreDispatcher",
+            daemon=True,
+        )
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid
+
+    def start(self):
+        self._process.start()
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def send(self, command: str, *args):
+        """Send a command (any thread). Ignored once the child is gone."""
+        with self._send_lock:
+            try:
+                self._conn.send((command,) + args)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+
+    def poll(self, timeout: float) -> Optional[tuple]:
+        """Next message from the child, or None (timeout / child gone)."""
+        try:
+            if self._conn.poll(timeout):
+                return self._conn.recv()
+        except (OSError, EOFError):
+            pass
+        return None
+
+    def release_plan(self):
+        """Free the shared plan block (after MSG_READY)."""
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def close(self, timeout: float = 2.0):
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+        self.release_plan()
+        self._conn.close()
+
+
+class _Relay:
+    """Stand-in for a pyqtSignal in the child: emit() forwards to the parent."""
+
+    def __init__(self, send: Callable[[tuple], None], name: str):
+        self._send = send
+        self._name = name
+
+    def emit(self, *args):
+        self._send((MSG_SIGNAL, self._name, args))
+
+    def connect(self, *args):
+        pass
+
+
+def _shared_state_player(state: Sequence[int]):
+    """PlayerThread subclass whose pause-pending flag and current bar live in `state`."""
+    from .thread import PlayerThread  # Child-only import (Qt + input backend)
+
+    class SharedStatePlayer(PlayerThread):
+        @property
+        def _pause_pending(self) -> bool:
+            return bool(state[STATE_PAUSE_PENDING])
+
+        @_pause_pending.setter
+        def _pause_pending(self, value: bool):
+            state[STATE_PAUSE_PENDING] = int(value)
+
+        @property
+        def _current_bar(self) -> int:
+            return state[STATE_CURRENT_BAR]
+
+        @_current_bar.setter
+        def _current_bar(self, value: int):
+            state[STATE_CURRENT_BAR] = value
+
+    return SharedStatePlayer
+
+
+def dispatcher_main(plan_name: str, cfg: PlayerConfig, init: dict, conn, state: Sequence[int]):
+    """Child entry point: run the dispatch stage of PlayerThread on a shared plan."""
+    send_lock = threading.Lock()
+
+    def send(message: tuple):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+
+    events = read_shared_plan(plan_name)
+
+    player = _shared_state_player(state)([], cfg)
+    for name in RELAYED_SIGNALS:
+        setattr(player, name, _Relay(send, name))
+    player._seed = init["seed"]
+    player._bar_duration = init["bar_duration"]
+    player._applied_errors = init["applied_errors"]
+    player._total_duration = init["total_duration"]
+    player._created_at = init["created_at"]
+    player._countdown_s = init["countdown_s"]
+    player._play_from = init["play_from"]
+    player._session.plays = init["plays"]
+    player._session.hits = init["session_hits"]  # Report the parent's cache hits, not the child's
+    player._seek_request = init["seek_request"]
+    player._octave_shift = init["octave_shift"]
+    player._loop_bars = init["loop_bars"]
+    player._loop_changed = player._loop_bars is not None
+    player._playlist_open = init["playlist_open"]
+
+    control = player._control
+    control.on_publish = lambda snapshot: send((MSG_CLOCK, tuple(snapshot)))
+    control.set_duration(init["total_duration"])
+    control.set_tempo(init["tempo"])
+
+    def handle(message: tuple):
+        command = message[0]
+        if command == CMD_PAUSE:
+            player.pause()
+        elif command == CMD_RESUME:
+            player.resume()
+        elif command == CMD_STOP:
+            player.stop()
+        elif command == CMD_SEEK:
+            player.seek(time_sec=message[1], bar=message[2])
+        elif command == CMD_TEMPO:
+            player.set_speed(message[1])
+        elif command == CMD_OCTAVE:
+            player.set_octave_shift(message[1])
+        elif command == CMD_PATCH:
+            player.apply_patch(message[1])
+        elif command == CMD_LOOP:
+            if message[1] is None:
+                player.clear_loop()
+            else:
+                player.set_loop(*message[1:])
+        elif command == CMD_SONG:
+            player.queue_song(message[1])
+
+    # Performance mode applies to this process (it runs the dispatch loop)
+    player._enter_gc_guard()
+
+    # Wait for the start time; commands sent meanwhile are applied once the clock runs
+    send((MSG_READY,))
+    deferred = []
+    while True:
+        try:
+            message = conn.recv()
+        except (OSError, EOFError):
+            player._exit_gc_guard()
+            player._session.close()
+            return
+        if message[0] == CMD_START:
+            playback_start_time = message[1]
+            break
+        deferred.append(message)
+    control.start(playback_start_time)
+    for message in deferred:
+        handle(message)
+    done = threading.Event()
+
+    def command_loop():
+        while True:
+            try:
+                message = conn.recv()  # Wakes as soon as the parent sends
+            except (OSError, EOFError):
+                if not done.is_set():
+                    player.stop()  # Parent gone: stop and release every key
+                return
+            handle(message)
+
+    threading.Thread(target=command_loop, daemon=True, name="DispatcherCommands").start()
+
+    try:
+        errors_applied = player._dispatch(PlaybackPlan(events), {}, None, 0, playback_start_time)
+    finally:
+        player._exit_gc_guard()
+    done.set()
+    send((MSG_DONE, errors_applied, {name: getattr(player, name) for name in RESULT_ATTRS}))
+    player._session.close()
+    conn.close()
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Ensemble playback: several parts, several outputs, one master clock.
+
+Each part (usually one MIDI track) is compiled into its own plan and played
+on its own output: an InputManager with its own backend / target window, or
+a debug backend as a sink. All parts share one PlaybackControl, so every key
+event of every part is due at an absolute time of the same clock. Nothing is
+timed relative to the previous event, so parts cannot drift apart however
+long the piece is.
+
+Threads:
+- one OutputScheduler per part: waits for each event's deadline on the
+  master clock and injects it (a slow output only delays its own part),
+- one feeder: walks the merged timeline of all parts and hands events to
+  their part's scheduler a short lookahead before they are due.
+
+Latency compensation: a part whose output lags (network client, slower
+backend) by latency_ms has its events scheduled that much earlier, so its
+keys land together with the other parts. The clock starts with a lead-in of
+the largest latency.
+
+Usage:
+    parts = parts_from_midi("song.mid", [create_part_output("debug") for _ in range(4)])
+    player = EnsemblePlayer(parts, cfg, log_fn=print)
+    player.start()
+    player.join()
+    print(player.stats())
+
+    python -m player.ensemble [song.mid] [--parts 4]   # Debug sinks, timing report
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import PlayerConfig
+from .control import PlaybackControl
+from .midi_parser import NoteEvent, midi_to_events_by_track
+from .scheduler import KeyEvent, OutputScheduler
+from .late_policy import LatePolicy
+from .compiler import PlanCompiler, build_note_to_key, DEFAULT_MIN_KEY_HOLD_MS
+
+FEED_LOOKAHEAD_S = 0.02   # Events reach their part's scheduler this far ahead of their deadline
+DRAIN_S = 0.05            # Wait after the last deadline for the schedulers to finish
+
+
+@dataclass
+class EnsemblePart:
+    """One part of the ensemble and the output that plays it."""
+    name: str
+    notes: List[NoteEvent]
+    output: object                        # InputManager (press_force / release / release_force / release_all)
+    latency_ms: float = 0.0               # Output latency to compensate (events are sent this much earlier)
+    cfg: Optional[PlayerConfig] = None    # Part-specific configuration (default: the ensemble's)
+
+
+def create_part_output(backend: str = "debug", target_hwnd: Optional[int] = None):
+    """InputManager for one part (the focus monitor only runs with a target window)."""
+    from input_manager import create_input_manager
+    return create_input_manager(backend=backend, target_hwnd=target_hwnd,
+                                enable_focus_monitor=target_hwnd is not None)
+
+
+def parts_from_midi(mid_path: str, outputs: Sequence, latency_ms: Optional[Sequence[float]] = None) -> List[EnsemblePart]:
+    """
+    One part per output from the tracks of a MIDI file.
+
+    Tracks with notes are dealt to the outputs in order (track i goes to
+    output i % len(outputs)), so more tracks than outputs share parts.
+    """
+    tracks = midi_to_events_by_track(mid_path)
+    notes: List[List[NoteEvent]] = [[] for _ in outputs]
+    names: List[List[str]] = [[] for _ in outputs]
+    for i, track in enumerate(sorted(tracks)):
+        notes[i % len(outputs)].extend(tracks[track])
+        names[i % len(outputs)].append(str(track))
+    return [
+        EnsemblePart(
+            name=f"track {'+'.join(names[i])}" if names[i] else f"part {i + 1}",
+            notes=sorted(notes[i], key=lambda ev: ev.time),
+            output=output,
+            latency_ms=latency_ms[i] if latency_ms else 0.0,
+        )
+        for i, output in enumerate(outputs)
+    ]
+
+
+class EnsemblePlayer:
+    """
+    Plays EnsembleParts in sync from one PlaybackControl.
+
+    pause()/resume()/stop() act on the shared clock, so they reach every
+    part's scheduler at once.
+    """
+
+    def __init__(self, parts: List[EnsemblePart], cfg: PlayerConfig, seed: Optional[int] = None,
+                 log_fn: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            parts: Parts and their outputs
+            cfg: Player configuration for parts without their own
+            seed: Humanization seed (part i uses seed + i); random if None
+            log_fn: Optional logging function
+        """
+        self.parts = parts
+        self.cfg = cfg
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.control = PlaybackControl()
+        self._log_fn = log_fn or (lambda msg: None)
+        self._timeline: List[Tuple[float, int, KeyEvent]] = []  # (deadline, part, event), merged
+        self._schedulers: List[OutputScheduler] = []
+        self._feeder: Optional[threading.Thread] = None
+        self.origin = 0.0  # Clock reading of plan time 0
+        self.duration = 0.0
+
+    def compile(self):
+        """Compile every part and merge them into one timeline (latency already applied)."""
+        timeline = []
+        for index, part in enumerate(self.parts):
+            cfg = part.cfg or self.cfg
+            config = getattr(part.output, "config", None)
+            compiled = PlanCompiler(
+                part.notes, cfg, (self.seed + index) % (2 ** 31),
+                min_key_hold_ms=getattr(config, "min_key_hold_ms", DEFAULT_MIN_KEY_HOLD_MS),
+            ).compile(build_note_to_key(cfg))
+            lead = part.latency_ms / 1000.0
+            for ev in compiled.events:
+                if ev.event_type in ("press", "release"):
+                    shifted = replace(ev, time=ev.time - lead) if lead else ev
+                    timeline.append((shifted.time, index, shifted))
+            self._log_fn(
+                f"[Ensemble] {part.name}: {compiled.notes_scheduled} notes"
+                f"{f', latency {part.latency_ms:.0f}ms' if part.latency_ms else ''}"
+            )
+        timeline.sort()
+        self._timeline = timeline
+        self.duration = max((item[0] + self.parts[item[1]].latency_ms / 1000.0 for item in timeline), default=0.0)
+
+    def start(self, start_time: Optional[float] = None):
+        """Start all parts; plan time 0 sounds at start_time + the largest latency (+ lookahead)."""
+        if not self._timeline:
+            self.compile()
+        lead_in = max((part.latency_ms for part in self.parts), default=0.0) / 1000.0 + FEED_LOOKAHEAD_S
+        self.origin = (start_time if start_time is not None else time.perf_counter()) + lead_in
+        self.control.set_duration(self.duration)
+        self.control.start(self.origin)
+        self._schedulers = []
+        for part in self.parts:
+            cfg = part.cfg or self.cfg
+            output = part.output
+            config = getattr(output, "config", None)
+            scheduler = OutputScheduler(
+                press_fn=output.press_force,
+                release_fn=output.release,
+                retrigger_release_fn=getattr(output, "release_force", None),
+                retrigger_gap_ms=getattr(config, "min_press_interval_ms", 2.0),
+                enable_late_drop=cfg.enable_late_drop,
+                late_policy=LatePolicy(
+                    cfg.late_policy, threshold_ms=cfg.late_drop_ms, adaptive=cfg.adaptive_late_drop,
+                    log_fn=self._log_fn,
+                ) if cfg.enable_late_drop else None,
+                log_fn=self._log_fn,
+                control=self.control,
+            )
+            scheduler.start(self.origin)
+            self._schedulers.append(scheduler)
+        self._feeder = threading.Thread(target=self._feed, daemon=True, name="EnsembleFeeder")
+        self._feeder.start()
+        self._log_fn(f"[Ensemble] {len(self.parts)} parts, {len(self._timeline)} events, one clock")
+
+    def _feed(self):
+        """Hand each part's events to its scheduler just ahead of their deadline."""
+        control = self.control
+        timeline = self._timeline
+        strict = [(part.cfg or self.cfg).strict_midi_timing for part in self.parts]
+        pressed: List[Dict[str, int]] = [{} for _ in self.parts]      # Press count per key
+        active_tokens: List[Dict[str, int]] = [{} for _ in self.parts]  # strict_midi_timing pairing
+        cursor = 0
+        while cursor < len(timeline) and not control.is_stopped():
+            if control.is_paused():
+                if not control.wait_resumed():
+                    break
+                continue
+            if not control.wait_until(timeline[cursor][0] - FEED_LOOKAHEAD_S):
+                continue
+            horizon = control.now() + FEED_LOOKAHEAD_S
+            while cursor < len(timeline) and timeline[cursor][0] <= horizon:
+                _, index, ev = timeline[cursor]
+                cursor += 1
+                scheduler = self._schedulers[index]
+                if ev.event_type == "press":
+                    scheduler.enqueue(ev)
+                    if strict[index]:
+                        active_tokens[index][ev.key] = ev.token
+                    else:
+                        pressed[index][ev.key] = pressed[index].get(ev.key, 0) + 1
+                elif strict[index]:
+                    if active_tokens[index].get(ev.key) == ev.token:
+                        scheduler.enqueue(ev)
+                        active_tokens[index].pop(ev.key, None)
+                elif pressed[index].get(ev.key, 0) > 0:
+                    pressed[index][ev.key] -= 1
+                    if pressed[index][ev.key] == 0:
+                        scheduler.enqueue(ev)
+        if not control.is_stopped():
+            control.wait_until(self.duration + DRAIN_S)
+        self._finish()
+
+    def _finish(self):
+        for scheduler in self._schedulers:
+            scheduler.stop()
+        for part in self.parts:
+            part.output.release_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the end of the piece. Returns False on timeout."""
+        if self._feeder is None:
+            return True
+        self._feeder.join(timeout)
+        return not self._feeder.is_alive()
+
+    def pause(self):
+        """Pause every part (held keys are released)."""
+        if self.control.pause():
+            for part in self.parts:
+                part.output.release_all()
+
+    def resume(self):
+        self.control.resume()
+
+    def stop(self):
+        self.control.stop()
+        self.join(1.0)
+        self._finish()
+
+    def stats(self) -> List[dict]:
+        """Scheduler statistics per part (after join)."""
+        return [dict(scheduler.get_stats(), part=part.name) for part, scheduler in zip(self.parts, self._schedulers)]
+
+
+# ============== Self-test ==============
+
+def self_test(mid_path: str = "", n_parts: int = 4):
+    """
+    Self-test: n parts on debug sinks (Linux works), latency-compensated,
+    measured against the master clock. The timing error of each part must
+    not grow from the first to the last third of the piece (no drift).
+    """
+    print("=== Ensemble Self-Test ===\n")
+
+    cfg = PlayerConfig(bar_duration_override=1.0, input_style="mechanical", strict_mode=True, enable_late_drop=False)
+    outputs = [create_part_output("debug") for _ in range(n_parts)]
+    latencies = [i * 10.0 for i in range(n_parts)]  # Part i lags i*10ms
+    if mid_path:
+        parts = parts_from_midi(mid_path, outputs, latencies)
+    else:
+        # 8 s of eighth notes, each part offset by a sixteenth (no two parts share a key event)
+        scale = [60, 62, 64, 65, 67, 69, 71, 72]
+        parts = [
+            EnsemblePart(
+                name=f"part {i + 1}",
+                notes=[NoteEvent(time=k * 0.25 + i * 0.25 / n_parts, note=scale[(k + i) % 8], duration=0.1)
+                       for k in range(32)],
+                output=output,
+                latency_ms=latencies[i],
+            )
+            for i, output in enumerate(outputs)
+        ]
+
+    player = EnsemblePlayer(parts, cfg, seed=1, log_fn=print)
+    player.compile()
+    player.start()
+    player.join()
+
+    # Expected press times per part from its own (latency-shifted) timeline
+    expected: List[List[float]] = [[] for _ in parts]
+    for deadline, index, ev in player._timeline:
+        if ev.event_type == "press":
+            expected[index].append(player.origin + deadline)
+    worst_drift = 0.0
+    for index, part in enumerate(parts):
+        actual = [ts for ts, _key, is_down, _vk, _sc in part.output._backend.log if is_down]
+        assert len(actual) == len(expected[index]), f"{part.name}: {len(actual)} presses, expected {len(expected[index])}"
+        errors = [(a - e) * 1000 for a, e in zip(actual, expected[index])]
+        part.output.stop()
+        if not errors:
+            print(f"{part.name}: no notes")
+            continue
+        third = max(1, len(errors) // 3)
+        first = sum(errors[:third]) / third
+        last = sum(errors[-third:]) / third
+        worst_drift = max(worst_drift, abs(last - first))
+        print(f"{part.name}: {len(errors)} presses, mean error {sum(errors) / len(errors):.2f}ms, "
+              f"max {max(errors):.2f}ms, drift first->last third {last - first:+.2f}ms")
+    assert worst_drift < 2.0, f"parts drift by {worst_drift:.2f}ms"
+    print(f"\nNo cumulative drift across {n_parts} parts (worst {worst_drift:.2f}ms): OK")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ensemble playback on debug sinks (timing report)")
+    parser.add_argument("midi", nargs="?", default="", help="MIDI file (default: synthetic parts)")
+    parser.add_argument("--parts", type=int, default=4, help="Number of parts/outputs")
+    args = parser.parse_args()
+    self_test(args.midi, args.parts)
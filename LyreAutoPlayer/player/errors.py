@@ -4,8 +4,12 @@ Error simulation for human-like mistakes.
 """
 
 import random
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from .scheduler import KeyEvent
+from .rng import STREAM_ERRORS, stream_seed
 
 
 @dataclass
@@ -67,13 +71,42 @@ class ErrorConfig:
     pause_min_ms: int = 100
     pause_max_ms: int = 500
 
+    # RNG seed for reproducible error plans (None = new seed per playback)
+    seed: Optional[int] = None
+
+
+# Hold time of simulated wrong/extra notes (seconds)
+WRONG_NOTE_HOLD_S = 0.08
+EXTRA_NOTE_HOLD_S = 0.05
+
+
+@dataclass
+class AppliedError:
+    """An error compiled into the playback plan."""
+    error_type: str      # Key of DEFAULT_ERROR_TYPES
+    time: float          # Plan time of the affected press (seconds)
+    bar_index: int
+    key: str = ""        # Key actually pressed (wrong/extra note)
+    note: int = 0
+    pause_ms: int = 0    # For pause: inserted gap
+
+    def describe(self) -> str:
+        name = DEFAULT_ERROR_TYPES[self.error_type].display_name_en
+        if self.error_type == "pause":
+            return f"{name} {self.pause_ms}ms @ {self.time:.2f}s"
+        if self.key:
+            return f"{name} '{self.key}' @ {self.time:.2f}s"
+        return f"{name} @ {self.time:.2f}s"
+
 
-def plan_errors_for_group(error_config: ErrorConfig) -> List[Tuple[str, float]]:
+def plan_errors_for_group(error_config: ErrorConfig,
+                          rng: Optional[random.Random] = None) -> List[Tuple[str, float]]:
     """
     Plan errors for an 8-bar group based on configuration.
 
     Args:
         error_config: ErrorConfig with enabled error types
+        rng: Random source (defaults to the global random module)
 
     Returns:
         List of (error_type, relative_position) where relative_position is 0.0-1.0
@@ -96,14 +129,144 @@ def plan_errors_for_group(error_config: ErrorConfig) -> List[Tuple[str, float]]:
     if not enabled_types:
         return []
 
+    rng = rng or random
+
     # Plan errors with random positions
     errors = []
     for _ in range(error_config.errors_per_8bars):
-        error_type = random.choice(enabled_types)
+        error_type = rng.choice(enabled_types)
         # Random position within 8-bar group (0.0 to 1.0)
-        position = random.random()
+        position = rng.random()
         errors.append((error_type, position))
 
     # Sort by position for ordered application
     errors.sort(key=lambda x: x[1])
     return errors
+
+
+def compile_errors(
+    event_queue: List[KeyEvent],
+    error_config: ErrorConfig,
+    note_to_key: Dict[int, str],
+    group_duration: float,
+    seed: int,
+) -> Tuple[List[KeyEvent], List[AppliedError]]:
+    """
+    Compile human-like mistakes into the playback plan ahead of time.
+
+    Errors become ordinary events: a wrong note rewrites a press (and its
+    paired release), a missed note removes the pair, an extra note adds a
+    short press/release pair and a pause shifts every later event. Each
+    applied error also gets an "error_marker" event (token = index into the
+    returned AppliedError list) so the dispatcher can report it when it is
+    reached, without any randomness or sleeping.
+
+    Args:
+        event_queue: Compiled press/release/marker events
+        error_config: ErrorConfig with enabled error types
+        note_to_key: Quantized MIDI note -> key mapping
+        group_duration: Length of one 8-bar group in plan time (seconds)
+        seed: RNG seed (same seed + same plan = same errors)
+
+    Returns:
+        (new event list sorted by time, list of AppliedError)
+    """
+    events = sorted(event_queue)
+    if not error_config.enabled or group_duration <= 1e-9:
+        return events, []
+
+    presses = [ev for ev in events if ev.event_type == "press"]
+    if not presses:
+        return events, []
+    releases = {ev.token: ev for ev in events if ev.event_type == "release" and ev.token}
+    next_token = max(ev.token for ev in events) + 1
+
+    applied: List[AppliedError] = []
+    removed = set()
+    added: List[KeyEvent] = []
+    shifts: List[Tuple[Tuple[float, int], float]] = []  # ((time, priority), shift_s)
+
+    press_idx = 0
+    last_group = int(presses[-1].time / group_duration)
+    for group in range(last_group + 1):
+        group_start = group * group_duration
+        group_end = group_start + group_duration
+        # Independent stream per 8-bar group (reproducible from any group)
+        rng = random.Random(stream_seed(seed, STREAM_ERRORS, group))
+        for error_type, position in plan_errors_for_group(error_config, rng):
+            error_time = group_start + position * group_duration
+            # One error per press: take the first unused press at/after the position
+            while press_idx < len(presses) and presses[press_idx].time < error_time:
+                press_idx += 1
+            if press_idx >= len(presses) or presses[press_idx].time >= group_end:
+                continue  # Not reached within this group (same as live behavior)
+            ev = presses[press_idx]
+            press_idx += 1
+
+            error = AppliedError(error_type, ev.time, ev.bar_index)
+            release = releases.get(ev.token)
+
+            if error_type == "wrong_note":
+                new_note = ev.note + rng.choice([-1, 1])
+                if new_note in note_to_key:
+                    ev.key = note_to_key[new_note]
+                    ev.note = ev.pitch = new_note
+                    error.key, error.note = ev.key, new_note
+                    if release is not None:
+                        release.key = ev.key
+                        release.note = release.pitch = new_note
+                        release.time = min(release.time, ev.time + WRONG_NOTE_HOLD_S)
+
+            elif error_type == "miss_note":
+                removed.add(id(ev))
+                if release is not None:
+                    removed.add(id(release))
+
+            elif error_type == "extra_note":
+                extra_note = ev.note + rng.choice([-1, 1])
+                if extra_note in note_to_key:
+                    extra_key = note_to_key[extra_note]
+                    added.append(KeyEvent(
+                        ev.time, 2, "press", extra_key, extra_note,
+                        bar_index=ev.bar_index, token=next_token, pitch=extra_note
+                    ))
+                    added.append(KeyEvent(
+                        ev.time + EXTRA_NOTE_HOLD_S, 1, "release", extra_key, extra_note,
+                        bar_index=ev.bar_index, token=next_token, pitch=extra_note
+                    ))
+                    next_token += 1
+                    error.key, error.note = extra_key, extra_note
+
+            elif error_type == "pause":
+                error.pause_ms = rng.randint(error_config.pause_min_ms, error_config.pause_max_ms)
+                shifts.append(((ev.time, ev.priority), error.pause_ms / 1000.0))
+
+            added.append(KeyEvent(
+                ev.time, 0, "error_marker", error.key, error.note,
+                bar_index=ev.bar_index, token=len(applied), error=error_type
+            ))
+            applied.append(error)
+
+    events = [ev for ev in events if id(ev) not in removed]
+    events.extend(added)
+
+    # Apply pause gaps: every event at/after a pause point moves later
+    if shifts:
+        shifts.sort(key=lambda item: item[0])
+        points = [point for point, _ in shifts]
+        cumulative = []
+        total = 0.0
+        for _, shift_s in shifts:
+            total += shift_s
+            cumulative.append(total)
+        for ev in events:
+            idx = bisect_right(points, (ev.time, ev.priority))
+            if idx > 0:
+                ev.time += cumulative[idx - 1]
+        for error in applied:
+            idx = bisect_right(points, (error.time, 2))
+            if idx > 0 and error.error_type != "pause":
+                error.time += cumulative[idx - 1]
+
+    events.sort()
+    return events, applied
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Garbage-collection control during playback (performance mode).
+
+CPython's cyclic GC runs whenever allocation counts cross a threshold, which
+during playback means: in the middle of a chord. In performance mode the
+compiled plan and everything loaded so far is moved out of the collector's
+reach (gc.freeze), automatic collection is disabled, and collections run only
+where nothing is due:
+
+- young generations in idle windows of the output scheduler (no key event and
+  no plan event within the window's budget),
+- the full collection only in such windows after a bar boundary, or while
+  playback is paused at a bar.
+
+Every collection (deferred or automatic) is timed through gc.callbacks, so
+the diagnostics stats show GC pause counts and durations in either mode.
+
+Usage:
+    guard = GcGuard(defer=cfg.performance_mode)
+    guard.enter()                 # After compiling the plan
+    ...
+    guard.idle(slack_s)           # Scheduler: nothing due for slack_s seconds
+    guard.bar_boundary()          # Playback loop: a pause marker passed
+    guard.collect_full()          # Playback paused
+    ...
+    guard.exit()
+    stats = guard.stats()
+"""
+
+import gc
+import time
+from typing import Callable, Dict, List, Optional
+
+MIN_YOUNG_BUDGET_S = 0.002    # Idle window required for a young collection
+MIN_FULL_BUDGET_S = 0.010     # Idle window required for a full collection
+BUDGET_FACTOR = 3.0           # Window must be this many times the typical collection time
+EMERGENCY_FACTOR = 50         # Collect gen 0 regardless of slack past this many thresholds
+
+
+class GcGuard:
+    """
+    Freezes, defers and measures cyclic GC for one playback.
+
+    Only `enter`/`exit` touch global GC state; with defer=False the guard
+    only measures the automatic collections.
+    """
+
+    def __init__(self, defer: bool = True, log_fn: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            defer: Freeze + disable automatic GC and collect in idle windows
+            log_fn: Optional logging function
+        """
+        self._defer = defer
+        self._log_fn = log_fn or (lambda msg: None)
+        self._active = False
+        self._was_enabled = True
+        self._thresholds = gc.get_threshold()
+        self._bar_seen = False
+
+        # Measurement (gc.callbacks)
+        self._collect_start = 0.0
+        self._in_deferred = False
+        self._pauses: List[float] = []             # Duration (ms) of every collection
+        self._by_generation = [0, 0, 0]
+        self._deferred = 0
+        self._automatic = 0
+        self._cost_s = [0.0005, 0.001, 0.005]      # Running estimate per generation
+        self._frozen = 0
+
+    @property
+    def defer(self) -> bool:
+        return self._defer
+
+    def enter(self):
+        """Start measuring; in defer mode collect, freeze and disable automatic GC."""
+        if self._active:
+            return
+        self._active = True
+        if self._defer:
+            self._was_enabled = gc.isenabled()
+            t0 = time.perf_counter()
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+            self._frozen = gc.get_freeze_count()
+            self._log_fn(
+                f"[GC] Performance mode: {self._frozen} objects frozen, automatic GC off "
+                f"(setup {(time.perf_counter() - t0) * 1000:.1f}ms)"
+            )
+        gc.callbacks.append(self._on_gc)
+
+    def exit(self):
+        """Restore automatic GC and stop measuring."""
+        if not self._active:
+            return
+        self._active = False
+        if self._defer:
+            gc.unfreeze()
+            if self._was_enabled:
+                gc.enable()
+        try:
+            gc.callbacks.remove(self._on_gc)
+        except ValueError:
+            pass
+
+    def bar_boundary(self):
+        """A bar boundary passed: the next idle window may run a full collection."""
+        self._bar_seen = True
+
+    def idle(self, slack_s: float):
+        """
+        Called by the output scheduler when nothing is due for `slack_s` seconds.
+        Runs at most one deferred collection that fits the window.
+        """
+        if not (self._active and self._defer):
+            return
+        count0, count1, count2 = gc.get_count()
+        threshold0, threshold1, threshold2 = self._thresholds
+        if count0 < threshold0 and not self._bar_seen:
+            return
+        if self._bar_seen and count2 >= threshold2 and slack_s >= self._budget(2, MIN_FULL_BUDGET_S):
+            self._bar_seen = False
+            self._collect(2)
+        elif count0 >= threshold0:
+            generation = 1 if count1 >= threshold1 else 0
+            if slack_s >= self._budget(generation, MIN_YOUNG_BUDGET_S) or count0 >= threshold0 * EMERGENCY_FACTOR:
+                self._collect(generation)
+
+    def collect_full(self):
+        """Full collection now (playback is paused, nothing is due)."""
+        if self._active and self._defer:
+            self._bar_seen = False
+            self._collect(2)
+
+    def stats(self) -> Dict:
+        """GC pause counts and durations since enter()."""
+        pauses = self._pauses
+        return {
+            "performance_mode": self._defer,
+            "frozen_objects": self._frozen,
+            "collections": len(pauses),
+            "by_generation": list(self._by_generation),
+            "deferred": self._deferred,
+            "automatic": self._automatic,
+            "total_ms": sum(pauses),
+            "max_ms": max(pauses) if pauses else 0.0,
+        }
+
+    def _budget(self, generation: int, minimum: float) -> float:
+        return max(minimum, self._cost_s[generation] * BUDGET_FACTOR)
+
+    def _collect(self, generation: int):
+        self._in_deferred = True
+        try:
+            gc.collect(generation)
+        finally:
+            self._in_deferred = False
+
+    def _on_gc(self, phase: str, info: Dict):
+        if phase == "start":
+            self._collect_start = time.perf_counter()
+            return
+        elapsed = time.perf_counter() - self._collect_start
+        generation = min(2, info.get("generation", 0))
+        self._pauses.append(elapsed * 1000)
+        self._by_generation[generation] += 1
+        if self._in_deferred:
+            self._deferred += 1
+        else:
+            self._automatic += 1
+        self._cost_s[generation] = self._cost_s[generation] * 0.7 + elapsed * 0.3
+
+
+def format_gc_stats(stats: Dict) -> str:
+    """One-line summary for the log."""
+    gens = "/".join(str(n) for n in stats["by_generation"])
+    return (
+        f"[GC] collections={stats['collections']} (gen0/1/2={gens}, deferred={stats['deferred']}, "
+        f"automatic={stats['automatic']}), total={stats['total_ms']:.1f}ms, max={stats['max_ms']:.2f}ms"
+    )
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: with defer=True no automatic collection runs; idle windows collect."""
+    print("=== GcGuard Self-Test ===\n")
+
+    class Node:
+        def __init__(self):
+            self.ref = self  # Cycle: only the cyclic collector frees it
+
+    guard = GcGuard(defer=True, log_fn=print)
+    guard.enter()
+    assert not gc.isenabled()
+    for _ in range(20000):
+        Node()
+    assert guard.stats()["automatic"] == 0
+    guard.idle(0.0)  # No slack: nothing runs (below the emergency limit)
+    assert guard.stats()["collections"] == 0
+    guard.idle(1.0)
+    guard.collect_full()
+    guard.exit()
+    assert gc.isenabled()
+    stats = guard.stats()
+    print(format_gc_stats(stats))
+    assert stats["deferred"] >= 1 and stats["automatic"] == 0, stats
+    assert stats["by_generation"][2] == 1, stats
+
+    monitor = GcGuard(defer=False)
+    monitor.enter()
+    for _ in range(20000):
+        Node()
+    monitor.exit()
+    print(format_gc_stats(monitor.stats()))
+    assert monitor.stats()["automatic"] >= 1
+    print("OK")
+
+
+if __name__ == "__main__":
+    self_test()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Speed governor: stretch playback time while dispatch is behind.
+
+The plan keeps absolute timestamps, so a dispatch path that cannot keep up
+(slow backend, dense passages, a loaded machine) either bunches events or
+the late policy drops them. With the governor enabled the lateness observed
+by the output scheduler and the playback loop is smoothed (EWMA per source,
+the worse one counts). Only the first event of each timestamp is a sample:
+the later notes of a chord are late by the serial backend cost, which no
+tempo change can remove, while a late chord head means a real backlog.
+While the lateness stays above the trigger the playback clock is slowed down in small steps
+(PlaybackControl.set_rate, bounded by min_rate). Once lateness is back under
+the release level the rate recovers linearly to 1.0 over the following
+`recover_bars` bars. Overload degrades into a slightly slower tempo instead
+of missing notes.
+
+Every rate change is recorded as a WarpDecision (written to the diagnostics
+trace as warp_*.csv).
+
+Usage:
+    governor = SpeedGovernor(control, bar_duration=2.0, min_rate=0.8)
+    governor.observe("scheduler", event.time, late_ms)   # Per event
+    governor.reset()              # After a seek
+    print(governor.summary())
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .control import PlaybackControl
+
+EWMA_ALPHA = 0.2              # Lateness smoothing
+TRIGGER_MS = 10.0             # Slow down while smoothed lateness is above this
+RELEASE_MS = 3.0              # Recover while it is below this
+UPDATE_INTERVAL_S = 0.05      # Real time between rate decisions
+SLOWDOWN_PER_MS = 0.001       # Rate step per ms of lateness above the trigger
+MIN_STEP = 0.01
+MAX_STEP = 0.05
+RATE_QUANTUM = 0.005          # Recovery is applied in steps of at least this
+
+
+@dataclass
+class WarpDecision:
+    """One clock-rate change."""
+    playback_s: float             # Playback time of the change
+    late_ms: float                # Smoothed lateness that triggered it
+    rate_from: float
+    rate_to: float
+    reason: str                   # "slowdown" or "recover"
+
+
+class SpeedGovernor:
+    """
+    Warps the playback clock rate from observed dispatch lateness.
+
+    observe() may be called from the scheduler and the dispatcher thread.
+    """
+
+    def __init__(
+        self,
+        control: PlaybackControl,
+        bar_duration: float,
+        min_rate: float = 0.8,
+        recover_bars: float = 2.0,
+        log_fn: Optional[Callable[[str], None]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        Args:
+            control: Playback clock to warp
+            bar_duration: Bar length (s); sets the recovery slope
+            min_rate: Slowest allowed rate (e.g. 0.8 = at most 20% slower)
+            recover_bars: Bars over which a full slowdown recovers to 1.0
+            log_fn: Optional logging function
+            clock: Real-time clock for the decision interval
+        """
+        self._control = control
+        self._min_rate = min(1.0, max(0.1, min_rate))
+        bar_duration = bar_duration if bar_duration > 0 else 2.0
+        # Rate per playback second while recovering
+        self._recover_slope = (1.0 - self._min_rate) / max(1e-3, recover_bars * bar_duration)
+        self._log_fn = log_fn or (lambda msg: None)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._late_ewma: Dict[str, float] = {}      # source -> smoothed lateness (ms)
+        self._last_time: Dict[str, float] = {}      # source -> last sampled event time
+        self._last_update = clock()
+        self._recover_pending = 0.0
+        self._warped = False
+        self._lowest = 1.0
+        self._stretched_s = 0.0   # Extra real time spent because of the warp
+        self._stretch_mark = (control.now(), control.warp_rate)
+        self.decisions: List[WarpDecision] = []
+
+    @property
+    def rate(self) -> float:
+        return self._control.warp_rate
+
+    def observe(self, source: str, event_time: float, late_ms: float):
+        """Feed the lateness (ms, playback time) of an event handled by `source`."""
+        with self._lock:
+            if self._last_time.get(source) == event_time:
+                return  # Same chord: serial backend cost, not backlog
+            self._last_time[source] = event_time
+            smoothed = self._late_ewma.get(source, 0.0)
+            self._late_ewma[source] = smoothed + (max(0.0, late_ms) - smoothed) * EWMA_ALPHA
+            wall = self._clock()
+            elapsed = wall - self._last_update
+            if elapsed < UPDATE_INTERVAL_S:
+                return
+            self._last_update = wall
+            rate = self._control.warp_rate
+            late = max(self._late_ewma.values())
+
+            if late > TRIGGER_MS and rate > self._min_rate:
+                step = min(MAX_STEP, max(MIN_STEP, (late - TRIGGER_MS) * SLOWDOWN_PER_MS))
+                self._recover_pending = 0.0
+                self._apply(max(self._min_rate, rate - step), late, "slowdown")
+            elif late < RELEASE_MS and rate < 1.0:
+                self._recover_pending += self._recover_slope * elapsed * rate
+                if self._recover_pending >= RATE_QUANTUM or rate + self._recover_pending >= 1.0:
+                    target = min(1.0, rate + self._recover_pending)
+                    self._recover_pending = 0.0
+                    self._apply(target, late, "recover")
+
+    def reset(self):
+        """Seek: drop the lateness history (the rate keeps recovering on its own)."""
+        with self._lock:
+            self._late_ewma.clear()
+            self._last_time.clear()
+            self._recover_pending = 0.0
+            self._stretch_mark = (self._control.now(), self._control.warp_rate)
+
+    def summary(self) -> str:
+        """One-line summary for the log."""
+        self._account_stretch(self._control.now(), self._control.warp_rate)
+        return (
+            f"[Governor] {len(self.decisions)} rate change(s), slowest x{self._lowest:.2f}, "
+            f"+{self._stretched_s:.2f}s stretched"
+        )
+
+    def _apply(self, rate: float, late_ms: float, reason: str):
+        """Set the clock rate and record the decision (lock held)."""
+        previous = self._control.warp_rate
+        now = self._control.now()
+        self._account_stretch(now, rate)
+        self._control.set_rate(rate)
+        self.decisions.append(WarpDecision(now, late_ms, previous, rate, reason))
+        self._lowest = min(self._lowest, rate)
+        if reason == "slowdown" and not self._warped:
+            self._warped = True
+            self._log_fn(f"[Governor] behind by {late_ms:.1f}ms @ t={now:.3f}s, slowing to x{rate:.2f}")
+        elif rate >= 1.0 and self._warped:
+            self._warped = False
+            self._log_fn(f"[Governor] recovered to x1.00 @ t={now:.3f}s (slowest x{self._lowest:.2f})")
+
+    def _account_stretch(self, now: float, next_rate: float):
+        """Add the extra real time of the segment since the last mark, then move the mark."""
+        mark_time, mark_rate = self._stretch_mark
+        if now > mark_time:
+            self._stretched_s += (now - mark_time) * (1.0 / mark_rate - 1.0)
+        self._stretch_mark = (now, next_rate)
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: sustained lateness slows the clock within bounds; it recovers afterwards."""
+    print("=== SpeedGovernor Self-Test ===\n")
+
+    wall = [0.0]
+    control = PlaybackControl(clock=lambda: wall[0])
+    control.start(0.0)
+    governor = SpeedGovernor(control, bar_duration=1.0, min_rate=0.8, recover_bars=2.0,
+                             log_fn=print, clock=lambda: wall[0])
+
+    for i in range(100):  # 5s of 40ms lateness
+        wall[0] += 0.05
+        governor.observe("scheduler", i * 0.05, 40.0)
+        governor.observe("scheduler", i * 0.05, 40.0)  # Same chord: ignored
+    assert abs(control.warp_rate - 0.8) < 1e-9, control.warp_rate
+    slowed = len(governor.decisions)
+    for i in range(100, 200):  # 5s on time: full recovery takes 2 bars (2 playback s)
+        wall[0] += 0.05
+        governor.observe("scheduler", i * 0.05, 0.0)
+    assert control.warp_rate == 1.0, control.warp_rate
+
+    assert all(d.reason == "slowdown" for d in governor.decisions[:slowed])
+    assert governor.decisions[-1].reason == "recover"
+    print(governor.summary())
+    print("OK")
+
+
+if __name__ == "__main__":
+    self_test()
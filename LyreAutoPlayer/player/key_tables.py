@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Per-octave pitch -> key tables for live octave switching.
+
+Plan events keep their score pitch (after transpose) next to the key and
+note compiled for cfg.octave_shift. For every octave shift the UI offers, a
+table maps each pitch of the plan to (key, quantized note) under the same
+quantization rules the compiler used. The dispatcher indexes the current
+table; an octave hotkey swaps the table reference, so the next press uses
+the new octave without recompiling.
+
+Usage:
+    tables = build_key_tables(cfg, plan_pitches(events))
+    mapped = tables[+1].get(pitch)         # (key, note) or None: not playable there
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .config import PlayerConfig
+from .quantize import build_available_notes, quantize_note
+
+OCTAVE_SHIFTS = (-2, -1, 0, 1, 2)  # Same range as the octave combo box / hotkeys
+
+# pitch -> (key, quantized note); pitches that cannot be played are absent
+KeyTable = Dict[int, Tuple[str, int]]
+
+
+def quantize_range(cfg: PlayerConfig, avail_notes: List[int], policy: str) -> Tuple[int, int]:
+    """Octave-folding range used by quantize_note for this layout (min, max)."""
+    if cfg.octave_range_auto and avail_notes:
+        oct_min = min(avail_notes)
+        oct_max = max(avail_notes)
+    else:
+        oct_min = cfg.octave_min_note
+        oct_max = cfg.octave_max_note
+        if policy == "octave" and avail_notes:
+            # Clamp to playable range so octave-shift can map notes like E6/D#6.
+            oct_min = max(oct_min, min(avail_notes))
+            oct_max = min(oct_max, max(avail_notes))
+    if oct_min > oct_max:
+        oct_min, oct_max = oct_max, oct_min
+    return oct_min, oct_max
+
+
+def build_key_table(cfg: PlayerConfig, octave_shift: int, pitches: Iterable[int]) -> KeyTable:
+    """Key table for `octave_shift` (same rules as PlanCompiler's quantization pass)."""
+    note_to_key = dict(build_available_notes(cfg.root_mid_do + octave_shift * 12, cfg.keyboard_preset))
+    avail_notes = list(note_to_key.keys())
+    policy = cfg.accidental_policy if cfg.enable_accidental_policy else "drop"
+    oct_min, oct_max = quantize_range(cfg, avail_notes, policy)
+    table: KeyTable = {}
+    for pitch in pitches:
+        q = quantize_note(pitch, avail_notes, policy, oct_min, oct_max)
+        if q is not None:
+            table[pitch] = (note_to_key[q], q)
+    return table
+
+
+def build_key_tables(cfg: PlayerConfig, pitches: Iterable[int],
+                     shifts: Iterable[int] = OCTAVE_SHIFTS) -> Dict[int, KeyTable]:
+    """One table per octave shift (cfg.octave_shift is always included)."""
+    pitches = list(pitches)
+    shifts = set(shifts) | {cfg.octave_shift}
+    return {shift: build_key_table(cfg, shift, pitches) for shift in sorted(shifts)}
+
+
+def plan_pitches(events) -> Set[int]:
+    """Score pitches of the plan's presses."""
+    return {ev.pitch for ev in events if ev.event_type == "press" and ev.pitch >= 0}
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+LAN clock synchronisation for multi-machine playback (UDP, NTP-style).
+
+One instance is the leader, the others follow it. A follower sends pings
+stamped with its clock (t0); the leader stamps receive (t1) and send (t2)
+with its own clock; the follower stamps the reply (t3):
+
+    offset = ((t1 - t0) + (t2 - t3)) / 2     # leader clock - follower clock
+    rtt    = (t3 - t0) - (t2 - t1)
+
+Samples with the lowest RTT have the least asymmetric queueing, so the
+offset estimate is the median over the fastest quarter of a burst; jitter
+is the spread (standard deviation) of all offsets in the burst. Followers
+report their estimate to the leader and keep re-syncing while armed.
+
+To start, the leader picks an epoch on its clock a few seconds ahead and
+sends it to every peer (repeated, UDP may drop); each follower converts it
+to its own clock (epoch - offset) and starts the plan's clock there
+(PlayerConfig.sync_start_at). Clocks are time.perf_counter().
+
+Usage:
+    leader = SyncLeader(port=DEFAULT_PORT, log_fn=print)
+    leader.start()
+    epoch = leader.announce_start(lead_s=3.0, plan_id="song.mid")   # Leader clock
+
+    follower = SyncFollower("192.168.1.10", name="pc-2")
+    follower.sync()                       # PeerReport (offset, rtt, jitter)
+    start_at = follower.wait_for_start()  # Local perf_counter time, or None
+
+    python -m player.lan_sync leader [--port P]
+    python -m player.lan_sync follow HOST [--port P]
+    python -m player.lan_sync test [--peers 4]      # Processes on localhost
+"""
+
+import json
+import socket
+import statistics
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_PORT = 47123
+SYNC_SAMPLES = 16           # Pings per sync burst
+SYNC_INTERVAL_S = 0.01      # Between pings of a burst
+BEST_FRACTION = 0.25        # Offset = median over this fraction of lowest-RTT samples
+RESYNC_S = 1.0              # Armed followers re-sync this often
+START_REPEATS = 3           # START is sent this many times (UDP may drop)
+START_REPEAT_S = 0.05
+MAX_DATAGRAM = 2048
+
+
+@dataclass
+class SyncSample:
+    offset: float   # Leader clock - follower clock (seconds)
+    rtt: float      # Round trip minus the leader's processing time (seconds)
+
+
+@dataclass
+class PeerReport:
+    """A follower's clock estimate (as measured by the follower)."""
+    name: str
+    offset_ms: float
+    rtt_ms: float
+    jitter_ms: float
+    samples: int
+
+    def describe(self) -> str:
+        return (f"{self.name}: offset {self.offset_ms:+.3f}ms, rtt {self.rtt_ms:.3f}ms, "
+                f"jitter {self.jitter_ms:.3f}ms ({self.samples} samples)")
+
+
+def estimate(samples: List[SyncSample], name: str = "") -> PeerReport:
+    """Offset from the lowest-RTT samples; jitter = spread of all offsets."""
+    fastest = sorted(samples, key=lambda s: s.rtt)[:max(1, int(len(samples) * BEST_FRACTION))]
+    offsets = [s.offset for s in samples]
+    return PeerReport(
+        name=name,
+        offset_ms=statistics.median(s.offset for s in fastest) * 1000,
+        rtt_ms=statistics.median(s.rtt for s in samples) * 1000,
+        jitter_ms=(statistics.pstdev(offsets) if len(offsets) > 1 else 0.0) * 1000,
+        samples=len(samples),
+    )
+
+
+def _send(sock: socket.socket, addr: Tuple[str, int], message: dict):
+    try:
+        sock.sendto(json.dumps(message).encode("utf-8"), addr)
+    except OSError:
+        pass
+
+
+def _recv(sock: socket.socket) -> Tuple[Optional[dict], Optional[Tuple[str, int]]]:
+    try:
+        data, addr = sock.recvfrom(MAX_DATAGRAM)
+        return json.loads(data.decode("utf-8")), addr
+    except (socket.timeout, BlockingIOError):
+        return None, None
+    except (OSError, ValueError):
+        return None, None
+
+
+class SyncLeader:
+    """
+    Leader side: answers pings, collects peer reports, announces start epochs.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "0.0.0.0",
+                 clock: Callable[[], float] = time.perf_counter,
+                 log_fn: Optional[Callable[[str], None]] = None):
+        self._clock = clock
+        self._log_fn = log_fn or (lambda msg: None)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.2)
+        self.port = self._sock.getsockname()[1]
+        self._lock = threading.Lock()
+        self._peers: Dict[Tuple[str, int], str] = {}          # Address -> name (seen pinging)
+        self._reports: Dict[Tuple[str, int], PeerReport] = {}
+        self._acks: Dict[float, set] = {}                      # Epoch -> acknowledging addresses
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True, name="SyncLeader")
+        self._thread.start()
+        self._log_fn(f"[Sync] Leader listening on UDP {self.port}")
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        self._sock.close()
+
+    def _serve(self):
+        sock = self._sock
+        while self._running:
+            try:
+                data, addr = sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            t1 = self._clock()
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except ValueError:
+                continue
+            kind = message.get("t")
+            if kind == "ping":
+                # Stamp t2 as late as possible
+                reply = {"t": "pong", "seq": message.get("seq"), "t0": message.get("t0"), "t1": t1}
+                reply["t2"] = self._clock()
+                _send(sock, addr, reply)
+                with self._lock:
+                    if addr not in self._peers:
+                        self._peers[addr] = message.get("name", "")
+                        self._log_fn(f"[Sync] Peer {message.get('name', '')} joined from {addr[0]}:{addr[1]}")
+            elif kind == "report":
+                report = PeerReport(**message["report"])
+                with self._lock:
+                    self._reports[addr] = report
+            elif kind == "ack":
+                with self._lock:
+                    self._acks.setdefault(message.get("epoch"), set()).add(addr)
+
+    def peers(self) -> List[PeerReport]:
+        """Latest report of every peer (peers that have not reported yet are left out)."""
+        with self._lock:
+            return list(self._reports.values())
+
+    def peer_count(self) -> int:
+        with self._lock:
+            return len(self._peers)
+
+    def announce_start(self, lead_s: float = 3.0, plan_id: str = "") -> float:
+        """Send a start epoch (leader clock, now + lead_s) to every peer. Returns the epoch."""
+        epoch = self._clock() + lead_s
+        message = {"t": "start", "epoch": epoch, "plan": plan_id}
+        with self._lock:
+            peers = list(self._peers)
+        for repeat in range(START_REPEATS):
+            for addr in peers:
+                _send(self._sock, addr, message)
+            if repeat + 1 < START_REPEATS:
+                time.sleep(START_REPEAT_S)
+        self._log_fn(f"[Sync] Start in {lead_s:.1f}s sent to {len(peers)} peer(s){f' ({plan_id})' if plan_id else ''}")
+        return epoch
+
+    def acked(self, epoch: float) -> int:
+        """Number of peers that confirmed the start epoch."""
+        with self._lock:
+            return len(self._acks.get(epoch, ()))
+
+
+class SyncFollower:
+    """
+    Follower side: estimates the leader's clock offset and waits for a start epoch.
+    Not thread-safe: sync() and wait_for_start() run on the same thread.
+    """
+
+    def __init__(self, leader_host: str, port: int = DEFAULT_PORT, name: str = "",
+                 clock: Callable[[], float] = time.perf_counter,
+                 log_fn: Optional[Callable[[str], None]] = None):
+        self._leader = (leader_host, port)
+        self._clock = clock
+        self._log_fn = log_fn or (lambda msg: None)
+        self.name = name or socket.gethostname()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(("", 0))
+        self._seq = 0
+        self._cancelled = threading.Event()
+        self.report: Optional[PeerReport] = None
+        self.plan_id = ""
+        self._start: Optional[float] = None   # Announced epoch (leader clock)
+
+    def close(self):
+        self._sock.close()
+
+    def cancel(self):
+        """Stop waiting (wait_for_start returns None)."""
+        self._cancelled.set()
+
+    def _handle(self, message: dict, pending: Dict[int, SyncSample], t3: float):
+        kind = message.get("t")
+        if kind == "pong" and message.get("seq") in pending:
+            t0, t1, t2 = message["t0"], message["t1"], message["t2"]
+            pending[message["seq"]] = SyncSample(((t1 - t0) + (t2 - t3)) / 2, (t3 - t0) - (t2 - t1))
+        elif kind == "start":
+            epoch = message["epoch"]
+            _send(self._sock, self._leader, {"t": "ack", "epoch": epoch})
+            if self._start != epoch:
+                self._start = epoch
+                self.plan_id = message.get("plan", "")
+
+    def sync(self, samples: int = SYNC_SAMPLES) -> Optional[PeerReport]:
+        """One ping burst; updates and reports the offset estimate (None if the leader did not answer)."""
+        pending: Dict[int, Optional[SyncSample]] = {}
+        for _ in range(samples):
+            self._seq += 1
+            pending[self._seq] = None
+            _send(self._sock, self._leader, {"t": "ping", "seq": self._seq, "t0": self._clock(), "name": self.name})
+            deadline = time.perf_counter() + SYNC_INTERVAL_S
+            while True:
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    break
+                self._sock.settimeout(left)
+                message, _addr = _recv(self._sock)
+                if message is not None:
+                    self._handle(message, pending, self._clock())
+        got = [sample for sample in pending.values() if sample is not None]
+        if not got:
+            return None
+        self.report = estimate(got, self.name)
+        _send(self._sock, self._leader, {"t": "report", "report": asdict(self.report)})
+        return self.report
+
+    def to_local(self, leader_time: float) -> float:
+        """Leader clock time -> this machine's clock."""
+        offset = self.report.offset_ms / 1000.0 if self.report is not None else 0.0
+        return leader_time - offset
+
+    def wait_for_start(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Re-sync every RESYNC_S until the leader announces a start.
+        Returns the start time on the local clock, or None (timeout / cancel).
+        """
+        give_up = None if timeout is None else time.perf_counter() + timeout
+        self._start = None
+        next_sync = 0.0
+        while not self._cancelled.is_set():
+            now = time.perf_counter()
+            if give_up is not None and now >= give_up:
+                return None
+            if self._start is not None:
+                start_at = self.to_local(self._start)
+                self._log_fn(f"[Sync] Start at leader {self._start:.6f} -> local {start_at:.6f} "
+                             f"(in {start_at - self._clock():.3f}s){f' ({self.plan_id})' if self.plan_id else ''}")
+                return start_at
+            if now >= next_sync:
+                report = self.sync()
+                if report is not None:
+                    self._log_fn(f"[Sync] {report.describe()}")
+                next_sync = time.perf_counter() + RESYNC_S
+                continue
+            self._sock.settimeout(min(0.1, next_sync - now))
+            message, _addr = _recv(self._sock)
+            if message is not None:
+                self._handle(message, {}, self._clock())
+        return None
+
+
+# ============== Self-test ==============
+
+_TEST_SPIN_S = 0.003
+
+
+def _test_follower(port: int, name: str, skew: float, results):
+    """Child process: a follower whose clock is off by `skew` seconds."""
+    clock = lambda: time.perf_counter() + skew
+    follower = SyncFollower("127.0.0.1", port, name=name, clock=clock)
+    start_at = follower.wait_for_start(timeout=20.0)
+    if start_at is not None:
+        # Sleep, then spin the last few ms like the dispatcher's final wait
+        # (spinning the whole lead-in would starve the other peers on a small machine)
+        time.sleep(max(0.0, start_at - clock() - _TEST_SPIN_S))
+        while clock() < start_at:
+            pass
+        started = time.perf_counter()  # True clock (shared on localhost) for the comparison
+        scheduled = start_at - skew  # The converted start on the true clock
+        results.put((name, scheduled, started, follower.report.offset_ms, skew * 1000, follower.report.jitter_ms))
+    follower.close()
+
+
+def self_test(n_peers: int = 4):
+    """
+    Self-test: n follower processes on localhost with skewed clocks recover
+    the offset and schedule their start within 2ms of the leader's epoch.
+    """
+    import multiprocessing
+    import random
+
+    print("=== LAN Sync Self-Test ===\n")
+    leader = SyncLeader(port=0, host="127.0.0.1", log_fn=print)
+    leader.start()
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    skews = [random.uniform(-5.0, 5.0) for _ in range(n_peers)]
+    procs = [
+        ctx.Process(target=_test_follower, args=(leader.port, f"peer-{i + 1}", skews[i], results), daemon=True)
+        for i in range(n_peers)
+    ]
+    for proc in procs:
+        proc.start()
+    deadline = time.perf_counter() + 15.0
+    while len(leader.peers()) < n_peers and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    assert len(leader.peers()) == n_peers, f"only {len(leader.peers())} of {n_peers} peers reported"
+    epoch = leader.announce_start(lead_s=1.5, plan_id="self-test")
+    reports = [results.get(timeout=10.0) for _ in procs]
+    for proc in procs:
+        proc.join(5.0)
+    print(f"Acked: {leader.acked(epoch)}/{n_peers}")
+    for peer in sorted(leader.peers(), key=lambda p: p.name):
+        print(f"  {peer.describe()}")
+    leader.stop()
+
+    worst = 0.0
+    for name, scheduled, started, offset_ms, skew_ms, jitter_ms in sorted(reports):
+        error_ms = (scheduled - epoch) * 1000
+        late_ms = (started - scheduled) * 1000
+        worst = max(worst, abs(error_ms))
+        print(f"{name}: true skew {-skew_ms:+.3f}ms, estimated {offset_ms:+.3f}ms, "
+              f"jitter {jitter_ms:.3f}ms, start {error_ms:+.3f}ms from the epoch (woke {late_ms:.3f}ms late)")
+    # Wake-up lateness is the OS scheduler's (all peers share this machine's CPUs);
+    # the sync itself must place every start within 2ms of the epoch
+    assert worst < 2.0, f"a peer's start is {worst:.3f}ms off"
+    print(f"\nAll {n_peers} peers scheduled within {worst:.3f}ms of the epoch: OK")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LAN clock sync (UDP)")
+    parser.add_argument("role", choices=["leader", "follow", "test"])
+    parser.add_argument("host", nargs="?", default="127.0.0.1", help="Leader address (follow)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--peers", type=int, default=4, help="Follower processes (test)")
+    parser.add_argument("--lead", type=float, default=3.0, help="Seconds between announce and start (leader)")
+    args = parser.parse_args()
+
+    if args.role == "test":
+        self_test(args.peers)
+    elif args.role == "leader":
+        leader = SyncLeader(port=args.port, log_fn=print)
+        leader.start()
+        try:
+            while True:
+                input("Enter = announce start (Ctrl+C to quit)\n")
+                for peer in leader.peers():
+                    print(f"  {peer.describe()}")
+                leader.announce_start(args.lead)
+        except (KeyboardInterrupt, EOFError):
+            leader.stop()
+    else:
+        follower = SyncFollower(args.host, args.port, log_fn=print)
+        try:
+            while True:
+                start_at = follower.wait_for_start()
+                if start_at is None:
+                    break
+                time.sleep(max(0.0, start_at - time.perf_counter() - _TEST_SPIN_S))
+                while time.perf_counter() < start_at:
+                    pass
+                print(f"[Sync] Started (local {time.perf_counter():.6f})")
+        except KeyboardInterrupt:
+            follower.close()
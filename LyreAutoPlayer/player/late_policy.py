@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Late-event policy for the output scheduler.
+
+A fixed late-drop threshold is wrong on both ends: on a slow machine normal
+backend latency already exceeds it and whole passages are dropped, on a fast
+machine it lets clearly stale presses through. LatePolicy derives the
+threshold from a sliding-window histogram of the backend call time actually
+observed: threshold = p99 * headroom + margin, clamped, where the headroom
+covers a chord's presses going out one after another. Lateness itself is not
+fed back (under overload it would only push the threshold up). Until the
+window has enough samples the configured late_drop_ms is used.
+
+What happens to a press later than the threshold depends on the mode:
+
+- drop:     skip it (previous behaviour, adaptive threshold)
+- compress: play it and take the lateness as a catch-up offset that shrinks
+            linearly over the next N events (gaps are compressed instead of
+            events bunching up at once); offsets beyond MAX_CATCH_UP_MS
+            mean throughput is exceeded and the press is dropped
+- melody:   drop inner/bass chord voices first; the top note of a chord is
+            only dropped past a harder limit (threshold * MELODY_HARD_FACTOR)
+
+Per-bar statistics (events, drops, compressions, p99, threshold) are kept for
+the end-of-playback report.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+LATE_POLICY_MODES = ("drop", "compress", "melody")
+
+WINDOW_SAMPLES = 512        # Sliding window size
+BAR_WINDOW_SAMPLES = 128    # Per-bar histogram window
+WARMUP_SAMPLES = 64         # Samples before the adaptive threshold takes over
+RECOMPUTE_EVERY = 16        # Samples between threshold updates
+BUCKET_MS = 0.25            # Histogram resolution
+MAX_BUCKET_MS = 250.0       # Last bucket collects everything above
+HEADROOM = 4.0              # threshold = backend p99 * HEADROOM + MARGIN_MS (4-note chord)
+MARGIN_MS = 4.0             # Timer / wake-up jitter
+MIN_THRESHOLD_MS = 8.0
+MAX_THRESHOLD_MS = 120.0
+MELODY_HARD_FACTOR = 3.0    # Top notes survive up to threshold * factor
+CATCH_UP_EVENTS = 8         # Compress mode: events over which the offset decays
+MAX_CATCH_UP_MS = 250.0     # Compress mode: larger offsets drop instead
+
+
+class LatencyHistogram:
+    """Sliding-window histogram with fixed buckets (O(1) add, O(buckets) percentile)."""
+
+    def __init__(self, window: int = WINDOW_SAMPLES, bucket_ms: float = BUCKET_MS,
+                 max_ms: float = MAX_BUCKET_MS):
+        self._bucket_ms = bucket_ms
+        self._counts = [0] * (int(max_ms / bucket_ms) + 1)
+        self._ring: List[int] = [0] * window
+        self._window = window
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ms: float):
+        bucket = min(len(self._counts) - 1, max(0, int(ms / self._bucket_ms)))
+        if self._size == self._window:
+            self._counts[self._ring[self._pos]] -= 1
+        else:
+            self._size += 1
+        self._ring[self._pos] = bucket
+        self._counts[bucket] += 1
+        self._pos = (self._pos + 1) % self._window
+
+    def percentile(self, p: float) -> float:
+        """Upper edge of the bucket holding the p-th percentile (ms); 0 if empty."""
+        if self._size == 0:
+            return 0.0
+        rank = p / 100.0 * self._size
+        seen = 0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return (bucket + 1) * self._bucket_ms
+        return len(self._counts) * self._bucket_ms
+
+
+@dataclass
+class BarLateStats:
+    """Late-policy statistics of one bar."""
+    bar: int
+    events: int = 0
+    dropped: int = 0
+    compressed: int = 0
+    late_max_ms: float = 0.0
+    p99_ms: float = 0.0          # Lateness p99 of the executed events
+    threshold_ms: float = 0.0
+
+    def describe(self) -> str:
+        return (
+            f"bar {self.bar}: events={self.events}, late p99={self.p99_ms:.1f}ms, max={self.late_max_ms:.1f}ms, "
+            f"threshold={self.threshold_ms:.1f}ms, dropped={self.dropped}, compressed={self.compressed}"
+        )
+
+
+class LatePolicy:
+    """
+    Decides what the output scheduler does with late events.
+
+    Called from the scheduler thread only.
+    """
+
+    def __init__(
+        self,
+        mode: str = "drop",
+        threshold_ms: float = 25.0,
+        adaptive: bool = True,
+        catch_up_events: int = CATCH_UP_EVENTS,
+        log_fn: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            mode: "drop", "compress" or "melody"
+            threshold_ms: Fixed threshold, or the starting one when adaptive
+            adaptive: Derive the threshold from the observed backend p99
+            catch_up_events: Compress mode: events over which lateness is recovered
+            log_fn: Optional logging function (threshold changes)
+        """
+        if mode not in LATE_POLICY_MODES:
+            raise ValueError(f"unknown late policy mode: {mode}")
+        self.mode = mode
+        self.adaptive = adaptive
+        self._threshold_ms = threshold_ms
+        self._catch_up_events = max(1, catch_up_events)
+        self._log_fn = log_fn or (lambda msg: None)
+        self._histogram = LatencyHistogram()
+        self._since_update = 0
+
+        # Compress mode: offset (s) added to event times, decaying per event
+        self._offset = 0.0
+        self._offset_step = 0.0
+
+        # Melody mode: top note of the chord currently being played
+        self._chord_time: Optional[float] = None
+        self._chord_top = -1
+
+        self._bars: Dict[int, BarLateStats] = {}
+        self._bar_samples: Dict[int, LatencyHistogram] = {}
+
+    @property
+    def threshold_ms(self) -> float:
+        return self._threshold_ms
+
+    @property
+    def offset(self) -> float:
+        """Catch-up offset (s) to add to event times (compress mode)."""
+        return self._offset
+
+    @property
+    def needs_chord_top(self) -> bool:
+        return self.mode == "melody"
+
+    def is_new_chord(self, time_s: float) -> bool:
+        return self._chord_time is None or abs(time_s - self._chord_time) > 1e-6
+
+    def set_chord(self, time_s: float, top_note: int):
+        """Melody mode: the scheduler reports the highest press at `time_s`."""
+        self._chord_time = time_s
+        self._chord_top = top_note
+
+    def reset(self):
+        """Seek: forget catch-up offset and chord state (statistics are kept)."""
+        self._offset = 0.0
+        self._offset_step = 0.0
+        self._chord_time = None
+
+    def should_play(self, event, late_ms: float) -> bool:
+        """Decide a due press. Returns False to drop it."""
+        if late_ms <= self._threshold_ms:
+            return True
+        bar = self._bar(event.bar_index)
+        if self.mode == "compress" and self._offset * 1000 + late_ms <= MAX_CATCH_UP_MS:
+            # Recover the lateness over the next events instead of bunching them
+            self._offset += late_ms / 1000.0
+            self._offset_step = self._offset / self._catch_up_events
+            bar.compressed += 1
+            return True
+        if self.mode == "melody" and event.note >= self._chord_top:
+            if late_ms <= self._threshold_ms * MELODY_HARD_FACTOR:
+                return True
+        bar.dropped += 1
+        return False
+
+    def on_executed(self, event, late_ms: float, backend_ms: float):
+        """Record one executed event (backend and lateness samples) and decay the catch-up offset."""
+        self._histogram.add(backend_ms)
+        bar = self._bar(event.bar_index)
+        bar.events += 1
+        bar.late_max_ms = max(bar.late_max_ms, late_ms)
+        self._bar_samples[event.bar_index].add(max(0.0, late_ms))
+
+        if self._offset > 0.0:
+            self._offset = max(0.0, self._offset - self._offset_step)
+
+        if self.adaptive:
+            self._since_update += 1
+            if self._since_update >= RECOMPUTE_EVERY and len(self._histogram) >= WARMUP_SAMPLES:
+                self._since_update = 0
+                p99 = self._histogram.percentile(99)
+                threshold = min(MAX_THRESHOLD_MS, max(MIN_THRESHOLD_MS, p99 * HEADROOM + MARGIN_MS))
+                if abs(threshold - self._threshold_ms) > self._threshold_ms * 0.25:
+                    self._log_fn(f"[LatePolicy] threshold {self._threshold_ms:.1f} -> {threshold:.1f}ms (backend p99 {p99:.1f}ms)")
+                self._threshold_ms = threshold
+
+    def backend_p99_ms(self) -> float:
+        return self._histogram.percentile(99)
+
+    def bar_report(self) -> List[BarLateStats]:
+        """Per-bar statistics in bar order."""
+        for index, stats in self._bars.items():
+            stats.p99_ms = self._bar_samples[index].percentile(99)
+        return [self._bars[index] for index in sorted(self._bars)]
+
+    def _bar(self, index: int) -> BarLateStats:
+        stats = self._bars.get(index)
+        if stats is None:
+            stats = BarLateStats(bar=index)
+            self._bars[index] = stats
+            self._bar_samples[index] = LatencyHistogram(window=BAR_WINDOW_SAMPLES)
+        stats.threshold_ms = self._threshold_ms
+        return stats
+
+
+def bar_report_dicts(report: List[BarLateStats]) -> List[dict]:
+    """Plain dicts (pickling across the dispatcher pipe / JSON)."""
+    return [asdict(stats) for stats in report]
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: percentile, adaptive threshold, melody and compress decisions."""
+    from .scheduler import KeyEvent
+
+    print("=== LatePolicy Self-Test ===\n")
+
+    hist = LatencyHistogram(window=100)
+    for i in range(200):
+        hist.add(i % 100 / 10.0)  # 0.0 .. 9.9 ms, twice
+    p99 = hist.percentile(99)
+    assert 9.5 <= p99 <= 10.25, p99
+    print(f"p99 of 0..9.9ms: {p99:.2f}ms")
+
+    # Slow backend: the adaptive threshold rises above the 25ms default
+    policy = LatePolicy("drop", threshold_ms=25.0)
+    for i in range(WARMUP_SAMPLES + RECOMPUTE_EVERY):
+        policy.on_executed(KeyEvent(i * 0.01, 2, "press", "a", 60), 5.0, 10.0)
+    assert policy.threshold_ms > 25.0, policy.threshold_ms
+    print(f"adaptive threshold (10ms backend): {policy.threshold_ms:.1f}ms")
+
+    # Fast backend: tighter than the default
+    policy = LatePolicy("drop", threshold_ms=25.0)
+    for i in range(WARMUP_SAMPLES + RECOMPUTE_EVERY):
+        policy.on_executed(KeyEvent(i * 0.01, 2, "press", "a", 60), 0.3, 0.2)
+    assert policy.threshold_ms == MIN_THRESHOLD_MS, policy.threshold_ms
+    print(f"adaptive threshold (0.2ms backend): {policy.threshold_ms:.1f}ms")
+
+    # Melody: inner voice dropped, top note kept
+    policy = LatePolicy("melody", threshold_ms=10.0, adaptive=False)
+    policy.set_chord(1.0, 72)
+    assert not policy.should_play(KeyEvent(1.0, 2, "press", "a", 64), 15.0)
+    assert policy.should_play(KeyEvent(1.0, 2, "press", "b", 72), 15.0)
+    assert not policy.should_play(KeyEvent(1.0, 2, "press", "b", 72), 40.0)
+    print("melody: inner dropped, top kept until hard limit")
+
+    # Compress: lateness becomes an offset recovered over N events
+    policy = LatePolicy("compress", threshold_ms=10.0, adaptive=False, catch_up_events=4)
+    late = KeyEvent(2.0, 2, "press", "a", 60)
+    assert policy.should_play(late, 40.0)
+    assert abs(policy.offset - 0.040) < 1e-9
+    for _ in range(4):
+        policy.on_executed(late, 0.0, 0.0)
+    assert policy.offset == 0.0
+    print("compress: 40ms offset recovered over 4 events")
+
+    for stats in policy.bar_report():
+        print(" ", stats.describe())
+    print("OK")
+
+
+if __name__ == "__main__":
+    self_test()
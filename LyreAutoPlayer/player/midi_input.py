@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Live MIDI input pass-through: a MIDI keyboard plays the in-game instrument.
+
+The pitch -> key table for every octave shift is built once (build_key_tables
+over all 128 pitches, so quantization matches playback exactly). The MIDI
+input callback looks the pitch up and calls InputManager.press / release
+on the callback thread: no queue, no dispatcher. The only handoff is the
+table reference, which set_octave swaps atomically. Held notes remember the
+key and quantized note they pressed, so an octave switch never leaves a key
+stuck and a release carries the note of its press; pitches that fold onto
+the same key press it once and release it with the last one. The held-note
+state is guarded by a lock, so release_all (UI thread) cannot interleave
+with the callback.
+
+Latency is measured per event from message arrival (the port's timestamp
+when it has one, otherwise callback entry) to the return of the backend
+call, and kept in a sliding window for stats().
+
+Real ports need mido's rtmidi backend (pip install python-rtmidi); the
+LoopbackInput port delivers messages from its own thread the way a driver
+callback does, so the path can be tested on Linux without hardware.
+
+Usage:
+    passthrough = MidiPassthrough(cfg, input_manager, log_fn=print)
+    port = open_midi_input("Digital Piano", passthrough.on_message)   # or LoopbackInput(passthrough.on_message)
+    passthrough.set_octave(+1)
+    print(passthrough.stats().describe())
+    port.close(); passthrough.close()
+
+    python -m player.midi_input --list
+    python -m player.midi_input --port "Digital Piano" --backend sendinput
+    python -m player.midi_input --loopback                # Self-test on the debug backend
+"""
+
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .config import PlayerConfig
+from .key_tables import KeyTable, build_key_tables, OCTAVE_SHIFTS
+
+LATENCY_WINDOW = 4096   # Events kept for stats()
+
+
+@dataclass
+class PassthroughStats:
+    """End-to-end latency (arrival -> backend call returned) of recent events."""
+    events: int
+    unmapped: int           # Notes outside the layout (no key under the quantization policy)
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+    def describe(self) -> str:
+        return (f"{self.events} events ({self.unmapped} unmapped), latency "
+                f"p50 {self.p50_ms:.3f}ms, p99 {self.p99_ms:.3f}ms, max {self.max_ms:.3f}ms")
+
+
+class MidiPassthrough:
+    """
+    Maps MIDI note on/off to key presses on the input callback thread.
+
+    on_message is normally called from the MIDI backend's callback thread;
+    release_all / close may be called from any thread.
+    """
+
+    def __init__(self, cfg: PlayerConfig, input_manager, log_fn: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            cfg: Layout and quantization settings (root, preset, accidental policy, octave_shift)
+            input_manager: InputManager used for injection (press / release)
+            log_fn: Optional logging function
+        """
+        self._input = input_manager
+        self._log_fn = log_fn or (lambda msg: None)
+        self._tables: Dict[int, KeyTable] = build_key_tables(cfg, range(128))
+        self._table: KeyTable = self._tables[cfg.octave_shift]
+        self.octave_shift = cfg.octave_shift
+        self._held: Dict[int, Tuple[str, int]] = {}   # Pitch -> (key, note) it pressed
+        self._key_holds: Dict[str, int] = {}           # Key -> held pitches on it
+        self._lock = threading.Lock()                  # Held-note state (callback vs release_all)
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)  # Appended on the callback thread only
+        self._events = 0
+        self._unmapped = 0
+
+    def set_octave(self, shift: int) -> bool:
+        """Swap the pitch -> key table (any thread; the next note uses it)."""
+        table = self._tables.get(shift)
+        if table is None:
+            return False
+        self._table = table
+        self.octave_shift = shift
+        return True
+
+    def on_message(self, msg, received_at: Optional[float] = None):
+        """MIDI input callback (mido message)."""
+        if received_at is None:
+            received_at = time.perf_counter()
+        if msg.type == "note_on" and msg.velocity > 0:
+            mapped = self._table.get(msg.note)
+            if mapped is None:
+                self._unmapped += 1
+                return
+            key, note = mapped
+            with self._lock:
+                if msg.note in self._held:
+                    return  # Repeated note-on without note-off
+                self._held[msg.note] = mapped
+                holds = self._key_holds.get(key, 0)
+                self._key_holds[key] = holds + 1
+                if holds == 0:
+                    self._input.press(key, note)
+        elif msg.type in ("note_off", "note_on"):
+            with self._lock:
+                held = self._held.pop(msg.note, None)
+                if held is None:
+                    return
+                key, note = held
+                holds = self._key_holds.pop(key, 1) - 1
+                if holds > 0:
+                    self._key_holds[key] = holds
+                    return
+                self._input.release(key, note)
+        elif msg.type == "control_change" and msg.control in (120, 123):  # All sound / notes off
+            self.release_all()
+            return
+        else:
+            return
+        self._events += 1
+        self._latencies.append((time.perf_counter() - received_at) * 1000)
+
+    def release_all(self):
+        """Release every held key (any thread)."""
+        with self._lock:
+            self._held.clear()
+            self._key_holds.clear()
+            self._input.release_all()
+
+    def stats(self) -> PassthroughStats:
+        samples = sorted(self._latencies)
+        if not samples:
+            return PassthroughStats(self._events, self._unmapped, 0.0, 0.0, 0.0)
+        return PassthroughStats(
+            events=self._events,
+            unmapped=self._unmapped,
+            p50_ms=statistics.median(samples),
+            p99_ms=samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            max_ms=samples[-1],
+        )
+
+    def close(self):
+        """Release held keys and log the latency summary."""
+        self.release_all()
+        self._log_fn(f"[MIDI in] {self.stats().describe()}")
+
+
+def list_midi_inputs() -> List[str]:
+    """Input port names (empty without a mido backend)."""
+    try:
+        import mido
+        return list(mido.get_input_names())
+    except Exception:
+        return []
+
+
+def open_midi_input(name: str, callback: Callable):
+    """Open a MIDI input port with a callback (requires mido's rtmidi backend)."""
+    import mido
+    return mido.open_input(name, callback=callback)
+
+
+class LoopbackInput:
+    """
+    Fake MIDI input port: send() hands messages to a delivery thread that
+    calls callback(msg, sent_at), like a driver callback thread does.
+    """
+
+    def __init__(self, callback: Callable):
+        self._callback = callback
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._deliver, daemon=True, name="LoopbackInput")
+        self._thread.start()
+
+    def send(self, msg):
+        self._queue.put((msg, time.perf_counter()))
+
+    def _deliver(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._callback(*item)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(1.0)
+
+
+# ============== Self-test ==============
+
+def self_test(n_notes: int = 400):
+    """Loopback self-test on the debug backend: mapping, chords, octave switch, latency."""
+    import random
+    import mido
+    from input_manager import create_input_manager
+
+    print("=== MIDI Pass-through Self-Test ===\n")
+    cfg = PlayerConfig(keyboard_preset="21-key", accidental_policy="octave")
+    manager = create_input_manager(backend="debug", enable_focus_monitor=False)
+    passthrough = MidiPassthrough(cfg, manager, log_fn=print)
+    port = LoopbackInput(passthrough.on_message)
+    backend_log = manager._backend.log
+
+    # C major scale on the root octave maps to the middle row
+    for note in (60, 62, 64, 65, 67, 69, 71):
+        port.send(mido.Message("note_on", note=note, velocity=80))
+        port.send(mido.Message("note_off", note=note))
+    time.sleep(0.2)
+    keys = [key for _ts, key, down, _vk, _sc in backend_log if down]
+    print(f"Scale -> {' '.join(keys)}")
+    assert len(keys) == 7, keys
+
+    # Octave switch while a note is held: the held key is still released
+    backend_log.clear()
+    port.send(mido.Message("note_on", note=60, velocity=80))
+    time.sleep(0.05)
+    assert passthrough.set_octave(1)
+    port.send(mido.Message("note_off", note=60))
+    port.send(mido.Message("note_on", note=72, velocity=80))
+    port.send(mido.Message("note_off", note=72))
+    time.sleep(0.2)
+    assert backend_log[0][1] == backend_log[1][1] and not backend_log[1][2], backend_log
+    assert backend_log[0][1] == backend_log[2][1], "C5 at +1 octave should hit C4's key"
+    passthrough.set_octave(0)
+    print("Octave switch with a held note: OK")
+
+    # Folded pitch (out of the 21-key range): press and release carry the same quantized note
+    presses = []
+    press, release = manager.press, manager.release
+    manager.press = lambda key, note=None: presses.append(("down", key, note)) or press(key, note)
+    manager.release = lambda key, note=None: presses.append(("up", key, note)) or release(key, note)
+    port.send(mido.Message("note_on", note=96, velocity=80))
+    port.send(mido.Message("note_off", note=96))
+    time.sleep(0.1)
+    del manager.press, manager.release
+    assert len(presses) == 2 and presses[0][1:] == presses[1][1:] and presses[0][2] != 96, presses
+    print(f"Folded C7 -> {presses[0][1]} (note {presses[0][2]}), released with the same note: OK")
+
+    # Random playing: chords and runs, latency per event
+    rng = random.Random(1)
+    held: List[int] = []
+    for _ in range(n_notes):
+        if held and rng.random() < 0.5:
+            port.send(mido.Message("note_off", note=held.pop(rng.randrange(len(held)))))
+        else:
+            note = rng.randint(48, 84)
+            if note not in held:
+                held.append(note)
+                port.send(mido.Message("note_on", note=note, velocity=80))
+        time.sleep(rng.choice((0.0, 0.0, 0.002, 0.01)))
+    port.send(mido.Message("control_change", control=123, value=0))
+    time.sleep(0.2)
+    port.close()
+    passthrough.close()
+    assert not manager.get_active_keys(), manager.get_active_keys()
+    manager.stop()
+    print("No stuck keys: OK")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MIDI keyboard -> key injection")
+    parser.add_argument("--list", action="store_true", help="List MIDI input ports")
+    parser.add_argument("--port", default="", help="MIDI input port name")
+    parser.add_argument("--backend", default="sendinput", help="Input backend (sendinput, debug, ...)")
+    parser.add_argument("--octave", type=int, default=0, choices=OCTAVE_SHIFTS)
+    parser.add_argument("--preset", default="21-key", choices=["21-key", "36-key"])
+    parser.add_argument("--loopback", action="store_true", help="Run the loopback self-test")
+    args = parser.parse_args()
+
+    if args.loopback:
+        self_test()
+    elif args.list or not args.port:
+        names = list_midi_inputs()
+        print("\n".join(names) if names else "No MIDI inputs (pip install python-rtmidi)")
+    else:
+        from input_manager import create_input_manager
+
+        manager = create_input_manager(backend=args.backend, enable_focus_monitor=False)
+        passthrough = MidiPassthrough(
+            PlayerConfig(keyboard_preset=args.preset, octave_shift=args.octave), manager, log_fn=print
+        )
+        port = open_midi_input(args.port, passthrough.on_message)
+        print(f"Playing from {args.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(5.0)
+                print(passthrough.stats().describe())
+        except KeyboardInterrupt:
+            port.close()
+            passthrough.close()
+            manager.stop()
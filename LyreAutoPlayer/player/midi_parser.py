@@ -4,7 +4,7 @@ MIDI parsing with duration tracking.
 """
 
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import Iterator, List, Dict, Tuple
 
 import mido
 
@@ -31,23 +31,61 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
     """
     # clip=True: 容错模式，裁剪超范围数据字节到 0..127
     mid = mido.MidiFile(mid_path, clip=True)
+    return _parse_notes(mid, by_track=False).get(0, [])
+
+
+def midi_to_events_by_track(mid_path: str) -> Dict[int, List[NoteEvent]]:
+    """
+    Parse MIDI into one NoteEvent list per track (ensemble parts).
+
+    All tracks share the file's tempo map, so the lists stay on one
+    timeline. Tracks without notes are left out.
+
+    Args:
+        mid_path: Path to MIDI file
+
+    Returns:
+        {track index: NoteEvent list sorted by time}
+    """
+    mid = mido.MidiFile(mid_path, clip=True)
+    return _parse_notes(mid, by_track=True)
+
+
+def _merge_tracks_tagged(tracks) -> Iterator[Tuple[int, int, "mido.Message"]]:
+    """Like mido.merge_tracks, but yields (delta ticks, track index, message)."""
+    messages = []
+    for index, track in enumerate(tracks):
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            if msg.type != "end_of_track":  # As in mido: only the merged track ends
+                messages.append((tick, index, msg))
+    messages.sort(key=lambda item: item[0])  # Stable: same-tick messages keep track order
+    last = 0
+    for tick, index, msg in messages:
+        yield tick - last, index, msg
+        last = tick
+
+
+def _parse_notes(mid: "mido.MidiFile", by_track: bool) -> Dict[int, List[NoteEvent]]:
+    """Pair note_on/note_off (with sustain pedal) into NoteEvents, per track or all in part 0."""
     tempo = 500000  # default 120 BPM
     t = 0.0
 
-    # Track active notes: {(note, channel): [(start_time, velocity, bar_duration), ...]}
+    # Track active notes: {(note, channel, part): [(start_time, velocity, bar_duration), ...]}
     active_notes: Dict[tuple, list] = {}
-    # Sustained notes (held by pedal): {(note, channel): [(start_time, velocity, bar_duration), ...]}
+    # Sustained notes (held by pedal): {(note, channel, part): [(start_time, velocity, bar_duration), ...]}
     sustained_notes: Dict[tuple, list] = {}
     # Sustain pedal state per channel
     sustain_on: Dict[int, bool] = {}
     numerator = 4
     denominator = 4
-    events: List[NoteEvent] = []
+    parts: Dict[int, List[NoteEvent]] = {}
 
-    def append_note(note: int, start_time: float, end_time: float):
+    def append_note(key: tuple, start_time: float, end_time: float):
         """Add a note event with duration."""
         duration = max(0, end_time - start_time)
-        events.append(NoteEvent(time=start_time, note=note, duration=duration))
+        parts.setdefault(key[2], []).append(NoteEvent(time=start_time, note=key[0], duration=duration))
 
     def current_bar_duration() -> float:
         if denominator <= 0:
@@ -56,9 +94,8 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
         beat_duration *= 4 / denominator
         return beat_duration * numerator
 
-    merged = mido.merge_tracks(mid.tracks)
-    for msg in merged:
-        t += mido.tick2second(msg.time, mid.ticks_per_beat, tempo)
+    for delta, track, msg in _merge_tracks_tagged(mid.tracks):
+        t += mido.tick2second(delta, mid.ticks_per_beat, tempo)
 
         if msg.type == "set_tempo":
             tempo = msg.tempo
@@ -81,7 +118,7 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
                     if key[1] != channel:
                         continue
                     for start_time, _, _ in sustained_notes[key]:
-                        append_note(key[0], start_time, t)
+                        append_note(key, start_time, t)
                     del sustained_notes[key]
             continue
 
@@ -89,7 +126,7 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
             continue
 
         channel = getattr(msg, 'channel', 0)
-        key = (msg.note, channel)
+        key = (msg.note, channel, track if by_track else 0)
 
         if msg.type == "note_on" and getattr(msg, "velocity", 0) > 0:
             # Note on
@@ -106,7 +143,7 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
                     sustained_notes.setdefault(key, []).append((start_time, velocity, bar_duration))
                 else:
                     # Normal note end
-                    append_note(msg.note, start_time, t)
+                    append_note(key, start_time, t)
 
     # Handle remaining active notes (no note_off received)
     gap_sec = 0.1
@@ -128,7 +165,8 @@ def midi_to_events_with_duration(mid_path: str) -> List[NoteEvent]:
                 end_time = min(end_time, start_time + bar_duration * max_bars)
             if end_time <= start_time:
                 end_time = start_time + 0.001
-            append_note(key[0], start_time, end_time)
+            append_note(key, start_time, end_time)
 
-    events.sort(key=lambda x: x.time)
-    return events
+    for events in parts.values():
+        events.sort(key=lambda x: x.time)
+    return parts
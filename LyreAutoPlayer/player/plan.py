@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled playback plan: a time-sorted event list with a movable cursor.
+
+The dispatcher walks the plan front to back; seeking moves the cursor with
+a binary search instead of rebuilding the plan, so a running PlayerThread
+can jump anywhere in a few milliseconds. Edited bars are spliced into the
+whole plan (see plan_patch.py), so seeking back or looping plays the edit.
+"""
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set
+
+if TYPE_CHECKING:
+    from .plan_patch import PlanPatch
+
+from .scheduler import KeyEvent
+
+# pause_marker events sit this far before their bar boundary (see compiler.py)
+PAUSE_MARKER_LEAD_S = 0.001
+
+
+class LoopSlice(NamedTuple):
+    """A-B loop: events[start_index:end_index], played from plan time `start` to `end`."""
+    start_index: int
+    end_index: int
+    start: float
+    end: float
+
+
+class PlaybackPlan:
+    """
+    Sorted KeyEvent list + cursor.
+
+    Usage:
+        plan = PlaybackPlan(events)
+        while plan:
+            ev = plan.peek()
+            ...
+            plan.pop()
+        plan.seek(12.5)   # jump (forward or backward)
+        loop = plan.slice(4.0, 8.0)
+        plan.cursor = loop.start_index   # A-B loop: rewind by index
+        plan.load(next_song_events)      # Playlist: next song, cursor at 0
+
+    After a splice, the current pass still releases the keys the replaced
+    notes hold and skips the patch events that were due before the splice;
+    both only last until the cursor is moved (seek, loop rewind, load).
+    """
+
+    def __init__(self, events: List[KeyEvent]):
+        self.events: List[KeyEvent] = sorted(events)
+        self._cursor = 0
+        self._pending: List[KeyEvent] = []  # Releases of replaced presses already dispatched
+        self._skip: Set[int] = set()        # id() of spliced events this pass must not dispatch
+        self._index()
+
+    @property
+    def cursor(self) -> int:
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, index: int):
+        """Jump to an event index; the held-over state of the last splice is dropped."""
+        self._cursor = index
+        self._pending = []
+        self._skip = set()
+
+    def _index(self):
+        """Rebuild the lookup tables after self.events changed."""
+        self._times: List[float] = [ev.time for ev in self.events]
+
+        # Press/release pairing (for notes still sounding at a seek target)
+        self._release_time: Dict[int, float] = {}
+        for ev in self.events:
+            if ev.event_type == "release" and ev.token:
+                self._release_time[ev.token] = max(ev.time, self._release_time.get(ev.token, 0.0))
+        self._max_hold = 0.0
+        for ev in self.events:
+            if ev.event_type == "press" and ev.token in self._release_time:
+                self._max_hold = max(self._max_hold, self._release_time[ev.token] - ev.time)
+
+        # Bar start times from pause markers (bar_index = 0-based bar that starts there)
+        self._bar_start: Dict[int, float] = {0: 0.0}
+        for ev in self.events:
+            if ev.event_type == "pause_marker":
+                self._bar_start[ev.bar_index] = ev.time + PAUSE_MARKER_LEAD_S
+
+    def _skip_spliced(self):
+        while self._skip and self._cursor < len(self.events) and id(self.events[self._cursor]) in self._skip:
+            self._cursor += 1
+
+    def _pending_first(self) -> bool:
+        """The next event due is a held-over release (not in self.events)."""
+        return bool(self._pending) and (
+            self._cursor >= len(self.events) or self._pending[0] < self.events[self._cursor]
+        )
+
+    def __bool__(self) -> bool:
+        self._skip_spliced()
+        return self._cursor < len(self.events) or bool(self._pending)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def remaining(self) -> int:
+        return len(self.events) - self._cursor + len(self._pending)
+
+    def peek(self) -> Optional[KeyEvent]:
+        self._skip_spliced()
+        if self._pending_first():
+            return self._pending[0]
+        if self._cursor < len(self.events):
+            return self.events[self._cursor]
+        return None
+
+    def pop(self) -> KeyEvent:
+        self._skip_spliced()
+        if self._pending_first():
+            return self._pending.pop(0)
+        ev = self.events[self._cursor]
+        self._cursor += 1
+        return ev
+
+    def end_time(self) -> float:
+        return self._times[-1] if self._times else 0.0
+
+    def index_at(self, t: float) -> int:
+        """Index of the first event with time >= t."""
+        return bisect_left(self._times, t)
+
+    def seek(self, t: float) -> int:
+        """Move the cursor to the first event at/after t. Returns the new cursor."""
+        self.cursor = self.index_at(t)
+        return self.cursor
+
+    def load(self, events: List[KeyEvent]):
+        """Replace the whole plan (next playlist song); the cursor goes back to the start."""
+        self.events = sorted(events)
+        self.cursor = 0
+        self._index()
+
+    def slice(self, start: float, end: float) -> LoopSlice:
+        """Index range of the events in [start, end) (resolved once per A-B loop)."""
+        return LoopSlice(self.index_at(start), self.index_at(end), start, end)
+
+    def splice(self, patch: "PlanPatch", now: float) -> int:
+        """
+        Swap the patched bars in the whole plan (already played bars included).
+
+        The pass in progress continues as if the plan had been spliced at `now`:
+        releases of replaced presses already dispatched still go out (no stuck
+        keys), and patch events due before `now` are not dispatched, with the
+        releases of those presses. The cursor stays on the next event due.
+        Returns the number of events added.
+        """
+        head = self.events[:self._cursor]
+        dispatched = {ev.token for ev in head if ev.event_type == "press"}
+        undispatched = {id(ev) for ev in self.events[self._cursor:]}
+        pending = self._pending + [
+            ev for ev in self.events[self._cursor:]
+            if patch.replaces(ev) and ev.event_type == "release" and ev.token in dispatched
+        ]
+        kept = [ev for ev in self.events if not patch.replaces(ev)]
+        skipped = {ev.token for ev in patch.events if ev.event_type == "press" and ev.time < now}
+        skip = self._skip | {
+            id(ev) for ev in patch.events
+            if ev.time < now or (ev.event_type == "release" and ev.token in skipped)
+        }
+        self.events = sorted(kept + list(patch.events))
+        self._index()
+
+        # Next event due: the first one not dispatched yet that is not skipped
+        cursor = len(self.events)
+        for i, ev in enumerate(self.events):
+            if id(ev) in undispatched or (id(ev) not in skip and ev.time >= now):
+                cursor = i
+                break
+        self.cursor = cursor
+        self._pending = sorted(pending)
+        self._skip = skip
+        return sum(1 for ev in patch.events if id(ev) not in skip)
+
+    def bar_start_time(self, bar_index: int) -> Optional[float]:
+        """Plan time where 0-based bar `bar_index` starts (None if unknown)."""
+        return self._bar_start.get(bar_index)
+
+    def sounding_at(self, t: float) -> List[KeyEvent]:
+        """Presses that started before t and are released after t."""
+        lo = self.index_at(t - self._max_hold) if self._max_hold > 0 else self.index_at(t)
+        hi = self.index_at(t)
+        return [
+            ev for ev in self.events[lo:hi]
+            if ev.event_type == "press" and self._release_time.get(ev.token, 0.0) > t
+        ]
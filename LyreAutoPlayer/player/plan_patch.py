@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental plan patching: hot-swap edited bars into a running plan.
+
+An edit in the editor (follow mode) changes a few notes. Instead of a full
+recompile + restart, the changed notes are diffed into a dirty bar range and
+only those bars are recompiled (quantization, humanization draws addressed by
+(bar, note), key collisions resolved from the per-key next free time the
+earlier bars left). A press can shorten the hold of an earlier note on its
+key, so the range starts collision_reach_bars earlier. If the new bars end
+with a different key state, the following bars are recompiled as long as
+that state would move their presses. The result is a PlanPatch that the dispatcher splices into the plan,
+played bars included (PlaybackPlan.splice).
+
+Simulated errors are decided per 8-bar group over the whole plan (a pause
+shifts every later event), so with error simulation on the patch is a full
+recompile that replaces everything from the first dirty bar on.
+
+Usage:
+    bars = dirty_bar_range(old_notes, new_notes, bar_duration)
+    if bars is not None:
+        patch = build_patch(PlanCompiler(new_notes, cfg, seed), note_to_key, plan_events, bars)
+        plan_events = apply_patch(plan_events, patch)    # Reference copy
+        plan.splice(patch, control.now())                # Dispatcher side
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .compiler import PlanCompiler, POST_RELEASE_S
+from .midi_parser import NoteEvent
+from .plan import PlaybackPlan
+from .scheduler import KeyEvent
+
+NOTE_EVENT_TYPES = ("press", "release")
+ALL_EVENT_TYPES = ("press", "release", "error_marker", "pause_marker")
+LAST_BAR = 1 << 30  # "Until the end" for PlanPatch.last_bar
+
+
+@dataclass
+class PlanPatch:
+    """Replacement events for bars first_bar..last_bar (inclusive) of a plan."""
+    first_bar: int
+    last_bar: int
+    events: List[KeyEvent]
+    event_types: Tuple[str, ...] = NOTE_EVENT_TYPES   # Event types the patch replaces
+    applied_errors: Optional[list] = None             # New AppliedError list (full recompile)
+
+    def replaces(self, ev: KeyEvent) -> bool:
+        return ev.event_type in self.event_types and self.first_bar <= ev.bar_index <= self.last_bar
+
+    def describe(self) -> str:
+        last = "end" if self.last_bar >= LAST_BAR else str(self.last_bar)
+        return f"bars {self.first_bar}-{last}, {len(self.events)} events"
+
+
+def dirty_bar_range(old: Sequence[NoteEvent], new: Sequence[NoteEvent],
+                    bar_duration: float) -> Optional[Tuple[int, int]]:
+    """
+    Bars touched by an edit (None if the notes are unchanged).
+
+    Both lists are time-sorted; the changed part is what remains after
+    stripping the common prefix and suffix. Old and new positions of a moved
+    note both count.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    changed = list(old[prefix:len(old) - suffix]) + list(new[prefix:len(new) - suffix])
+    if not changed:
+        return None
+    if bar_duration <= 0:
+        return 0, LAST_BAR
+    times = [ev.time for ev in changed]
+    return int(min(times) / bar_duration), int(max(times) / bar_duration)
+
+
+def key_state(plan_events: Sequence[KeyEvent], before_bar: int) -> Dict[str, float]:
+    """Per-key next free time after the notes of bars < before_bar (compiler timeline state)."""
+    state: Dict[str, float] = {}
+    for ev in plan_events:
+        if ev.event_type == "release" and ev.bar_index < before_bar:
+            key = ev.key.lower()
+            state[key] = max(state.get(key, 0.0), ev.time + POST_RELEASE_S)
+    return state
+
+
+def _spill_bar(plan_events: Sequence[KeyEvent], after_bar: int,
+               old_state: Dict[str, float], new_state: Dict[str, float]) -> Optional[int]:
+    """
+    First bar after `after_bar` whose presses the changed key state can move.
+
+    A later press of key k is unaffected if it starts after both the old and
+    the new free time of k: it was not pushed by the old state and the new
+    one does not reach it.
+    """
+    changed = {
+        key for key in set(old_state) | set(new_state)
+        if abs(old_state.get(key, 0.0) - new_state.get(key, 0.0)) > 1e-9
+    }
+    for ev in sorted(ev for ev in plan_events if ev.event_type == "press" and ev.bar_index > after_bar):
+        key = ev.key.lower()
+        if key not in changed:
+            continue
+        changed.discard(key)
+        if ev.time <= max(old_state.get(key, 0.0), new_state.get(key, 0.0)) + 1e-9:
+            return ev.bar_index
+        if not changed:
+            break
+    return None
+
+
+def _renumber(events: List[KeyEvent], plan_events: Sequence[KeyEvent]) -> List[KeyEvent]:
+    """Move press/release tokens past the plan's, so spliced notes never pair with old ones."""
+    base = max((ev.token for ev in plan_events if ev.event_type in NOTE_EVENT_TYPES), default=0)
+    return [
+        replace(ev, token=ev.token + base) if ev.event_type in NOTE_EVENT_TYPES else ev
+        for ev in events
+    ]
+
+
+def build_patch(compiler: PlanCompiler, note_to_key: Dict[int, str],
+                plan_events: Sequence[KeyEvent], bars: Tuple[int, int]) -> PlanPatch:
+    """
+    Recompile the dirty bars of the edited notes (compiler.events).
+
+    Args:
+        compiler: PlanCompiler for the edited notes (same cfg and seed as the plan)
+        note_to_key: Layout used by the plan
+        plan_events: Events of the running plan
+        bars: Dirty bar range (dirty_bar_range)
+    """
+    first, last = bars
+    if compiler.cfg.error_config.enabled or last >= LAST_BAR:
+        compiled = compiler.compile(note_to_key)
+        events = [ev for ev in compiled.events if ev.bar_index >= first]
+        return PlanPatch(first, LAST_BAR, _renumber(events, plan_events), ALL_EVENT_TYPES,
+                         applied_errors=compiled.applied_errors)
+
+    if not compiler.cfg.strict_midi_timing:
+        # Earlier notes whose holds the edited presses may shorten
+        first = max(0, first - compiler.collision_reach_bars())
+    events = compiler.compile_bars(note_to_key, first, last, key_state(plan_events, first))
+    if not compiler.cfg.strict_midi_timing:
+        # Key collisions carry into later bars: recompile them while the new state moves a press
+        while True:
+            spill = _spill_bar(plan_events, last, key_state(plan_events, last + 1), compiler.next_free_time)
+            if spill is None:
+                break
+            events += compiler.compile_bars(note_to_key, last + 1, spill, compiler.next_free_time)
+            last = spill
+    return PlanPatch(first, last, _renumber(events, plan_events))
+
+
+def apply_patch(plan_events: Sequence[KeyEvent], patch: PlanPatch) -> List[KeyEvent]:
+    """Whole-plan view of a patch (no cursor): the replaced events swapped for the new ones."""
+    return sorted([ev for ev in plan_events if not patch.replaces(ev)] + list(patch.events))
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: a patched plan equals a full compile of the edited notes."""
+    from .config import PlayerConfig
+    from .compiler import build_note_to_key
+
+    print("=== Plan Patch Self-Test ===\n")
+
+    cfg = PlayerConfig(bar_duration_override=1.0, input_style="natural", use_midi_duration=True)
+    note_to_key = build_note_to_key(cfg)
+    scale = [60, 62, 64, 65, 67, 69, 71, 72]
+    notes = [NoteEvent(time=i * 0.25, note=scale[i % 8], duration=0.2) for i in range(64)]
+
+    def note_events(events):
+        return [(round(ev.time, 9), ev.event_type, ev.key, ev.note, ev.bar_index)
+                for ev in sorted(events) if ev.event_type in NOTE_EVENT_TYPES]
+
+    base = PlanCompiler(notes, cfg, seed=7).compile(note_to_key).events
+
+    # Edit bar 5: move one note, lengthen another (the long note collides into bar 6)
+    edited = list(notes)
+    edited[21] = NoteEvent(time=5.3, note=65, duration=0.2)
+    edited[22] = NoteEvent(time=5.5, note=60, duration=2.0)
+    edited.sort(key=lambda ev: ev.time)
+    bars = dirty_bar_range(notes, edited, 1.0)
+    assert bars == (5, 5), bars
+    assert dirty_bar_range(notes, list(notes), 1.0) is None
+
+    patch = build_patch(PlanCompiler(edited, cfg, seed=7), note_to_key, base, bars)
+    print(f"Patch: {patch.describe()}")
+    full = PlanCompiler(edited, cfg, seed=7).compile(note_to_key).events
+    assert note_events(apply_patch(base, patch)) == note_events(full)
+    assert patch.last_bar >= 6, patch.last_bar  # Spilled into the next bar
+
+    # Splice in the middle of bar 5: the held old notes are still released,
+    # patch presses already due are not played in this pass
+    plan = PlaybackPlan(base)
+    plan.seek(5.3)
+    dispatched = {ev.token for ev in plan.events[:plan.cursor] if ev.event_type == "press"}
+    held = {ev.token for ev in plan.events[plan.cursor:]
+            if ev.event_type == "release" and ev.token in dispatched and patch.replaces(ev)}
+    plan.splice(patch, now=5.3)
+    played = []
+    while plan and plan.peek().time < 6.0:
+        played.append(plan.pop())
+    assert held and held <= {ev.token for ev in played if ev.event_type == "release"}, held
+    assert all(ev.time >= 5.3 for ev in played if ev.event_type == "press")
+
+    # Seek back into the patched bar 5: it plays the edit
+    plan = PlaybackPlan(base)
+    plan.seek(6.0)
+    plan.splice(patch, now=6.0)
+    assert note_events(plan.events) == note_events(full)
+    plan.seek(5.0)
+    replayed = []
+    while plan and plan.peek().time < 6.0:
+        ev = plan.pop()
+        if ev.event_type == "press":
+            replayed.append((round(ev.time, 9), ev.note))
+    expected = [(round(ev.time, 9), ev.note) for ev in sorted(full)
+                if ev.event_type == "press" and 5.0 <= ev.time < 6.0]
+    assert replayed == expected, (replayed, expected)
+    print(f"Seek back into bar 5: {len(replayed)} patched presses replayed, {len(held)} old note(s) released")
+    print("OK")
+
+
+if __name__ == "__main__":
+    self_test()
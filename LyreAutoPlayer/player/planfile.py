@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled playback plans on disk (.lyreplan).
+
+A .lyreplan file captures exactly what the dispatcher is given: every key
+event of one compiled performance, plus the configuration hash, seed and
+layout it was compiled with. It loads through mmap (the columns are used in
+place, only the KeyEvent objects are built), PlayerConfig.plan_path plays it
+without recompiling, and two files can be diffed to see what changed
+between runs - a reproducible bug report is one file.
+
+Layout (little-endian):
+    header   <8sHHIII  magic, version, reserved, event count, meta size, strings size
+    meta     UTF-8 JSON: config_hash, seed, layout, bar timing, source, full config
+    strings  UTF-8 JSON list (keys and error names)
+    padding  to 8 bytes
+    columns  fixed-width arrays of `count` entries, widest first:
+             time f64 | bar i32 | token i32 | key u16 | error u16 | note i16 |
+             pitch i16 | opcode u8 | priority i8
+
+Usage:
+    save_plan("run.lyreplan", compiled, cfg)
+    with PlanFile("run.lyreplan") as plan:
+        plan.meta["seed"], plan.times[0], plan.events()
+    print(diff_plans("a.lyreplan", "b.lyreplan").describe())
+
+    python -m player.planfile compile song.mid out.lyreplan [--seed N]
+    python -m player.planfile info out.lyreplan
+    python -m player.planfile diff a.lyreplan b.lyreplan
+"""
+
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from .config import PlayerConfig
+from .compiler import CompiledPlan
+from .scheduler import KeyEvent
+from .shared_plan import EVENT_TYPES
+from .key_tables import OCTAVE_SHIFTS
+
+PLAN_SUFFIX = ".lyreplan"
+FORMAT_VERSION = 1
+
+_MAGIC = b"LYREPLAN"
+_HEADER = struct.Struct("<8sHHIII")
+_ALIGN = 8
+
+# (attribute, array typecode); widest first so every column stays aligned
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("times", "d"), ("bars", "i"), ("tokens", "i"), ("keys", "H"), ("errors", "H"),
+    ("notes", "h"), ("pitches", "h"), ("opcodes", "B"), ("priorities", "b"),
+)
+
+# Runtime-only settings: they do not change the compiled plan, so they stay out of the hash
+RUNTIME_FIELDS = frozenset({
+    "target_hwnd", "midi_path", "countdown_sec", "skip_countdown", "start_at_time", "humanize_seed",
+    "play_sound", "soundfont_path", "instrument", "velocity", "enable_diagnostics", "stall_threshold_ms",
+    "input_backend", "dispatch_process", "performance_mode", "playlist", "playlist_gap_s",
+    "sync_start_at", "plan_path", "late_drop_ms", "enable_late_drop", "late_policy",
+    "adaptive_late_drop", "speed_governor", "governor_min_rate",
+})
+
+_LAYOUT_FIELDS = ("root_mid_do", "octave_shift", "keyboard_preset", "accidental_policy",
+                  "enable_accidental_policy", "octave_min_note", "octave_max_note", "octave_range_auto")
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# Layout settings a plan file may apply to playback, with their validity check
+PLAN_LAYOUT_FIELDS = {
+    "keyboard_preset": lambda v: v in ("21-key", "36-key"),
+    "root_mid_do": lambda v: _is_int(v) and 0 <= v <= 127,
+    "octave_shift": lambda v: _is_int(v) and v in OCTAVE_SHIFTS,
+    "accidental_policy": lambda v: v in ("octave", "drop", "lower", "upper"),
+}
+
+
+def config_dict(cfg: PlayerConfig) -> dict:
+    return json.loads(json.dumps(asdict(cfg), default=str))
+
+
+def config_hash(cfg: PlayerConfig) -> str:
+    """Hash of the settings that affect compilation (RUNTIME_FIELDS excluded)."""
+    relevant = {k: v for k, v in config_dict(cfg).items() if k not in RUNTIME_FIELDS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _file_sha1(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+def save_plan(path: str, compiled: CompiledPlan, cfg: PlayerConfig) -> int:
+    """Write a compiled plan with its configuration. Returns the file size in bytes."""
+    events = compiled.events
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        if text not in index:
+            index[text] = len(strings)
+            strings.append(text)
+        return index[text]
+
+    columns = {name: array(code) for name, code in COLUMNS}
+    for ev in events:
+        columns["times"].append(ev.time)
+        columns["bars"].append(ev.bar_index)
+        columns["tokens"].append(ev.token)
+        columns["keys"].append(intern(ev.key))
+        columns["errors"].append(intern(ev.error))
+        columns["notes"].append(ev.note)
+        columns["pitches"].append(ev.pitch)
+        columns["opcodes"].append(EVENT_TYPES.index(ev.event_type))
+        columns["priorities"].append(ev.priority)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "config_hash": config_hash(cfg),
+        "seed": compiled.seed,
+        "layout": {name: getattr(cfg, name) for name in _LAYOUT_FIELDS},
+        "bar_duration": compiled.bar_duration,
+        "bar_boundaries_sec": list(compiled.bar_boundaries_sec),
+        "notes_scheduled": compiled.notes_scheduled,
+        "notes_dropped": compiled.notes_dropped,
+        "source": os.path.basename(cfg.midi_path),
+        "source_sha1": _file_sha1(cfg.midi_path) if cfg.midi_path else "",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": config_dict(cfg),
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    strings_bytes = json.dumps(strings, ensure_ascii=False).encode("utf-8")
+    head = _HEADER.pack(_MAGIC, FORMAT_VERSION, 0, len(events), len(meta_bytes), len(strings_bytes))
+    head += meta_bytes + strings_bytes
+    head += b"\0" * (-len(head) % _ALIGN)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(head)
+        for name, _code in COLUMNS:
+            column = columns[name]
+            if sys.byteorder != "little":
+                column.byteswap()
+            column.tofile(f)
+        size = f.tell()
+    os.replace(tmp, path)  # Never leave a half-written plan behind
+    return size
+
+
+class PlanFile:
+    """
+    Read-only view of a .lyreplan file through mmap.
+
+    The column attributes (times, bars, keys, ...) are memoryviews into the
+    mapping; call close() (or use `with`) when done.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        try:
+            self._map()
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self):
+        buf = memoryview(self._mmap)
+        self._views.append(buf)
+        if len(buf) < _HEADER.size:
+            raise ValueError(f"not a plan file: {self.path}")
+        magic, version, _reserved, count, meta_size, strings_size = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"not a plan file: {self.path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"plan format {version} is newer than this player ({FORMAT_VERSION})")
+        offset = _HEADER.size
+        self.meta: dict = json.loads(bytes(buf[offset:offset + meta_size]).decode("utf-8"))
+        offset += meta_size
+        self.strings: List[str] = json.loads(bytes(buf[offset:offset + strings_size]).decode("utf-8"))
+        offset += strings_size
+        offset += -offset % _ALIGN
+        self.count = count
+        for name, code in COLUMNS:
+            width = array(code).itemsize
+            end = offset + width * count
+            if end > len(buf):
+                raise ValueError(f"truncated plan file: {self.path}")
+            view = buf[offset:end].cast(code)
+            self._views.append(view)
+            setattr(self, name, view)
+            offset = end
+        if sys.byteorder != "little":
+            raise ValueError("big-endian hosts are not supported")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "PlanFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def events(self) -> List[KeyEvent]:
+        """Decode the plan into KeyEvents (the form the dispatcher plays)."""
+        strings = self.strings
+        return [
+            KeyEvent(t, priority, EVENT_TYPES[op], strings[key], note,
+                     bar_index=bar, token=token, error=strings[error], pitch=pitch)
+            for t, priority, op, key, note, bar, token, error, pitch in zip(
+                self.times, self.priorities, self.opcodes, self.keys, self.notes,
+                self.bars, self.tokens, self.errors, self.pitches,
+            )
+        ]
+
+    def compiled(self) -> CompiledPlan:
+        """The plan as a CompiledPlan (events, seed and bar timing of the file)."""
+        return CompiledPlan(
+            events=self.events(),
+            seed=self.meta.get("seed", 0),
+            bar_duration=self.meta.get("bar_duration", 0.0),
+            bar_boundaries_sec=list(self.meta.get("bar_boundaries_sec", [])),
+            notes_scheduled=self.meta.get("notes_scheduled", 0),
+            notes_dropped=self.meta.get("notes_dropped", 0),
+        )
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def load_plan(path: str) -> Tuple[dict, CompiledPlan]:
+    """Header metadata and the compiled plan of a .lyreplan file."""
+    with PlanFile(path) as plan:
+        return plan.meta, plan.compiled()
+
+
+# ============== Diff ==============
+
+@dataclass
+class PlanDiff:
+    """Differences between two plans (a -> b)."""
+    a: str
+    b: str
+    header: List[str] = field(default_factory=list)   # "name: a -> b"
+    matched: int = 0          # Events with the same opcode/key/note in both
+    inserted: int = 0
+    deleted: int = 0
+    retimed: int = 0          # Matched events whose time moved by more than the tolerance
+    max_shift_ms: float = 0.0
+    first: List[str] = field(default_factory=list)    # First differing events, as text
+
+    @property
+    def identical(self) -> bool:
+        return not (self.header or self.inserted or self.deleted or self.retimed)
+
+    def describe(self) -> str:
+        lines = [f"--- {self.a}", f"+++ {self.b}"]
+        lines += [f"  {line}" for line in self.header]
+        lines.append(
+            f"events: {self.matched} matched, {self.inserted} inserted, {self.deleted} deleted, "
+            f"{self.retimed} retimed (max {self.max_shift_ms:.3f}ms)"
+        )
+        lines += self.first
+        if self.identical:
+            lines.append("identical")
+        return "\n".join(lines)
+
+
+def _event_text(plan: PlanFile, i: int) -> str:
+    key = plan.strings[plan.keys[i]]
+    error = plan.strings[plan.errors[i]]
+    return (f"{plan.times[i]:10.4f}s {EVENT_TYPES[plan.opcodes[i]]:<12} {key or '-':<3} "
+            f"note {plan.notes[i]:<3} bar {plan.bars[i]}{f' ({error})' if error else ''}")
+
+
+def diff_plans(path_a: str, path_b: str, tolerance_ms: float = 0.1, limit: int = 20) -> PlanDiff:
+    """
+    Compare two plan files: header fields, then events aligned by
+    (opcode, key, note) with a sequence diff; matched events are compared
+    by time.
+    """
+    with PlanFile(path_a) as a, PlanFile(path_b) as b:
+        result = PlanDiff(path_a, path_b)
+        for name in ("config_hash", "seed", "source_sha1", "bar_duration"):
+            if a.meta.get(name) != b.meta.get(name):
+                result.header.append(f"{name}: {a.meta.get(name)} -> {b.meta.get(name)}")
+        config_a, config_b = a.meta.get("config", {}), b.meta.get("config", {})
+        for name in sorted(set(config_a) | set(config_b)):
+            if config_a.get(name) != config_b.get(name):
+                result.header.append(f"config.{name}: {config_a.get(name)} -> {config_b.get(name)}")
+
+        def signature(plan: PlanFile) -> List[Tuple[int, str, int]]:
+            return [(op, plan.strings[key], note) for op, key, note in zip(plan.opcodes, plan.keys, plan.notes)]
+
+        tolerance = tolerance_ms / 1000.0
+        matcher = difflib.SequenceMatcher(None, signature(a), signature(b), autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                result.matched += i2 - i1
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    shift = abs(b.times[j] - a.times[i])
+                    if shift > tolerance:
+                        result.retimed += 1
+                        result.max_shift_ms = max(result.max_shift_ms, shift * 1000)
+                        if len(result.first) < limit:
+                            result.first.append(f"~ {_event_text(b, j)}  ({(b.times[j] - a.times[i]) * 1000:+.3f}ms)")
+                continue
+            result.deleted += i2 - i1
+            result.inserted += j2 - j1
+            for i in range(i1, i2):
+                if len(result.first) < limit:
+                    result.first.append(f"- {_event_text(a, i)}")
+            for j in range(j1, j2):
+                if len(result.first) < limit:
+                    result.first.append(f"+ {_event_text(b, j)}")
+        return result
+
+
+def plan_layout(meta: dict) -> Tuple[dict, List[str]]:
+    """
+    Layout settings of a plan file that playback may adopt.
+
+    Only PLAN_LAYOUT_FIELDS are taken, and only with valid values; the
+    other layout entries are informational.
+
+    Returns:
+        (settings, names of fields that were present but invalid)
+    """
+    layout = meta.get("layout")
+    if not isinstance(layout, dict):
+        return {}, []
+    settings: Dict[str, object] = {}
+    rejected: List[str] = []
+    for name, valid in PLAN_LAYOUT_FIELDS.items():
+        if name not in layout:
+            continue
+        if valid(layout[name]):
+            settings[name] = layout[name]
+        else:
+            rejected.append(name)
+    speed = meta.get("config", {}).get("speed") if isinstance(meta.get("config"), dict) else None
+    if speed is not None:
+        if isinstance(speed, (int, float)) and not isinstance(speed, bool) and 0 < speed <= 10:
+            settings["speed"] = float(speed)
+        else:
+            rejected.append("speed")
+    return settings, rejected
+
+
+def describe_plan(path: str) -> str:
+    """Header and event summary of a plan file (with its load time)."""
+    t0 = time.perf_counter()
+    with PlanFile(path) as plan:
+        map_ms = (time.perf_counter() - t0) * 1000
+        t1 = time.perf_counter()
+        events = plan.events()
+        decode_ms = (time.perf_counter() - t1) * 1000
+        meta = plan.meta
+        by_type: Dict[str, int] = {}
+        for op in plan.opcodes:
+            by_type[EVENT_TYPES[op]] = by_type.get(EVENT_TYPES[op], 0) + 1
+        layout = meta.get("layout", {})
+        lines = [
+            f"{path}: {plan.count} events, {os.path.getsize(path)} bytes "
+            f"(mapped in {map_ms:.2f}ms, decoded in {decode_ms:.1f}ms)",
+            f"  source: {meta.get('source') or '-'} (sha1 {meta.get('source_sha1', '')[:12] or '-'})",
+            f"  config hash: {meta.get('config_hash')}, seed: {meta.get('seed')}, created: {meta.get('created')}",
+            f"  layout: {layout.get('keyboard_preset')}, root {layout.get('root_mid_do')}, "
+            f"octave {layout.get('octave_shift', 0):+d}, accidentals {layout.get('accidental_policy')}",
+            f"  notes: {meta.get('notes_scheduled')} scheduled, {meta.get('notes_dropped')} dropped; "
+            f"bar {meta.get('bar_duration', 0.0):.3f}s; duration {events[-1].time if events else 0.0:.2f}s",
+            "  events: " + ", ".join(f"{name}={count}" for name, count in sorted(by_type.items())),
+        ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compiled playback plans (.lyreplan)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile", help="Compile a MIDI file to a plan")
+    p_compile.add_argument("midi")
+    p_compile.add_argument("output")
+    p_compile.add_argument("--seed", type=int, default=1)
+    p_compile.add_argument("--preset", default="21-key", choices=["21-key", "36-key"])
+    p_compile.add_argument("--style", default="mechanical", help="Input style (humanization)")
+    p_compile.add_argument("--speed", type=float, default=1.0)
+    p_info = sub.add_parser("info", help="Show a plan's header and statistics")
+    p_info.add_argument("plan")
+    p_diff = sub.add_parser("diff", help="Compare two plans (exit status 1 if they differ)")
+    p_diff.add_argument("a")
+    p_diff.add_argument("b")
+    p_diff.add_argument("--tolerance-ms", type=float, default=0.1)
+    p_diff.add_argument("--limit", type=int, default=20, help="Differing events to list")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        from .midi_parser import midi_to_events_with_duration
+        from .compiler import PlanCompiler, build_note_to_key
+
+        cfg = PlayerConfig(midi_path=args.midi, keyboard_preset=args.preset, input_style=args.style,
+                           speed=args.speed, humanize_seed=args.seed)
+        compiled = PlanCompiler(midi_to_events_with_duration(args.midi), cfg, args.seed).compile(build_note_to_key(cfg))
+        size = save_plan(args.output, compiled, cfg)
+        print(f"{args.output}: {len(compiled.events)} events, {size} bytes")
+    elif args.command == "info":
+        print(describe_plan(args.plan))
+    else:
+        diff = diff_plans(args.a, args.b, args.tolerance_ms, args.limit)
+        print(diff.describe())
+        sys.exit(0 if diff.identical else 1)
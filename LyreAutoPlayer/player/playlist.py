@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Gapless playlist: background precompilation of the next song.
+
+While song N plays, a worker thread parses and compiles song N+1 into a
+PreparedSong (the same PlanCompiler output the player builds at Start). At
+the end of song N the dispatcher swaps the prepared plan in and rebases the
+clock to -gap, so the next song starts after the configured gap with no
+parse/compile on the critical path and no countdown.
+
+The worker must never make the current song late:
+- it prepares only one song ahead (the next one is started once the
+  dispatcher has switched to the previous one),
+- it runs at the lowest OS thread priority where available (Windows thread
+  priority, Linux per-thread nice),
+- while it works the interpreter switch interval is lowered, so a dispatcher
+  thread waking up waits at most ~1ms for the GIL instead of 5ms. With the
+  dispatcher process (PlayerConfig.dispatch_process) there is no shared GIL.
+
+Usage:
+    worker = PlanPrecompiler(cfg.playlist, cfg, seed, on_ready=player.queue_song)
+    worker.start()          # Prepares the first song right away
+    ...
+    worker.advance()        # Dispatcher switched songs: prepare the next one
+    ...
+    worker.stop()
+"""
+
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Optional
+
+from .config import PlayerConfig
+from .midi_parser import NoteEvent, midi_to_events_with_duration
+from .scheduler import KeyEvent
+from .compiler import PlanCompiler, build_note_to_key, DEFAULT_MIN_KEY_HOLD_MS
+
+PRECOMPILE_SWITCH_INTERVAL_S = 0.001   # GIL hand-off interval while the worker compiles
+WORKER_NICE = 10                       # Linux: niceness of the worker thread
+THREAD_PRIORITY_LOWEST = -2            # Windows SetThreadPriority value
+
+
+@dataclass
+class PreparedSong:
+    """A playlist entry compiled ahead of time."""
+    index: int                       # 1-based position in the session (the song at Start is 0)
+    path: str
+    events: Optional[List[KeyEvent]]  # None: in shared memory (dispatcher process, see shared_name)
+    bar_duration: float
+    bar_boundaries_sec: List[float] = field(default_factory=list)
+    applied_errors: list = field(default_factory=list)
+    notes: List[NoteEvent] = field(default_factory=list)
+    notes_scheduled: int = 0
+    notes_dropped: int = 0
+    seed: int = 0
+    compile_ms: float = 0.0          # Parse + compile time spent off the critical path
+    shared_name: str = ""
+
+    def describe(self) -> str:
+        dropped = f", {self.notes_dropped} dropped" if self.notes_dropped else ""
+        return f"{os.path.basename(self.path)} ({self.notes_scheduled} notes{dropped}, compiled in {self.compile_ms:.0f}ms ahead)"
+
+
+def song_config(cfg: PlayerConfig, path: str) -> PlayerConfig:
+    """Configuration of a playlist song: the player's settings without the per-file overrides of the first song."""
+    return replace(
+        cfg, midi_path=path, bar_duration_override=0.0, bar_boundaries_sec=[], editor_bpm=0,
+        start_at_time=0.0, skip_countdown=False, loop_enabled=False,
+    )
+
+
+def prepare_song(index: int, path: str, cfg: PlayerConfig, seed: int,
+                 min_key_hold_ms: float = DEFAULT_MIN_KEY_HOLD_MS) -> PreparedSong:
+    """Parse and compile one playlist song (raises on unreadable files)."""
+    t0 = time.perf_counter()
+    song_cfg = song_config(cfg, path)
+    notes = midi_to_events_with_duration(path)
+    time.sleep(0)  # Yield between the phases
+    compiled = PlanCompiler(notes, song_cfg, seed, min_key_hold_ms=min_key_hold_ms).compile(
+        build_note_to_key(song_cfg)
+    )
+    return PreparedSong(
+        index=index,
+        path=path,
+        events=compiled.events,
+        bar_duration=compiled.bar_duration,
+        bar_boundaries_sec=compiled.bar_boundaries_sec,
+        applied_errors=compiled.applied_errors,
+        notes=notes,
+        notes_scheduled=compiled.notes_scheduled,
+        notes_dropped=compiled.notes_dropped,
+        seed=seed,
+        compile_ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+def lower_thread_priority() -> bool:
+    """Lowest OS scheduling priority for the calling thread (best effort). Returns True if applied."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_LOWEST))
+        if sys.platform.startswith("linux"):
+            # Linux applies PRIO_PROCESS with a thread id to that thread only
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICE)
+            return True
+    except (OSError, AttributeError):
+        pass
+    return False
+
+
+class PlanPrecompiler:
+    """
+    Low-priority worker that prepares playlist songs one ahead of playback.
+
+    on_ready(song) is called on the worker thread for every prepared song and
+    once with None after the last entry. Songs that fail to parse/compile are
+    logged and skipped.
+    """
+
+    def __init__(self, paths: List[str], cfg: PlayerConfig, seed: int,
+                 on_ready: Callable[[Optional[PreparedSong]], None],
+                 min_key_hold_ms: float = DEFAULT_MIN_KEY_HOLD_MS,
+                 log_fn: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            paths: MIDI files to play after the current song, in order
+            cfg: Player configuration (per-file overrides are reset, see song_config)
+            seed: Humanization seed of the session (song i uses seed + i)
+            on_ready: Receives each PreparedSong, then None at the end
+            min_key_hold_ms: Input manager minimum hold (as for the first song)
+            log_fn: Optional logging function
+        """
+        self._paths = list(paths)
+        self._cfg = cfg
+        self._seed = seed
+        self._on_ready = on_ready
+        self._min_key_hold_ms = min_key_hold_ms
+        self._log_fn = log_fn or (lambda msg: None)
+        self._go = threading.Semaphore(1)  # One permit per song the dispatcher may hold ahead
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="PlanPrecompiler")
+
+    def start(self):
+        self._thread.start()
+
+    def advance(self):
+        """The dispatcher started a prepared song: the next one may be prepared."""
+        self._go.release()
+
+    def stop(self):
+        self._stopped.set()
+        self._go.release()
+
+    def _run(self):
+        niced = lower_thread_priority()
+        for index, path in enumerate(self._paths, start=1):
+            self._go.acquire()
+            if self._stopped.is_set():
+                return
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(interval, PRECOMPILE_SWITCH_INTERVAL_S))
+            try:
+                song = prepare_song(index, path, self._cfg, (self._seed + index) % (2 ** 31), self._min_key_hold_ms)
+            except Exception as e:
+                self._log_fn(f"[Playlist] skipped {os.path.basename(path)}: {e!r}")
+                self._go.release()  # Nothing was handed over: go on with the next entry
+                continue
+            finally:
+                sys.setswitchinterval(interval)
+            if self._stopped.is_set():
+                return
+            self._log_fn(f"[Playlist] prepared {index}/{len(self._paths)}: {song.describe()}"
+                         f"{'' if niced else ' (normal priority)'}")
+            self._on_ready(song)
+        if not self._stopped.is_set():
+            self._on_ready(None)
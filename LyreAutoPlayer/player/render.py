@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Offline audio render of a compiled plan (no audio device needed).
+
+Drives a fluidsynth.Synth through get_samples() instead of an audio driver,
+so a full arrangement renders faster than real time, also on a headless
+Linux box. The plan is compiled exactly as PlayerThread would compile it
+(same seed -> same humanization, 8-bar warp and simulated errors), and
+note-on/off follow the live dispatcher's press/release rules.
+
+Long pieces can be split into chunks rendered in parallel: each chunk owns
+the notes that start inside it and renders them through their release
+tail, and overlapping tails are summed into the output.
+
+CLI:
+    python -m player.render song.mid -s piano.sf2 -o song.wav [--seed N]
+"""
+
+import os
+import sys
+import time
+import wave
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import PlayerConfig
+from .midi_parser import NoteEvent, midi_to_events_with_duration
+from .scheduler import KeyEvent
+from .compiler import PlanCompiler, build_note_to_key
+from .audio import GM_PROGRAM
+
+# Optional: FluidSynth (synth) / numpy (sample buffers; required by pyfluidsynth's get_samples)
+try:
+    import fluidsynth
+except ImportError:
+    fluidsynth = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Optional: FLAC output
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+SAMPLE_RATE = 44100
+TAIL_S = 2.0          # Release/reverb tail rendered after the last note-off
+BLOCK_FRAMES = 4096   # Max frames per get_samples() call
+
+# Synth command kinds
+NOTE_ON = 0
+NOTE_OFF = 1
+
+
+@dataclass
+class RenderResult:
+    """Summary of a finished render."""
+    path: str
+    duration_s: float
+    render_s: float
+    notes: int
+    chunks: int
+
+    @property
+    def realtime_factor(self) -> float:
+        """Audio seconds rendered per wall-clock second."""
+        return self.duration_s / self.render_s if self.render_s > 0 else 0.0
+
+
+def plan_to_synth_commands(events: List[KeyEvent], strict_midi_timing: bool) -> List[Tuple[float, int, int]]:
+    """
+    Reduce a plan to the (time, kind, note) synth commands the live
+    dispatcher would send: token-matched releases in strict mode, press
+    counting per key otherwise.
+    """
+    commands: List[Tuple[float, int, int]] = []
+    active_tokens: Dict[str, int] = {}
+    pressed_keys: Dict[str, int] = {}
+    for ev in sorted(events):
+        if ev.event_type == "press":
+            commands.append((ev.time, NOTE_ON, ev.note))
+            if strict_midi_timing:
+                active_tokens[ev.key] = ev.token
+            else:
+                pressed_keys[ev.key] = pressed_keys.get(ev.key, 0) + 1
+        elif ev.event_type == "release":
+            if strict_midi_timing:
+                if active_tokens.get(ev.key) == ev.token:
+                    commands.append((ev.time, NOTE_OFF, ev.note))
+                    active_tokens.pop(ev.key, None)
+            elif pressed_keys.get(ev.key, 0) > 0:
+                pressed_keys[ev.key] -= 1
+                if pressed_keys[ev.key] <= 0:
+                    commands.append((ev.time, NOTE_OFF, ev.note))
+                    pressed_keys[ev.key] = 0
+    return commands
+
+
+def split_into_chunks(commands: List[Tuple[float, int, int]], chunk_s: float) -> List[Tuple[float, List[Tuple[float, int, int]]]]:
+    """
+    Split commands into (chunk_start, commands) by note-on time.
+
+    A note-off goes to the chunk that holds its note's earliest open
+    note-on, so every chunk is self-contained.
+    """
+    if chunk_s <= 0 or not commands:
+        return [(0.0, list(commands))]
+    chunks: Dict[int, List[Tuple[float, int, int]]] = {}
+    open_notes: Dict[int, List[int]] = {}  # note -> chunk indices of unreleased note-ons
+    for command in commands:
+        t, kind, note = command
+        if kind == NOTE_ON:
+            idx = int(t / chunk_s)
+            open_notes.setdefault(note, []).append(idx)
+            chunks.setdefault(idx, []).append(command)
+        else:
+            owners = open_notes.pop(note, None)
+            if not owners:
+                continue
+            # FluidSynth releases every voice of the note: send the off to each owning chunk
+            for idx in sorted(set(owners)):
+                chunks[idx].append(command)
+    return [(idx * chunk_s, chunks[idx]) for idx in sorted(chunks)]
+
+
+def _create_synth(soundfont_path: str, instrument_program: int, samplerate: int):
+    """Driverless synth with the SoundFont loaded. Returns (fs, chan)."""
+    fs = fluidsynth.Synth(gain=0.8, samplerate=float(samplerate))
+    fs.setting('synth.polyphony', 64)
+    sfid = fs.sfload(soundfont_path)
+    if sfid == -1:
+        fs.delete()
+        raise RuntimeError(f"failed to load SoundFont: {soundfont_path}")
+    fs.program_select(0, sfid, 0, instrument_program)
+    return fs, 0
+
+
+def _render_commands(commands: List[Tuple[float, int, int]], start_s: float, soundfont_path: str,
+                     instrument_program: int, velocity: int, samplerate: int):
+    """Render one command list from start_s through the tail. Returns int16 stereo frames."""
+    fs, chan = _create_synth(soundfont_path, instrument_program, samplerate)
+    try:
+        end_s = (commands[-1][0] if commands else start_s) + TAIL_S
+        total_frames = max(0, int(round((end_s - start_s) * samplerate)))
+        blocks = []
+        cursor = 0
+
+        def advance(to_frame: int):
+            nonlocal cursor
+            while cursor < to_frame:
+                n = min(BLOCK_FRAMES, to_frame - cursor)
+                blocks.append(fs.get_samples(n))
+                cursor += n
+
+        for t, kind, note in commands:
+            advance(min(total_frames, max(0, int(round((t - start_s) * samplerate)))))
+            if kind == NOTE_ON:
+                fs.noteon(chan, note, velocity)
+            else:
+                fs.noteoff(chan, note)
+        advance(total_frames)
+    finally:
+        fs.delete()
+    if not blocks:
+        return np.zeros((0, 2), dtype=np.int16)
+    return np.concatenate(blocks).reshape(-1, 2)
+
+
+def _write_audio(path: str, frames, samplerate: int):
+    """Write int16 stereo frames as WAV (stdlib) or FLAC (soundfile)."""
+    if path.lower().endswith(".flac"):
+        if soundfile is None:
+            raise RuntimeError("FLAC output needs the 'soundfile' package (pip install soundfile)")
+        soundfile.write(path, frames, samplerate, subtype="PCM_16", format="FLAC")
+        return
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(samplerate)
+        wf.writeframes(frames.astype("<i2").tobytes())
+
+
+def render_plan(events: List[KeyEvent], cfg: PlayerConfig, out_path: str,
+                samplerate: int = SAMPLE_RATE, chunk_s: float = 0.0, workers: int = 1,
+                log_fn: Optional[Callable[[str], None]] = None) -> RenderResult:
+    """
+    Render a compiled plan to a WAV/FLAC file.
+
+    Args:
+        events: Compiled plan (CompiledPlan.events)
+        cfg: Config the plan was compiled with (soundfont_path, instrument,
+            velocity and strict_midi_timing are used here)
+        out_path: Output file (.wav or .flac)
+        samplerate: Output sample rate
+        chunk_s: Split into chunks of this length (0 = single pass)
+        workers: Parallel chunk renders (each loads its own synth)
+        log_fn: Optional logging function
+
+    Returns:
+        RenderResult
+    """
+    if fluidsynth is None or np is None:
+        raise RuntimeError("offline render needs pyfluidsynth and numpy")
+    if not cfg.soundfont_path or not os.path.isfile(cfg.soundfont_path):
+        raise RuntimeError(f"SoundFont not found: {cfg.soundfont_path or '(none)'}")
+
+    t0 = time.perf_counter()
+    program = GM_PROGRAM.get(cfg.instrument, 1) - 1
+    commands = plan_to_synth_commands(events, cfg.strict_midi_timing)
+    if chunk_s <= 0 and workers > 1 and commands:
+        chunk_s = max(10.0, commands[-1][0] / workers)
+    chunks = split_into_chunks(commands, chunk_s)
+
+    def render_chunk(chunk):
+        start_s, chunk_commands = chunk
+        return start_s, _render_commands(chunk_commands, start_s, cfg.soundfont_path,
+                                         program, cfg.velocity, samplerate)
+
+    if workers > 1 and len(chunks) > 1:
+        # ctypes drops the GIL inside FluidSynth, so threads render in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_chunk, chunks))
+    else:
+        rendered = [render_chunk(chunk) for chunk in chunks]
+
+    if len(rendered) == 1:
+        frames = rendered[0][1]
+    else:
+        total = max(int(round(start_s * samplerate)) + len(part) for start_s, part in rendered)
+        mix = np.zeros((total, 2), dtype=np.int32)
+        for start_s, part in rendered:
+            offset = int(round(start_s * samplerate))
+            mix[offset:offset + len(part)] += part
+        frames = np.clip(mix, -32768, 32767).astype(np.int16)
+
+    _write_audio(out_path, frames, samplerate)
+    result = RenderResult(
+        path=out_path,
+        duration_s=len(frames) / samplerate,
+        render_s=time.perf_counter() - t0,
+        notes=sum(1 for _, kind, _ in commands if kind == NOTE_ON),
+        chunks=len(chunks),
+    )
+    if log_fn is not None:
+        log_fn(
+            f"Rendered {result.notes} notes, {result.duration_s:.1f}s audio in {result.render_s:.1f}s "
+            f"(x{result.realtime_factor:.1f} real time, {result.chunks} chunk(s)) -> {out_path}"
+        )
+    return result
+
+
+def render_events(events: List[NoteEvent], cfg: PlayerConfig, seed: int, out_path: str,
+                  log_fn: Optional[Callable[[str], None]] = None, **kwargs) -> RenderResult:
+    """Compile `events` with `seed` (as PlayerThread would) and render the plan."""
+    compiled = PlanCompiler(events, cfg, seed, log_fn=log_fn).compile(build_note_to_key(cfg))
+    return render_plan(compiled.events, cfg, out_path, log_fn=log_fn, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render a MIDI file offline as LyreAutoPlayer would play it.")
+    parser.add_argument("midi", help="MIDI file")
+    parser.add_argument("-s", "--soundfont", required=True, help="SoundFont (.sf2)")
+    parser.add_argument("-o", "--output", help="Output .wav or .flac (default: next to the MIDI file)")
+    parser.add_argument("--seed", type=int, default=0, help="Humanization seed (default 0)")
+    parser.add_argument("--style", default="mechanical", help="Input style (mechanical, natural, ...)")
+    parser.add_argument("--preset", default="21-key", help="Keyboard preset (21-key / 36-key)")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--instrument", default="Piano")
+    parser.add_argument("--velocity", type=int, default=90)
+    parser.add_argument("--midi-duration", action="store_true", help="Hold notes for their MIDI duration")
+    parser.add_argument("--errors", type=int, default=0, help="Simulated errors per 8 bars (0 = off)")
+    parser.add_argument("--samplerate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--chunk", type=float, default=0.0, help="Chunk length in seconds (0 = auto)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="Parallel chunk renders")
+    args = parser.parse_args(argv)
+
+    cfg = PlayerConfig(
+        midi_path=args.midi,
+        soundfont_path=args.soundfont,
+        instrument=args.instrument,
+        velocity=args.velocity,
+        input_style=args.style,
+        keyboard_preset=args.preset,
+        speed=args.speed,
+        use_midi_duration=args.midi_duration,
+    )
+    if args.errors > 0:
+        cfg.error_config.enabled = True
+        cfg.error_config.errors_per_8bars = args.errors
+    out_path = args.output or os.path.splitext(args.midi)[0] + ".wav"
+
+    try:
+        render_events(
+            midi_to_events_with_duration(args.midi), cfg, args.seed, out_path,
+            log_fn=print, samplerate=args.samplerate, chunk_s=args.chunk, workers=args.workers,
+        )
+    except RuntimeError as e:
+        print(f"Render failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+RenderThread - offline audio render off the GUI thread.
+"""
+
+from typing import List
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from .config import PlayerConfig
+from .midi_parser import NoteEvent
+from .render import render_events
+
+
+class RenderThread(QThread):
+    """
+    Runs render_events() in the background.
+
+    Signals:
+        log(str): Progress / result messages
+        done(bool, str): (success, output path)
+    """
+    log = pyqtSignal(str)
+    done = pyqtSignal(bool, str)
+
+    def __init__(self, events: List[NoteEvent], cfg: PlayerConfig, seed: int, out_path: str,
+                 workers: int = 2):
+        super().__init__()
+        self.events = events
+        self.cfg = cfg
+        self.seed = seed
+        self.out_path = out_path
+        self.workers = workers
+
+    def run(self):
+        try:
+            render_events(self.events, self.cfg, self.seed, self.out_path,
+                          log_fn=self.log.emit, workers=self.workers)
+        except Exception as e:
+            self.log.emit(f"Render failed: {e}")
+            self.done.emit(False, self.out_path)
+            return
+        self.done.emit(True, self.out_path)
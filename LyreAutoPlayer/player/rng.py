@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Counter-based random streams for reproducible humanization.
+
+Every draw is a pure function of (seed, stream, bar index, note index), so
+the humanized timing of any bar can be regenerated on its own: resuming
+from bar N produces exactly the same values as a full run, and nothing
+before the resume point has to be recomputed.
+
+The generator is SplitMix64 applied to a hashed counter. A numpy fast path
+is used for batches when numpy is available; both paths return identical
+values.
+"""
+
+from typing import List, Sequence
+
+# Optional: numpy for vectorized batches
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Stream identifiers (one independent stream per humanization parameter)
+STREAM_TIMING = 1      # style.timing_offset_ms
+STREAM_DURATION = 2    # style.duration_variation
+STREAM_EIGHT_BAR = 3   # 8-bar speed/timing/duration multipliers
+STREAM_ERRORS = 4      # Error simulation (per 8-bar group)
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MUL1 = 0xBF58476D1CE4E5B9
+_MUL2 = 0x94D049BB133111EB
+_BAR_MUL = 0xD6E8FEB86659FD93
+_NOTE_MUL = 0xA0761D6478BD642F
+_INV_2_53 = 1.0 / (1 << 53)
+
+
+def _mix64(x: int) -> int:
+    """SplitMix64 finalizer."""
+    x = (x + _GOLDEN) & _MASK64
+    x = ((x ^ (x >> 30)) * _MUL1) & _MASK64
+    x = ((x ^ (x >> 27)) * _MUL2) & _MASK64
+    return x ^ (x >> 31)
+
+
+def stream_key(seed: int, stream: int) -> int:
+    """Derive the base key of a stream from the playback seed."""
+    return _mix64(_mix64(seed & _MASK64) ^ (stream & _MASK64))
+
+
+def stream_seed(seed: int, stream: int, bar_index: int, note_index: int = 0) -> int:
+    """64-bit value for one (bar, note) counter, e.g. to seed random.Random."""
+    counter = (stream_key(seed, stream)
+               ^ ((bar_index * _BAR_MUL) & _MASK64)
+               ^ ((note_index * _NOTE_MUL) & _MASK64))
+    return _mix64(counter)
+
+
+def stream_random(seed: int, stream: int, bar_index: int, note_index: int) -> float:
+    """Uniform float in [0, 1) for one (bar, note) counter."""
+    return (stream_seed(seed, stream, bar_index, note_index) >> 11) * _INV_2_53
+
+
+def stream_uniform(seed: int, stream: int, bar_index: int, note_index: int,
+                   lo: float, hi: float) -> float:
+    """Uniform float in [lo, hi) for one (bar, note) counter."""
+    return lo + (hi - lo) * stream_random(seed, stream, bar_index, note_index)
+
+
+def stream_uniform_batch(seed: int, stream: int, bar_indices: Sequence[int],
+                         note_indices: Sequence[int], lo: float, hi: float) -> List[float]:
+    """
+    Vectorized stream_uniform over many (bar, note) counters.
+
+    Args:
+        seed: Playback seed
+        stream: Stream identifier (STREAM_*)
+        bar_indices: Bar index per draw
+        note_indices: Note index within its bar per draw
+        lo, hi: Output range
+
+    Returns:
+        List of floats, same values as calling stream_uniform per element
+    """
+    if not bar_indices:
+        return []
+    key = stream_key(seed, stream)
+    if np is None:
+        return [
+            lo + (hi - lo) * ((_mix64(key ^ ((b * _BAR_MUL) & _MASK64) ^ ((n * _NOTE_MUL) & _MASK64)) >> 11) * _INV_2_53)
+            for b, n in zip(bar_indices, note_indices)
+        ]
+
+    with np.errstate(over="ignore"):
+        bars = np.asarray(bar_indices, dtype=np.int64).astype(np.uint64)
+        notes = np.asarray(note_indices, dtype=np.int64).astype(np.uint64)
+        x = np.uint64(key) ^ (bars * np.uint64(_BAR_MUL)) ^ (notes * np.uint64(_NOTE_MUL))
+        x = x + np.uint64(_GOLDEN)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(_MUL1)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(_MUL2)
+        x = x ^ (x >> np.uint64(31))
+        unit = (x >> np.uint64(11)).astype(np.float64) * _INV_2_53
+    return (lo + (hi - lo) * unit).tolist()
@@ -12,6 +12,11 @@ import time
 from dataclasses import dataclass, field
 from typing import Callable, Optional, List, Dict, Tuple
 
+from .control import PlaybackControl
+from .watchdog import StallWatchdog
+from .late_policy import LatePolicy, BarLateStats
+from .governor import SpeedGovernor
+
 
 @dataclass(order=True)
 class KeyEvent:
@@ -23,11 +28,13 @@ class KeyEvent:
     """
     time: float                           # Event time in seconds
     priority: int                         # 1=release, 2=press
-    event_type: str = field(compare=False)  # "press" or "release"
+    event_type: str = field(compare=False)  # "press", "release" or "retrigger"
     key: str = field(compare=False)       # Key character
     note: int = field(compare=False)      # MIDI note number (for sound)
     bar_index: int = field(compare=False, default=0)  # Original bar index for pause logic
     token: int = field(compare=False, default=0)  # Press/release pairing token
+    error: str = field(compare=False, default="")  # Simulated error kind (error_marker events)
+    pitch: int = field(compare=False, default=-1)  # Score pitch after transpose (live octave key tables)
 
 
 class OutputScheduler:
@@ -36,9 +43,11 @@ class OutputScheduler:
 
     Features:
     - Thread-safe event queue with timing
-    - Late-drop policy to skip stale events (prevents pile-up)
-    - Pause/resume/stop support
+    - Late policy for stale presses (drop / catch-up compression / melody
+      priority, threshold adapted to the measured latency; see late_policy.py)
+    - Pause/resume/stop support (event-driven via a shared PlaybackControl)
     - Non-blocking release scheduling
+    - Non-blocking same-key retrigger (release now, press re-queued after the gap)
 
     Usage:
         scheduler = OutputScheduler(input_manager, late_drop_ms=25)
@@ -59,6 +68,11 @@ class OutputScheduler:
         active_check_fn: Optional[Callable[[str], bool]] = None,
         retrigger_release_fn: Optional[Callable[[str, Optional[int]], bool]] = None,
         retrigger_gap_ms: float = 2.0,
+        control: Optional[PlaybackControl] = None,
+        watchdog: Optional[StallWatchdog] = None,
+        idle_fn: Optional[Callable[[float], None]] = None,
+        late_policy: Optional[LatePolicy] = None,
+        governor: Optional[SpeedGovernor] = None,
     ):
         """
         Args:
@@ -67,33 +81,45 @@ class OutputScheduler:
             late_drop_ms: Drop events older than this (ms behind schedule)
             enable_late_drop: Whether to enable late-drop policy
             log_fn: Optional logging function
+            control: Shared playback clock/state (PlayerThread passes its own so
+                pause/resume/stop reach both threads at once); a private one is
+                created when omitted
+            watchdog: Optional StallWatchdog; each event's deadline is armed
+                while it is waited for and executed
+            idle_fn: Called with the idle time (s) before each wait when no
+                queued event and no plan event (see set_horizon) is due
+                sooner, e.g. GcGuard.idle
+            late_policy: What to do with late presses; defaults to a fixed
+                drop at late_drop_ms (None when enable_late_drop is False)
+            governor: Optional SpeedGovernor fed with every event's lateness
         """
         self._press_fn = press_fn
         self._release_fn = release_fn
-        self._late_drop_ms = late_drop_ms
-        self._enable_late_drop = enable_late_drop
+        if late_policy is None and enable_late_drop:
+            late_policy = LatePolicy("drop", threshold_ms=late_drop_ms, adaptive=False)
+        self._late_policy = late_policy if enable_late_drop else None
         self._log_fn = log_fn or (lambda msg: None)
         self._event_log_fn = event_log_fn
         self._active_check_fn = active_check_fn
         self._retrigger_release_fn = retrigger_release_fn or release_fn
         self._retrigger_gap_ms = retrigger_gap_ms
+        self._watchdog = watchdog
+        self._idle_fn = idle_fn
+        self._governor = governor
+        self._horizon = float("inf")  # Time of the producer's next event (playback time)
+
+        # Clock and pause/stop state
+        self._owns_control = control is None
+        self._control = control or PlaybackControl()
 
-        # Thread-safe event queue
+        # Thread-safe event queue (guarded by the control's condition so one
+        # wait covers both "new event" and "state changed")
         self._queue: List[KeyEvent] = []
-        self._queue_lock = threading.Lock()
-        self._queue_not_empty = threading.Condition(self._queue_lock)
+        self._queue_lock = self._control.condition
+        self._queue_not_empty = self._control.condition
 
         # State
         self._running = False
-        self._paused = False
-        self._pause_event = threading.Event()
-        self._pause_event.set()  # Initially not paused
-        self._stop_event = threading.Event()
-
-        # Timing
-        self._playback_start: float = 0.0
-        self._total_pause_time: float = 0.0
-        self._pause_start: float = 0.0
 
         # Thread
         self._thread: Optional[threading.Thread] = None
@@ -111,12 +137,9 @@ class OutputScheduler:
         if self._running:
             return
 
-        self._playback_start = playback_start_time or time.perf_counter()
-        self._total_pause_time = 0.0
+        if self._owns_control:
+            self._control.start(playback_start_time or time.perf_counter())
         self._running = True
-        self._stop_event.clear()
-        self._pause_event.set()
-        self._paused = False
 
         # Clear queue
         with self._queue_lock:
@@ -139,12 +162,11 @@ class OutputScheduler:
             return
 
         self._running = False
-        self._stop_event.set()
-        self._pause_event.set()  # Wake up if paused
-
-        # Wake up the queue wait
-        with self._queue_lock:
-            self._queue_not_empty.notify_all()
+        if self._owns_control:
+            self._control.stop()
+        else:
+            with self._queue_lock:
+                self._queue_not_empty.notify_all()
 
         if self._thread is not None:
             self._thread.join(timeout=1.0)
@@ -152,21 +174,14 @@ class OutputScheduler:
 
     def pause(self):
         """Pause event execution."""
-        if not self._paused:
-            self._paused = True
-            self._pause_start = time.perf_counter()
-            self._pause_event.clear()
+        self._control.pause()
 
     def resume(self):
         """Resume event execution."""
-        if self._paused:
-            pause_duration = time.perf_counter() - self._pause_start
-            self._total_pause_time += pause_duration
-            self._paused = False
-            self._pause_event.set()
+        self._control.resume()
 
     def is_paused(self) -> bool:
-        return self._paused
+        return self._control.is_paused()
 
     def is_running(self) -> bool:
         return self._running
@@ -175,83 +190,118 @@ class OutputScheduler:
         """Add an event to the queue (thread-safe)."""
         with self._queue_lock:
             heapq.heappush(self._queue, event)
-            self._queue_not_empty.notify()
+            self._queue_not_empty.notify_all()
 
     def enqueue_batch(self, events: List[KeyEvent]):
         """Add multiple events to the queue (thread-safe)."""
         with self._queue_lock:
             for event in events:
                 heapq.heappush(self._queue, event)
-            self._queue_not_empty.notify()
+            self._queue_not_empty.notify_all()
+
+    def set_horizon(self, t: float):
+        """Tell the scheduler when the producer enqueues next (idle_fn windows)."""
+        with self._queue_lock:
+            self._horizon = t
+            self._queue_not_empty.notify_all()
+
+    def _idle(self, until: float):
+        slack = min(until, self._horizon) - self._control.now()
+        if slack > 0:
+            self._idle_fn(slack)
 
     def clear_queue(self):
         """Clear all pending events."""
         with self._queue_lock:
             self._queue.clear()
+        if self._late_policy is not None:
+            self._late_policy.reset()
 
     def get_queue_size(self) -> int:
         with self._queue_lock:
             return len(self._queue)
 
     def get_stats(self) -> Dict:
-        return dict(self._stats)
+        stats = dict(self._stats)
+        if self._late_policy is not None:
+            stats["late_threshold_ms"] = self._late_policy.threshold_ms
+            stats["backend_p99_ms"] = self._late_policy.backend_p99_ms()
+        return stats
+
+    def get_late_report(self) -> List[BarLateStats]:
+        """Per-bar late-policy statistics (empty without a policy)."""
+        return self._late_policy.bar_report() if self._late_policy is not None else []
+
+    def _chord_top(self, event: KeyEvent) -> int:
+        """Highest note among the presses due at the same time as `event` (queued + itself)."""
+        top = event.note
+        with self._queue_lock:
+            for other in self._queue:
+                if other.event_type == "press" and abs(other.time - event.time) < 1e-6 and other.note > top:
+                    top = other.note
+        return top
 
     def _get_current_playback_time(self) -> float:
         """Get current playback time (accounting for pauses)."""
-        return time.perf_counter() - self._playback_start - self._total_pause_time
+        return self._control.now()
 
     def _run(self):
         """Main scheduler loop."""
-        while self._running and not self._stop_event.is_set():
-            # Wait if paused
-            self._pause_event.wait()
-
-            if self._stop_event.is_set():
-                break
+        control = self._control
+        watchdog = self._watchdog
+        policy = self._late_policy
+        governor = self._governor
+        while self._running and not control.is_stopped():
+            # Wait if paused (woken immediately by resume/stop)
+            if control.is_paused():
+                with self._queue_lock:
+                    self._queue_not_empty.wait_for(
+                        lambda: not self._running or control.is_stopped() or not control.is_paused()
+                    )
+                continue
 
-            # Get next event
-            event = None
+            # Get next event (woken by enqueue or any state change)
             with self._queue_lock:
-                while not self._queue and self._running and not self._stop_event.is_set():
-                    # Wait for events with timeout
-                    self._queue_not_empty.wait(timeout=0.1)
-                    if not self._running or self._stop_event.is_set():
-                        break
-
-                if self._queue and self._running:
-                    event = self._queue[0]  # Peek
-
-            if event is None or self._stop_event.is_set():
+                event = self._queue[0] if self._queue else None  # Peek
+            if self._idle_fn is not None:
+                self._idle(event.time if event is not None else float("inf"))
+            if event is None:
+                with self._queue_lock:
+                    if not self._queue and self._running and not control.is_stopped() and not control.is_paused():
+                        self._queue_not_empty.wait()
                 continue
 
-            # Wait until event time
+            # Wait until event time (+ catch-up offset); an earlier event being queued also wakes us
+            offset = policy.offset if policy is not None else 0.0
+            due = event.time + offset
+            if watchdog is not None:
+                watchdog.arm("scheduler", due, f"{event.event_type} '{event.key}'")
+            if not control.wait_until(
+                due,
+                interrupt=lambda: not self._running or not self._queue or self._queue[0] is not event,
+            ):
+                if watchdog is not None:
+                    watchdog.disarm("scheduler")
+                continue
             current_time = self._get_current_playback_time()
-            wait_time = event.time - current_time
-
-            if wait_time > 0:
-                # Wait with interruptibility
-                self._stop_event.wait(timeout=min(wait_time, 0.05))
-                if self._stop_event.is_set():
-                    break
-                if self._paused:
-                    continue
-                # Recalculate after wait
-                current_time = self._get_current_playback_time()
-                wait_time = event.time - current_time
-                if wait_time > 0.001:
-                    continue  # Not yet time
 
             # Pop the event
             queue_size = 0
             with self._queue_lock:
-                if self._queue and self._queue[0] == event:
+                if self._queue and self._queue[0] is event:
                     heapq.heappop(self._queue)
                     queue_size = len(self._queue)
                 else:
+                    if watchdog is not None:
+                        watchdog.disarm("scheduler")
                     continue  # Event was removed or changed
 
             # Calculate lateness
-            late_ms = (current_time - event.time) * 1000
+            late_ms = (current_time - due) * 1000 / control.rate  # Real ms (tempo/warp aware)
+            if watchdog is not None:
+                watchdog.note_latency(late_ms)
+            if governor is not None:
+                governor.observe("scheduler", event.time, late_ms)
             active_before = None
             if self._active_check_fn and event.key:
                 try:
@@ -259,10 +309,19 @@ class OutputScheduler:
                 except Exception:
                     active_before = None
 
-            # Late-drop policy: only drop press events, never drop release (avoid stuck keys)
-            if self._enable_late_drop and late_ms > self._late_drop_ms and event.event_type == "press":
+            # Late policy: only press events are judged, never release (avoid stuck keys).
+            # A retrigger press already passed this check when its release was sent.
+            if policy is not None and event.event_type == "press":
+                if policy.needs_chord_top and policy.is_new_chord(event.time):
+                    policy.set_chord(event.time, self._chord_top(event))
+                play = policy.should_play(event, late_ms)
+            else:
+                play = True
+            if not play:
                 self._stats["events_dropped"] += 1
-                self._log_fn(f"[LateDrop] press '{event.key}' dropped ({late_ms:.1f}ms late)")
+                self._log_fn(
+                    f"[LateDrop] press '{event.key}' dropped ({late_ms:.1f}ms late, threshold {policy.threshold_ms:.1f}ms)"
+                )
                 if self._event_log_fn:
                     self._event_log_fn(
                         event=event,
@@ -275,6 +334,8 @@ class OutputScheduler:
                         success=False,
                         active_before=active_before,
                     )
+                if watchdog is not None:
+                    watchdog.disarm("scheduler")
                 continue
 
             # Update late stats
@@ -284,12 +345,21 @@ class OutputScheduler:
                 self._stats["avg_late_ms"] = self._stats["avg_late_ms"] * 0.9 + late_ms * 0.1
 
             # Execute event
+            exec_start = time.perf_counter()
             try:
                 if event.event_type == "press":
                     if active_before:
                         self._retrigger_release_fn(event.key, event.note)
-                        if self._retrigger_gap_ms > 0:
-                            time.sleep(self._retrigger_gap_ms / 1000.0)
+                    if active_before and self._retrigger_gap_ms > 0:
+                        # Press again after the gap without blocking other keys
+                        self.enqueue(KeyEvent(
+                            current_time - offset + self._retrigger_gap_ms / 1000.0, event.priority, "retrigger",
+                            event.key, event.note, bar_index=event.bar_index, token=event.token
+                        ))
+                        success = True
+                    else:
+                        success = self._press_fn(event.key, event.note)
+                elif event.event_type == "retrigger":
                     success = self._press_fn(event.key, event.note)
                 elif event.event_type == "release":
                     success = self._release_fn(event.key, event.note)
@@ -310,3 +380,63 @@ class OutputScheduler:
                     )
             except Exception as e:
                 self._log_fn(f"[Scheduler] Error executing {event.event_type}: {e}")
+            if policy is not None:
+                policy.on_executed(event, late_ms, (time.perf_counter() - exec_start) * 1000)
+            if watchdog is not None:
+                watchdog.disarm("scheduler")
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: a same-key retrigger must not delay other keys in the chord."""
+    print("=== OutputScheduler Self-Test ===\n")
+
+    gap_ms = 30.0
+    active = {"a"}
+    log: List[Tuple[str, str, float]] = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def record(action: str):
+        def fn(key: str, note: Optional[int] = None) -> bool:
+            with lock:
+                log.append((action, key, (time.perf_counter() - start) * 1000))
+                if action == "down":
+                    active.add(key)
+                else:
+                    active.discard(key)
+            return True
+        return fn
+
+    scheduler = OutputScheduler(
+        press_fn=record("down"),
+        release_fn=record("up"),
+        enable_late_drop=False,
+        active_check_fn=lambda key: key in active,
+        retrigger_gap_ms=gap_ms,
+    )
+    scheduler.start(start)
+    # Chord at 50ms: 'a' is still held, so it retriggers; 'b' and 'c' are unrelated
+    scheduler.enqueue_batch([
+        KeyEvent(0.05, 2, "press", "a", 60),
+        KeyEvent(0.05, 2, "press", "b", 62),
+        KeyEvent(0.05, 2, "press", "c", 64),
+    ])
+    time.sleep(0.05 + gap_ms / 1000.0 + 0.1)
+    scheduler.stop()
+
+    for action, key, t_ms in log:
+        print(f"{t_ms:7.2f}ms  {key} {action.upper()}")
+    times = {(action, key): t_ms for action, key, t_ms in log}
+    assert ("up", "a") in times and ("down", "a") in times, "'a' should be released and pressed again"
+    assert times[("down", "a")] - times[("up", "a")] >= gap_ms - 1.0, "retrigger gap not respected"
+    for key in ("b", "c"):
+        delay = times[("down", key)] - times[("up", "a")]
+        assert delay < gap_ms / 2, f"'{key}' was delayed {delay:.1f}ms by the retrigger of 'a'"
+    print("\nUnrelated keys not delayed by retrigger: OK")
+    print("\n=== Self-Test PASSED ===")
+
+
+if __name__ == "__main__":
+    self_test()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Long-lived playback session: keeps expensive resources warm across plays.
+
+Creating an InputManager starts a focus-monitor thread, and creating a
+FluidSynth synth probes audio drivers and loads the SoundFont (seconds for
+large GM fonts). A PlaybackSession owned by the main window caches these
+and hands them to successive PlayerThreads; each resource is rebuilt only
+when the config it was built from changes.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class PlaybackSession:
+    """
+    Keyed resource cache shared by successive playbacks.
+
+    Usage:
+        session = PlaybackSession()
+        session.begin_play()
+        im = session.get("input", ("sendinput",), create_im, dispose=lambda im: im.stop())
+        session.hits   # {"input": True} (cache hit) / False (built for this play)
+        ...
+        session.close()  # on application exit
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources: Dict[str, Tuple[Hashable, Any, Optional[Callable[[Any], None]]]] = {}
+        self.plays = 0  # Number of playbacks served
+        self.hits: Dict[str, bool] = {}  # This play: resource name -> cache hit (False: built)
+
+    def begin_play(self):
+        """Count a new playback and start recording its cache hits."""
+        with self._lock:
+            self.plays += 1
+            self.hits = {}
+
+    def get(self, name: str, key: Hashable, factory: Callable[[], Any],
+            dispose: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Return the cached resource `name` if it was built for `key`.
+
+        Otherwise dispose the old one (if any) and build a new one with
+        `factory`. A factory result of None is returned but not cached, so
+        a failed build (e.g. no audio driver) is retried next time. The
+        outcome is recorded in `hits` (a build wins over a later hit).
+        """
+        with self._lock:
+            cached = self._resources.get(name)
+            hit = cached is not None and cached[0] == key
+            self.hits[name] = hit and self.hits.get(name, True)
+            if hit:
+                return cached[1]
+            if cached is not None:
+                self._dispose(cached)
+                del self._resources[name]
+            value = factory()
+            if value is not None:
+                self._resources[name] = (key, value, dispose)
+            return value
+
+    def is_warm(self, name: str, key: Hashable) -> bool:
+        """True if `name` is cached for `key` (get() would not rebuild)."""
+        with self._lock:
+            cached = self._resources.get(name)
+            return cached is not None and cached[0] == key
+
+    def invalidate(self, name: str):
+        """Drop (and dispose) one cached resource."""
+        with self._lock:
+            cached = self._resources.pop(name, None)
+            if cached is not None:
+                self._dispose(cached)
+
+    def close(self):
+        """Dispose every cached resource."""
+        with self._lock:
+            for cached in self._resources.values():
+                self._dispose(cached)
+            self._resources.clear()
+
+    @staticmethod
+    def _dispose(cached: Tuple[Hashable, Any, Optional[Callable[[Any], None]]]):
+        _, value, dispose = cached
+        if dispose is not None:
+            try:
+                dispose(value)
+            except Exception:
+                pass
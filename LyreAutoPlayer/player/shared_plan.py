@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled plan in multiprocessing.shared_memory.
+
+The dispatcher process attaches to the block by name instead of receiving a
+pickled event list through its pipe, so handing over a long plan costs one
+memcpy regardless of its size.
+
+Layout:
+    header   <4sII   magic, event count, string table size (bytes)
+    records  <dbbhhiiHH per event: time, priority, event type, note, pitch,
+             bar_index, token, key string index, error string index
+    strings  UTF-8 JSON list (keys and error names)
+"""
+
+import json
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+from .scheduler import KeyEvent
+
+_MAGIC = b"LYRP"
+_HEADER = struct.Struct("<4sII")
+_RECORD = struct.Struct("<dbbhhiiHH")
+
+# event_type <-> code
+EVENT_TYPES = ("press", "release", "retrigger", "pause_marker", "error_marker")
+_EVENT_CODES: Dict[str, int] = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+
+class SharedPlan:
+    """
+    Owner side of a shared-memory plan.
+
+    Usage:
+        shared = SharedPlan(plan.events)
+        child = Process(target=..., args=(shared.name, ...))
+        ...
+        shared.close()  # after the child has attached (or exited)
+    """
+
+    def __init__(self, events: List[KeyEvent]):
+        strings: List[str] = []
+        index: Dict[str, int] = {}
+
+        def intern(text: str) -> int:
+            if text not in index:
+                index[text] = len(strings)
+                strings.append(text)
+            return index[text]
+
+        records = [
+            (ev.time, ev.priority, _EVENT_CODES[ev.event_type], ev.note, ev.pitch, ev.bar_index,
+             ev.token, intern(ev.key), intern(ev.error))
+            for ev in events
+        ]
+        table = json.dumps(strings, ensure_ascii=False).encode("utf-8")
+        size = _HEADER.size + _RECORD.size * len(records) + len(table)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        self.name = self._shm.name
+        buf = self._shm.buf
+        _HEADER.pack_into(buf, 0, _MAGIC, len(records), len(table))
+        offset = _HEADER.size
+        for record in records:
+            _RECORD.pack_into(buf, offset, *record)
+            offset += _RECORD.size
+        buf[offset:offset + len(table)] = table
+        self.count = len(records)
+
+    def close(self):
+        """Release and unlink the block."""
+        if self._shm is None:
+            return
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+
+def read_shared_plan(name: str) -> List[KeyEvent]:
+    """Attach to a SharedPlan by name and decode its events (reader side)."""
+    # A spawned child shares the owner's resource tracker, so attaching here
+    # does not register the block a second time (the owner unlinks it)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        buf = shm.buf
+        magic, count, table_size = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"not a shared plan: {name}")
+        table_offset = _HEADER.size + _RECORD.size * count
+        strings = json.loads(bytes(buf[table_offset:table_offset + table_size]).decode("utf-8"))
+        events = []
+        for time_s, priority, code, note, pitch, bar_index, token, key_idx, error_idx in _RECORD.iter_unpack(
+            bytes(buf[_HEADER.size:table_offset])
+        ):
+            events.append(KeyEvent(
+                time_s, priority, EVENT_TYPES[code], strings[key_idx], note,
+                bar_index=bar_index, token=token, error=strings[error_idx], pitch=pitch,
+            ))
+        del buf
+        return events
+    finally:
+        shm.close()
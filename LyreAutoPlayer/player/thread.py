@@ -13,11 +13,11 @@ Handles:
 import sys
 import os
 import time
-import heapq
 import random
 import csv
 import re
 import threading
+from dataclasses import replace
 from typing import List, Dict, Tuple, Optional
 
 from PyQt6.QtCore import QThread, pyqtSignal
@@ -26,13 +26,27 @@ import mido
 
 # Import local modules
 from input_manager import create_input_manager, disable_ime_for_window, enable_ime_for_window
-from style_manager import INPUT_STYLES
 
 from .config import PlayerConfig
 from .midi_parser import NoteEvent
 from .scheduler import KeyEvent, OutputScheduler
-from .quantize import build_available_notes, quantize_note, get_octave_shift
-from .errors import plan_errors_for_group
+from .late_policy import LatePolicy, bar_report_dicts
+from .watchdog import StallWatchdog
+from .gc_control import GcGuard, format_gc_stats
+from .governor import SpeedGovernor
+from .key_tables import KeyTable, build_key_table, build_key_tables, plan_pitches
+from .control import PlaybackControl, ClockSnapshot
+from .plan import PlaybackPlan, LoopSlice
+from .plan_patch import PlanPatch, apply_patch, build_patch, dirty_bar_range
+from .playlist import PlanPrecompiler, PreparedSong
+from .shared_plan import SharedPlan, read_shared_plan
+from .session import PlaybackSession
+from .audio import AudioWorker, GM_PROGRAM
+from .dispatcher_process import DispatcherProcess, CMD_PAUSE, CMD_RESUME, CMD_STOP, CMD_SEEK, CMD_START, CMD_TEMPO, \
+    CMD_OCTAVE, CMD_PATCH, CMD_LOOP, CMD_SONG, MSG_READY, MSG_SIGNAL, MSG_CLOCK, MSG_DONE, \
+    STATE_PAUSE_PENDING, STATE_CURRENT_BAR
+from .compiler import PlanCompiler, CompiledPlan, build_note_to_key
+from .planfile import PLAN_SUFFIX, load_plan, save_plan, plan_layout
 from .bar_utils import calculate_bar_and_beat_duration
 
 # Optional: FluidSynth for sound
@@ -43,15 +57,6 @@ except ImportError as e:
     fluidsynth = None
     _fluidsynth_error = str(e)
 
-# GM (General MIDI) instrument programs
-GM_PROGRAM = {
-    "Piano": 1, "Harpsichord": 7, "Celesta": 9, "Glockenspiel": 10,
-    "Music Box": 11, "Vibraphone": 12, "Marimba": 13, "Xylophone": 14,
-    "Organ": 20, "Accordion": 22, "Harmonica": 23, "Guitar": 25,
-    "Harp": 47, "Strings": 49, "Choir": 53, "Trumpet": 57,
-    "Flute": 74, "Pan Flute": 76, "Shakuhachi": 78, "Whistle": 79,
-}
-
 # Windows-specific imports
 try:
     import win32gui
@@ -60,6 +65,12 @@ except ImportError:
     win32gui = None
     win32con = None
 
+# A-B loop speed-up stops at this tempo (relative to the speed at Start)
+LOOP_MAX_TEMPO = 2.0
+
+# Playlist: re-check interval while the next song is still being compiled
+SONG_WAIT_S = 0.1
+
 
 def try_focus_window(hwnd: int) -> bool:
     """Try to focus a window by handle."""
@@ -81,43 +92,103 @@ class PlayerThread(QThread):
     Signals:
         log(str): Emitted for log messages
         finished(): Emitted when playback completes
-        progress(float, float): Emitted with (current_time, total_duration)
         paused(): Emitted when playback is paused
+
+    Playback position is not signalled: UI timers read clock_snapshot()
+    (see ui/playhead.py) and interpolate it themselves.
     """
     log = pyqtSignal(str)
     finished = pyqtSignal()
-    progress = pyqtSignal(float, float)  # (current_time, total_duration)
     paused = pyqtSignal()  # Emitted when actually paused (for UI update)
     resumed = pyqtSignal()  # Emitted when playback resumes (for UI update)
     countdown_tick = pyqtSignal(int)  # remaining seconds (0=countdown finished)
     auto_pause_at_bar = pyqtSignal(int)  # bar_index where auto-paused
     playback_key = pyqtSignal(str, str)  # (key, action) from scheduler
+    song_changed = pyqtSignal(int, str)  # (playlist index, path) when the next playlist song starts
 
-    def __init__(self, events: List[NoteEvent], cfg: PlayerConfig):
+    def __init__(self, events: List[NoteEvent], cfg: PlayerConfig,
+                 session: Optional[PlaybackSession] = None):
         super().__init__()
+        self._created_at = time.perf_counter()  # Start pressed (for time-to-first-note)
         self.events = events
         self.cfg = cfg
-        self._stop = False
-        self._paused = False
+        # Warm resources (input manager, synth, layout tables); private if not shared
+        self._owns_session = session is None
+        self._session = session or PlaybackSession()
+        self._session.begin_play()
+        self.time_to_first_note_ms: Optional[float] = None
+        self._countdown_s = 0.0
+        self._play_from = 0.0
+        # Clock + pause/resume/stop state shared with the output scheduler
+        self._control = PlaybackControl()
         self._pause_pending = False  # Pause at end of current bar
-        self._pause_start = 0.0
-        self._total_pause_time = 0.0
+        self._in_countdown = False  # Start countdown running (F5 skips it)
+        self._seek_lock = threading.Lock()
+        self._seek_request: Optional[Tuple[str, float]] = None  # ("time", sec) or ("bar", index)
         self._bar_duration = 2.0  # Default bar duration (120BPM 4/4)
         self._bar_boundaries_sec: list = []  # 可变小节边界时间列表 (秒)
         self._current_bar = -1  # Current bar index
         self._total_duration = 0.0  # Total playback duration (for progress)
-        self._last_progress_emit = 0.0  # Last time progress was emitted
+        self._applied_errors: list = []  # Errors compiled into the plan (AppliedError)
+        # Humanization seed: reuse it to reproduce the same performance (e.g. resume from a bar)
+        self._seed = cfg.humanize_seed if cfg.humanize_seed is not None else random.randrange(2 ** 31)
 
         # Initialize InputManager v2 for reliable key handling in DirectX games
-        self._input_manager = create_input_manager(
-            enable_diagnostics=cfg.enable_diagnostics,
-            backend="sendinput",  # Use SendInput API + scan codes
-            target_hwnd=cfg.target_hwnd,  # Target window handle for focus monitoring
-            enable_focus_monitor=True  # Auto-release keys when window loses focus
+        # (reused across plays; target window / diagnostics are updated in place)
+        self._input_manager = self._session.get(
+            "input", (cfg.input_backend,),
+            lambda: create_input_manager(
+                enable_diagnostics=cfg.enable_diagnostics,
+                backend=cfg.input_backend,  # Default: SendInput API + scan codes
+                target_hwnd=cfg.target_hwnd,  # Target window handle for focus monitoring
+                enable_focus_monitor=True  # Auto-release keys when window loses focus
+            ),
+            dispose=lambda im: im.stop(),
         )
+        self._input_manager.set_target_window(cfg.target_hwnd)
+        self._input_manager.config.enable_diagnostics = cfg.enable_diagnostics
 
         # Output scheduler for non-blocking key injection with late-drop
         self._output_scheduler: Optional[OutputScheduler] = None
+        self.scheduler_stats: Optional[dict] = None  # OutputScheduler.get_stats() of the last run
+        self.stall_snapshots: list = []  # StallSnapshot list of the last run (diagnostics mode)
+        self._watchdog: Optional[StallWatchdog] = None
+        self.gc_stats: Optional[dict] = None  # GcGuard.stats() of the last run (performance/diagnostics mode)
+        self.late_report: List[dict] = []  # Per-bar late-policy statistics of the last run
+        self._gc_guard: Optional[GcGuard] = None
+        self._governor: Optional[SpeedGovernor] = None
+        self.warp_decisions: list = []  # WarpDecision list of the last run (speed governor)
+
+        # Live octave switching: pitch -> key table per octave shift (None = keys as compiled)
+        self._octave_shift = cfg.octave_shift
+        self._key_tables: Dict[int, KeyTable] = {}
+        self._plan_pitches: set = set()
+        self._key_table: Optional[KeyTable] = None
+        self._octave_changed = False  # Set with every table swap; the dispatcher releases held keys
+
+        # Hot-swap of edited bars: notes/events of the compiled plan and patches waiting for the dispatcher
+        self._patch_lock = threading.Lock()
+        self._plan_notes: Optional[List[NoteEvent]] = None
+        self._plan_events: Optional[List[KeyEvent]] = None
+        self._note_to_key: Dict[int, str] = {}
+        self._patch_requests: List[PlanPatch] = []
+
+        # A-B loop: (first bar, last bar, speed-up % per pass); the dispatcher resolves it to a plan slice
+        self._loop_bars: Optional[Tuple[int, int, float]] = None
+        if cfg.loop_enabled:
+            self._loop_bars = (cfg.loop_start_bar, cfg.loop_end_bar, cfg.loop_speedup_pct)
+        self._loop_changed = self._loop_bars is not None
+
+        # Gapless playlist: songs compiled ahead, waiting for the end of the plan
+        self._precompiler: Optional[PlanPrecompiler] = None
+        self._song_queue: List[PreparedSong] = []
+        self._playlist_open = bool(cfg.playlist)  # More songs may still be queued
+        self._remote_songs: Dict[int, PreparedSong] = {}  # Sent to the dispatcher process, by index
+        self._shared_songs: List[SharedPlan] = []
+
+        # Dispatcher child process (cfg.dispatch_process) and its mirrored state
+        self._remote: Optional[DispatcherProcess] = None
+        self._remote_snapshot: Optional[ClockSnapshot] = None
 
         # Playback trace (expected vs actual), only used in diagnostics mode
         self._trace_expected_file = None
@@ -130,7 +201,9 @@ class PlayerThread(QThread):
 
     def stop(self):
         """Stop playback immediately."""
-        self._stop = True
+        self._control.stop()
+        if self._remote is not None:
+            self._remote.send(CMD_STOP)
         # Stop the output scheduler if running
         if self._output_scheduler is not None:
             self._output_scheduler.stop()
@@ -141,61 +214,346 @@ class PlayerThread(QThread):
 
     def pause(self):
         """Request pause at end of current bar."""
-        if not self._paused and not self._pause_pending:
+        remote = self._remote
+        if remote is not None:
+            remote.state[STATE_PAUSE_PENDING] = int(not self._control.is_paused())  # Shared with the child
+            remote.send(CMD_PAUSE)
+            return
+        if not self._control.is_paused() and not self._pause_pending:
             self._pause_pending = True
             self.log.emit(f"Pause pending (at bar end)")
 
     def _do_pause(self):
         """Execute pause (internal call)."""
-        if not self._paused:
-            self._paused = True
+        if self._control.pause():  # Also pauses the output scheduler (shared control)
             self._pause_pending = False
-            self._pause_start = time.perf_counter()
-            # Pause the output scheduler
-            if self._output_scheduler is not None:
-                self._output_scheduler.pause()
             self.log.emit("Paused")
             self.paused.emit()  # Notify UI
 
-    def _release_all_pressed(self, pressed_keys: Dict[str, int], fs, chan: int):
-        """Release all pressed keys on pause/stop."""
+    def _release_all_pressed(self, pressed_keys: Dict[str, int], fs, chan: int, reason: str = "Pause"):
+        """Release all pressed keys on pause/stop/seek."""
         released = self._input_manager.release_all()
         if fs is not None:
-            if hasattr(fs, "cc"):
-                try:
-                    fs.cc(chan, 123, 0)  # All notes off
-                except Exception:
-                    pass
-            elif hasattr(fs, "all_notes_off"):
-                try:
-                    fs.all_notes_off(chan)
-                except Exception:
-                    pass
+            self._synth_all_notes_off(fs, chan)
         if released > 0:
-            self.log.emit(f"Pause: released {released} keys")
+            self.log.emit(f"{reason}: released {released} keys")
         pressed_keys.clear()
 
+    @staticmethod
+    def _synth_all_notes_off(fs, chan: int):
+        if hasattr(fs, "cc"):
+            try:
+                fs.cc(chan, 123, 0)  # All notes off
+            except Exception:
+                pass
+        elif hasattr(fs, "all_notes_off"):
+            try:
+                fs.all_notes_off(chan)
+            except Exception:
+                pass
+
     def resume(self):
         """Resume playback."""
+        remote = self._remote
+        if remote is not None:
+            remote.state[STATE_PAUSE_PENDING] = 0
+            remote.send(CMD_RESUME)
+            return
         if self._pause_pending:
             # Cancel pending pause
             self._pause_pending = False
             self.log.emit("Pause cancelled")
             self.resumed.emit()  # Notify UI
-        elif self._paused:
-            pause_duration = time.perf_counter() - self._pause_start
-            self._total_pause_time += pause_duration
-            self._paused = False
-            # Resume the output scheduler
-            if self._output_scheduler is not None:
-                self._output_scheduler.resume()
+        elif self._control.is_paused():
+            pause_duration = self._control.resume()  # Wakes dispatcher and scheduler at once
             self.log.emit(f"Resumed (paused {pause_duration:.1f}s)")
             self.resumed.emit()  # Notify UI
 
+    def seek(self, time_sec: Optional[float] = None, bar: Optional[int] = None):
+        """Jump to a score time (seconds) or a 0-based bar without restarting.
+
+        The dispatcher releases held keys, moves its cursor in the compiled
+        plan by binary search, re-presses notes still sounding at the target
+        and continues on the same threads and synth. Works while paused.
+        """
+        if self._remote is not None:
+            self._remote.send(CMD_SEEK, time_sec, bar)
+            return
+        request = ("bar", float(bar)) if bar is not None else ("time", max(0.0, time_sec or 0.0))
+        with self._seek_lock:
+            self._seek_request = request
+        self._control.notify()  # Interrupt the dispatcher's current wait
+
+    def set_speed(self, speed: float):
+        """Change the tempo live: the next event is due at the new speed (no recompile).
+
+        The plan stays compiled at cfg.speed; the clock's time map gets a new
+        segment at the current position with rate speed / cfg.speed.
+        """
+        if self._remote is not None:
+            self._remote.send(CMD_TEMPO, speed)
+            return
+        factor = max(1e-9, speed) / max(1e-9, self.cfg.speed)
+        if abs(factor - self._control.tempo) < 1e-9:
+            return
+        self._control.set_tempo(factor)
+        self.log.emit(f"[Tempo] x{speed:.2f} @ t={self._control.now():.3f}s")
+
+    def set_loop(self, first_bar: int, last_bar: int, speedup_pct: float = 0.0):
+        """Loop bars first_bar..last_bar (0-based, inclusive) until clear_loop().
+
+        The plan is sliced by index once; every pass rewinds the cursor and
+        rebases the clock to the loop start (no recompile, no countdown).
+        speedup_pct > 0 raises the tempo by that percentage each pass.
+        """
+        if self._remote is not None:
+            self._remote.send(CMD_LOOP, first_bar, last_bar, speedup_pct)
+            return
+        self._loop_bars = (min(first_bar, last_bar), max(first_bar, last_bar), max(0.0, speedup_pct))
+        self._loop_changed = True
+        self._control.notify()
+
+    def clear_loop(self):
+        """Leave the A-B loop: playback continues past the loop end."""
+        if self._remote is not None:
+            self._remote.send(CMD_LOOP, None)
+            return
+        self._loop_bars = None
+        self._loop_changed = True
+        self._control.notify()
+
+    def _resolve_loop(self, plan: PlaybackPlan) -> Optional[LoopSlice]:
+        """Plan slice of the requested A-B loop (None: no loop or an empty range)."""
+        bars = self._loop_bars
+        if bars is None:
+            return None
+        first_bar, last_bar, _ = bars
+        start = self._bar_time(plan, first_bar)
+        end = self._bar_time(plan, last_bar + 1)
+        if end <= start:
+            return None
+        return plan.slice(start, end)
+
+    def _bar_time(self, plan: PlaybackPlan, bar: float) -> float:
+        """Plan time where 0-based `bar` starts."""
+        target = plan.bar_start_time(int(bar))
+        if target is None:
+            target = max(0.0, bar) * self._bar_duration / max(1e-9, self.cfg.speed)
+        return target
+
+    def _loop_rewind(self, plan: PlaybackPlan, loop: LoopSlice, loop_pass: int, pressed_keys: Dict[str, int],
+                     active_tokens: Dict[str, int], token_keys: Dict[int, Tuple[str, int]], fs, chan: int):
+        """End of an A-B pass: silence, rewind the cursor by index and rebase the clock."""
+        if self._output_scheduler is not None:
+            self._output_scheduler.clear_queue()
+        self._release_all_pressed(pressed_keys, fs, chan, reason="Loop")
+        active_tokens.clear()
+        token_keys.clear()
+        plan.cursor = loop.start_index
+        self._control.seek(loop.start)
+        first_bar, last_bar, speedup_pct = self._loop_bars
+        tempo = ""
+        if speedup_pct > 0:
+            factor = min(LOOP_MAX_TEMPO, self._control.tempo * (1.0 + speedup_pct / 100.0))
+            self._control.set_tempo(factor)
+            tempo = f", x{factor * self.cfg.speed:.2f}"
+        self.log.emit(f"[Loop] pass {loop_pass + 1}: bars {first_bar + 1}-{last_bar + 1}{tempo}")
+
+    def update_events(self, events: List[NoteEvent]) -> bool:
+        """Hot-swap edited notes into the running plan (no restart).
+
+        Only the bars that differ from the compiled notes are recompiled (see
+        plan_patch.py); the dispatcher splices them into the plan, played bars
+        included, so a seek back or an A-B loop plays the edit. Called before the plan is compiled, the new
+        notes are simply used for it. Returns True if a patch was queued.
+        """
+        t0 = time.perf_counter()
+        with self._patch_lock:
+            self.events = events
+            if self._plan_events is None:
+                return False
+            bars = dirty_bar_range(self._plan_notes, events, self._bar_duration)
+            if bars is None:
+                return False
+            compiler = PlanCompiler(
+                events, self.cfg, self._seed,
+                min_key_hold_ms=self._input_manager.config.min_key_hold_ms,
+                bar_and_beat_fn=self._midi_bar_and_beat,
+            )
+            patch = build_patch(compiler, self._note_to_key, self._plan_events, bars)
+            self._plan_notes = events
+            self._plan_events = apply_patch(self._plan_events, patch)
+            if patch.applied_errors is not None:
+                self._applied_errors = patch.applied_errors
+            if self._remote is not None:
+                self._remote.send(CMD_PATCH, patch)
+            else:
+                self._patch_requests.append(patch)
+        self._control.notify()  # Interrupt the dispatcher's current wait
+        self.log.emit(f"[Patch] {patch.describe()} compiled in {(time.perf_counter() - t0) * 1000:.1f}ms")
+        return True
+
+    def apply_patch(self, patch: PlanPatch):
+        """Queue an already compiled patch for the dispatcher (dispatcher process side)."""
+        with self._patch_lock:
+            self._patch_requests.append(patch)
+        self._control.notify()
+
+    def _splice_patches(self, plan: PlaybackPlan):
+        """Dispatcher: splice queued patches into the plan (the caller re-resolves the A-B loop)."""
+        with self._patch_lock:
+            patches, self._patch_requests = self._patch_requests, []
+        now = self._control.now()
+        for patch in patches:
+            plan.splice(patch, now)
+            if patch.applied_errors is not None:
+                self._applied_errors = patch.applied_errors
+            # Pitches new to the plan need a key in every octave table
+            new_pitches = plan_pitches(patch.events) - self._plan_pitches
+            if new_pitches and self._key_tables:
+                self._plan_pitches |= new_pitches
+                for shift, table in self._key_tables.items():
+                    table.update(build_key_table(self.cfg, shift, new_pitches))
+        self._total_duration = plan.end_time()
+        self._control.set_duration(self._total_duration)
+
+    def queue_song(self, song: Optional[PreparedSong]):
+        """Hand a prepared playlist song to the dispatcher (None: no more songs).
+
+        Called on the precompiler thread. With the dispatcher process the
+        plan goes to the child through shared memory.
+        """
+        with self._patch_lock:
+            remote = self._remote
+            if remote is None:
+                if song is None:
+                    self._playlist_open = False
+                else:
+                    self._song_queue.append(song)
+        if remote is not None:
+            remote.send(CMD_SONG, self._share_song(song))
+            return
+        self._control.notify()
+
+    def _share_song(self, song: Optional[PreparedSong]) -> Optional[PreparedSong]:
+        """Copy of a prepared song for the dispatcher process (events in a SharedPlan block)."""
+        if song is None:
+            return None
+        shared = SharedPlan(song.events)
+        self._shared_songs.append(shared)  # Released when the child exits
+        song = replace(song, events=None, notes=[], shared_name=shared.name)
+        self._remote_songs[song.index] = song
+        return song
+
+    def _take_song(self) -> Optional[PreparedSong]:
+        with self._patch_lock:
+            return self._song_queue.pop(0) if self._song_queue else None
+
+    def _adopt_song(self, song: PreparedSong):
+        """Per-song state of a playlist song (the parent mirrors it with the dispatcher process)."""
+        self._seed = song.seed
+        self._bar_duration = song.bar_duration
+        self._bar_boundaries_sec = song.bar_boundaries_sec
+        self._applied_errors = song.applied_errors
+        self._current_bar = -1
+        with self._patch_lock:
+            # Editor edits belong to the song the editor shows
+            self._plan_notes = None
+            self._plan_events = None
+            self._patch_requests = []
+        if self._precompiler is not None:
+            self._precompiler.advance()
+
+    def _start_next_song(self, plan: PlaybackPlan, song: PreparedSong, pressed_keys: Dict[str, int],
+                         active_tokens: Dict[str, int], token_keys: Dict[int, Tuple[str, int]], fs, chan: int):
+        """End of the plan: swap in the prepared song and rebase the clock to -gap (no countdown)."""
+        events = song.events if song.events is not None else read_shared_plan(song.shared_name)
+        self._release_all_pressed(pressed_keys, fs, chan, reason="Song")
+        active_tokens.clear()
+        token_keys.clear()
+        plan.load(events)
+        self._adopt_song(song)
+        self._plan_pitches = plan_pitches(plan.events)
+        self._key_tables = build_key_tables(self.cfg, self._plan_pitches)
+        self._key_table = None
+        if self._octave_shift != self.cfg.octave_shift:
+            self._select_key_table(self._octave_shift)
+            self._octave_changed = False  # Nothing is held
+        self._total_duration = plan.end_time()
+        self._control.set_duration(self._total_duration)
+        gap = max(0.0, self.cfg.playlist_gap_s)
+        self._control.seek(-gap * self._control.tempo)  # Gap in real seconds at the current tempo
+        self.log.emit(f"[Playlist] song {song.index}/{len(self.cfg.playlist)}: {song.describe()}, gap {gap:.1f}s")
+        self.song_changed.emit(song.index, song.path)
+
+    def set_octave_shift(self, shift: int):
+        """Change the octave live: the next press uses the new octave (no recompile).
+
+        Plan events keep their score pitch; the dispatcher maps it through the
+        key table of the current shift. Swapping the table is a single
+        reference assignment; held keys are released by the dispatcher.
+        """
+        if self._remote is not None:
+            self._remote.send(CMD_OCTAVE, shift)
+            return
+        if shift == self._octave_shift:
+            return
+        self._octave_shift = shift
+        if self._key_tables:
+            self._select_key_table(shift)
+            self._control.notify()  # Interrupt the dispatcher's current wait
+
+    def _select_key_table(self, shift: int):
+        """Point the dispatcher at the key table of `shift`."""
+        if shift == self.cfg.octave_shift:
+            table = None  # Compiled keys are already in this octave
+        else:
+            table = self._key_tables.get(shift)
+            if table is None:
+                table = build_key_table(self.cfg, shift, self._plan_pitches)
+                self._key_tables[shift] = table
+        self._key_table = table
+        self._octave_changed = True
+
+    def _map_press(self, event: KeyEvent, token_keys: Dict[int, Tuple[str, int]]) -> Optional[KeyEvent]:
+        """Press in the current octave, or None if its pitch has no key there."""
+        table = self._key_table
+        if table is None or event.pitch < 0:
+            return event
+        mapped = table.get(event.pitch)
+        if mapped is None:
+            return None
+        token_keys[event.token] = mapped
+        if mapped[0] == event.key:
+            return event
+        return replace(event, key=mapped[0], note=mapped[1])
+
+    def _map_release(self, event: KeyEvent, token_keys: Dict[int, Tuple[str, int]]) -> Optional[KeyEvent]:
+        """Release of the key its press used (None if the press was not played in this octave)."""
+        mapped = token_keys.pop(event.token, None)
+        if self._key_table is None or event.pitch < 0:
+            return event
+        if mapped is None:
+            return None
+        if mapped[0] == event.key:
+            return event
+        return replace(event, key=mapped[0], note=mapped[1])
+
     def is_paused(self) -> bool:
-        return self._paused
+        return self._control.is_paused()
+
+    def is_counting_down(self) -> bool:
+        return self._in_countdown
+
+    def skip_countdown(self):
+        """Skip the remaining start countdown (takes effect immediately)."""
+        if self._in_countdown:
+            self._control.request_skip()
 
     def is_pause_pending(self) -> bool:
+        remote = self._remote
+        if remote is not None:
+            return bool(remote.state[STATE_PAUSE_PENDING])
         return self._pause_pending
 
     def get_bar_duration(self) -> float:
@@ -204,23 +562,79 @@ class PlayerThread(QThread):
 
     def get_current_bar(self) -> int:
         """Get current bar index."""
+        remote = self._remote
+        if remote is not None:
+            return remote.state[STATE_CURRENT_BAR]
         return self._current_bar
 
+    def clock_snapshot(self) -> ClockSnapshot:
+        """Latest published playback clock (lock-free; safe from any thread)."""
+        remote_snapshot = self._remote_snapshot
+        if self._remote is not None and remote_snapshot is not None:
+            return remote_snapshot
+        return self._control.snapshot
+
+    def get_seed(self) -> int:
+        """Humanization seed used by this playback."""
+        return self._seed
+
+    def get_applied_errors(self) -> list:
+        """Get simulated errors compiled into the current plan."""
+        return list(self._applied_errors)
+
     def get_previous_bar_start_time(self) -> float:
         """Calculate start time of previous bar (for resume from previous bar).
 
         Returns:
             Start time of previous bar in seconds, or 0.0 if at first bar.
         """
-        if self._current_bar <= 1 or self._bar_duration <= 0:
+        current_bar = self.get_current_bar()
+        if current_bar <= 1 or self._bar_duration <= 0:
             return 0.0
-        return (self._current_bar - 1) * self._bar_duration
+        return (current_bar - 1) * self._bar_duration
 
     def _safe_trace_basename(self, midi_path: str) -> str:
         base = os.path.splitext(os.path.basename(midi_path or ""))[0] or "midi"
         safe = re.sub(r"[^A-Za-z0-9._-]+", "_", base).strip("_")
         return safe or "midi"
 
+    def _load_plan_file(self) -> Optional[CompiledPlan]:
+        """Saved plan: adopt its layout, speed and seed so live controls match the file.
+
+        The settings go to a copy of cfg, so they last for this playback only.
+        """
+        t0 = time.perf_counter()
+        try:
+            meta, compiled = load_plan(self.cfg.plan_path)
+        except (OSError, ValueError) as e:
+            self.log.emit(f"Plan file: {e}")
+            return None
+        settings, rejected = plan_layout(meta)
+        if rejected:
+            self.log.emit(f"Plan file: ignored invalid {', '.join(rejected)}")
+        self.cfg = replace(self.cfg, **settings)
+        self._seed = compiled.seed
+        self.log.emit(
+            f"Plan file: {os.path.basename(self.cfg.plan_path)} ({len(compiled.events)} events, "
+            f"seed {compiled.seed}, config {meta.get('config_hash')}, loaded in {(time.perf_counter() - t0) * 1000:.1f}ms)"
+        )
+        return compiled
+
+    def _save_plan_file(self, compiled: CompiledPlan):
+        """Diagnostics: keep the compiled plan next to the traces (replayable with plan_path)."""
+        if not self.cfg.enable_diagnostics:
+            return
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        logs_dir = os.path.join(base_dir, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        prefix = f"{self._safe_trace_basename(self.cfg.midi_path)}_{time.strftime('%Y%m%d_%H%M%S')}"
+        path = os.path.join(logs_dir, f"plan_{prefix}{PLAN_SUFFIX}")
+        try:
+            save_plan(path, compiled, self.cfg)
+            self.log.emit(f"[Trace] plan={path}")
+        except OSError as e:
+            self.log.emit(f"[Trace] plan not saved: {e}")
+
     def _start_playback_trace(self, event_queue: List[KeyEvent]):
         if not self.cfg.enable_diagnostics:
             return
@@ -300,7 +714,22 @@ class PlayerThread(QThread):
                 kwargs.get("queue_size", 0),
             ])
 
+    def _write_warp_trace(self):
+        """Speed governor decisions next to the actual trace (warp_*.csv)."""
+        if not self._trace_actual_path or not self.warp_decisions:
+            return
+        directory, name = os.path.split(self._trace_actual_path)
+        path = os.path.join(directory, "warp_" + name[len("actual_"):])
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["playback_s", "late_ms", "rate_from", "rate_to", "reason"])
+            for d in self.warp_decisions:
+                writer.writerow([f"{d.playback_s:.6f}", f"{d.late_ms:.3f}", f"{d.rate_from:.4f}", f"{d.rate_to:.4f}", d.reason])
+        self.log.emit(f"[Trace] warp={path}")
+
     def _close_playback_trace(self):
+        if self._trace_actual_file:
+            self._write_warp_trace()
         if self._trace_expected_file:
             self._trace_expected_file.flush()
             self._trace_expected_file.close()
@@ -314,15 +743,20 @@ class PlayerThread(QThread):
 
     def run(self):
         """Main playback loop."""
-        if not self.events:
+        loaded_plan = self._load_plan_file() if self.cfg.plan_path else None
+        if not self.events and loaded_plan is None:
             self.log.emit("No events.")
+            if self._owns_session:
+                self._session.close()
             self.finished.emit()
             return
 
         # Prepare mapping (21-key or 36-key)
         effective_root = self.cfg.root_mid_do + (self.cfg.octave_shift * 12)
-        avail_pairs = build_available_notes(effective_root, self.cfg.keyboard_preset)
-        note_to_key: Dict[int, str] = {n: k for n, k in avail_pairs}
+        note_to_key: Dict[int, str] = self._session.get(
+            "layout", (effective_root, self.cfg.keyboard_preset),
+            lambda: build_note_to_key(self.cfg),
+        )
         avail_notes = list(note_to_key.keys())
 
         mode_str = self.cfg.keyboard_preset
@@ -340,18 +774,17 @@ class PlayerThread(QThread):
             in_range = sum(1 for n in midi_notes if n in avail_notes)
             self.log.emit(f"MIDI note range: {midi_min}-{midi_max}, in-range: {in_range}/{len(midi_notes)} ({100*in_range//len(midi_notes)}%)")
 
-        # Initialize FluidSynth for local sound
-        fs = self._init_fluidsynth()
+        # Initialize FluidSynth for local sound (kept warm per SoundFont; instrument switch is cheap)
+        fs = None
         sfid = None
         chan = 0
-
-        if fs is not None:
-            sfid = fs.sfload(self.cfg.soundfont_path)
-            if sfid == -1:
-                self.log.emit(f"Sound: failed to load SoundFont")
-                fs.delete()
-                fs = None
-            else:
+        if self.cfg.play_sound:
+            sf_key = (self.cfg.soundfont_path,)
+            if self._session.is_warm("synth", sf_key):
+                self.log.emit("Sound: reusing loaded SoundFont")
+            synth = self._session.get("synth", sf_key, self._load_synth, dispose=lambda pair: pair[0].delete())
+            if synth is not None:
+                fs, sfid = synth
                 prog = GM_PROGRAM.get(self.cfg.instrument, 1) - 1
                 fs.program_select(chan, sfid, 0, prog)
                 self.log.emit(f"Sound: ON ({self.cfg.instrument}, vel={self.cfg.velocity})")
@@ -364,20 +797,30 @@ class PlayerThread(QThread):
                 time.sleep(0.2)
 
         # Countdown (skip if skip_countdown is True, e.g., resume from previous bar)
-        if self.cfg.countdown_sec > 0 and not self.cfg.skip_countdown:
+        countdown_start = time.perf_counter()
+        if self.cfg.sync_start_at is not None:
+            self.log.emit(f"LAN sync: starting in {self.cfg.sync_start_at - time.perf_counter():.2f}s (no countdown)")
+        elif self.cfg.countdown_sec > 0 and not self.cfg.skip_countdown:
             self.log.emit(f"Countdown: {self.cfg.countdown_sec}s (switch to game now)")
+            self._in_countdown = True
             for i in range(self.cfg.countdown_sec, 0, -1):
-                if self._stop:
-                    self.countdown_tick.emit(0)  # Clear countdown UI
-                    self.log.emit("Stopped during countdown.")
-                    self.finished.emit()
-                    return
                 self.countdown_tick.emit(i)  # Notify UI of countdown
                 self.log.emit(f"  ...{i}")
-                time.sleep(1)
+                if not self._control.wait_interval(1.0):  # Stop or F5 skip wakes immediately
+                    break
+            self._in_countdown = False
             self.countdown_tick.emit(0)  # Countdown finished
+            if self._control.is_stopped():
+                self.log.emit("Stopped during countdown.")
+                if self._owns_session:
+                    self._session.close()
+                self.finished.emit()
+                return
+            if self._control.consume_skip():
+                self.log.emit("Countdown skipped")
         elif self.cfg.skip_countdown:
             self.log.emit("Skipping countdown (resume from previous bar)")
+        self._countdown_s = time.perf_counter() - countdown_start
 
         # Disable IME for target window
         ime_disabled_hwnd = None
@@ -390,33 +833,50 @@ class PlayerThread(QThread):
         speed = max(1e-9, self.cfg.speed)
         start_at_time_scaled = start_at_time / speed
 
-        # Build event queue
-        event_queue, notes_scheduled, notes_dropped, notes_dropped_accidental, notes_dropped_octave_conflict = self._build_event_queue(
-            note_to_key, avail_notes
-        )
-
-        # Skip events before start_at_time (for resume from previous bar)
-        skipped_events = 0
+        # Compile the plan: notes, bar markers and simulated errors (no RNG/sleeps in the dispatch loop)
+        with self._patch_lock:
+            notes = self.events
+        if loaded_plan is not None:
+            compiled = loaded_plan
+        else:
+            compiled = PlanCompiler(
+                notes, self.cfg, self._seed,
+                log_fn=self.log.emit,
+                min_key_hold_ms=self._input_manager.config.min_key_hold_ms,
+                bar_and_beat_fn=self._midi_bar_and_beat,
+            ).compile(note_to_key)
+            self._save_plan_file(compiled)
+        event_queue = compiled.events
+        notes_scheduled = compiled.notes_scheduled
+        notes_dropped = compiled.notes_dropped
+        notes_dropped_accidental = compiled.notes_dropped_accidental
+        notes_dropped_octave_conflict = compiled.notes_dropped_octave_conflict
+        self._bar_duration = compiled.bar_duration
+        self._bar_boundaries_sec = compiled.bar_boundaries_sec
+        self._applied_errors = compiled.applied_errors
+        with self._patch_lock:
+            self._note_to_key = note_to_key
+            self._plan_notes = notes
+            self._plan_events = event_queue
+        if self.events is not notes:
+            self.update_events(self.events)  # Edited while compiling
+
+        # Full plan from 0; start_at_time becomes an initial seek (so later seeks can go backward)
+        plan = PlaybackPlan(event_queue)
+        self._play_from = start_at_time_scaled
         if start_at_time_scaled > 0:
-            new_queue = []
-            for ev in event_queue:
-                if ev.time >= start_at_time_scaled:
-                    new_queue.append(ev)
-                else:
-                    skipped_events += 1
-            event_queue = new_queue
-            heapq.heapify(event_queue)
-            self.log.emit(f"Starting at {start_at_time:.2f}s, skipped {skipped_events} events")
+            self.log.emit(f"Starting at {start_at_time:.2f}s, skipping {plan.index_at(start_at_time_scaled)} events")
+            with self._seek_lock:
+                if self._seek_request is None:
+                    self._seek_request = ("time", start_at_time)
 
         n_events = len(event_queue)
         self.log.emit(f"Playing {notes_scheduled} notes ({n_events} events)... (speed x{self.cfg.speed}, midi_dur={self.cfg.use_midi_duration})")
         self._start_playback_trace(event_queue)
 
-        # Calculate total duration for progress tracking
-        if event_queue:
-            self._total_duration = max(ev.time for ev in event_queue)
-        else:
-            self._total_duration = 0.0
+        # Calculate total duration for progress tracking (published with the clock)
+        self._total_duration = plan.end_time()
+        self._control.set_duration(self._total_duration)
 
         if notes_dropped > 0:
             detail_parts = []
@@ -427,83 +887,298 @@ class PlayerThread(QThread):
             detail = f" ({', '.join(detail_parts)})" if detail_parts else ""
             self.log.emit(f"Dropped {notes_dropped} notes{detail}. Try 36-key or accidental_policy=lower/upper")
 
-        # Create output scheduler for non-blocking key injection
-        def log_scheduler(msg: str):
-            self.log.emit(msg)
+        # Dispatcher process: trace writers and the synth stay in this process, so they need in-process dispatch
+        remote_dispatch = self.cfg.dispatch_process
+        if remote_dispatch and (self.cfg.enable_diagnostics or fs is not None):
+            remote_dispatch = False
+            reason = "diagnostics traces" if self.cfg.enable_diagnostics else "sound monitoring"
+            self.log.emit(f"Dispatcher process: off for this play ({reason} need in-process dispatch)")
+
+        # Performance mode: freeze the compiled plan and defer GC (before the clock starts)
+        if not remote_dispatch:
+            self._enter_gc_guard()
 
-        # Capture playback start time for scheduler sync
+        # Capture playback start time for scheduler sync (LAN sync: the leader's epoch on this clock)
         playback_start_time = time.perf_counter()
+        if self.cfg.sync_start_at is not None:
+            late_ms = (playback_start_time - self.cfg.sync_start_at) * 1000
+            if late_ms > 0:
+                self.log.emit(f"LAN sync: setup finished {late_ms:.0f}ms after the agreed start, joining late")
+            self._countdown_s += max(0.0, -late_ms / 1000)  # The wait for the agreed start replaces the countdown
+            playback_start_time = self.cfg.sync_start_at
         if start_at_time_scaled > 0:
             playback_start_time -= start_at_time_scaled
+        if not self._control.is_stopped() and not remote_dispatch:
+            self._control.start(playback_start_time)
+
+        # Playlist: compile the next song in the background while this one plays
+        if self.cfg.playlist and not self._control.is_stopped():
+            self._precompiler = PlanPrecompiler(
+                self.cfg.playlist, self.cfg, self._seed, on_ready=self.queue_song,
+                min_key_hold_ms=self._input_manager.config.min_key_hold_ms, log_fn=self.log.emit,
+            )
+            self._precompiler.start()
+            self.log.emit(f"Playlist: {len(self.cfg.playlist)} more song(s), gap {self.cfg.playlist_gap_s:.1f}s")
+
+        audio = None
+        if remote_dispatch:
+            # Key injection runs in a child process (own GIL); this thread relays control/telemetry
+            errors_applied = self._dispatch_remote(plan, playback_start_time)
+        else:
+            # Synth calls go through a dedicated audio thread (never block key dispatch)
+            if fs is not None:
+                audio = AudioWorker(fs)
+                audio.start()
+            try:
+                errors_applied = self._dispatch(plan, note_to_key, audio, chan, playback_start_time)
+            finally:
+                self._exit_gc_guard()
+        if self._precompiler is not None:
+            self._precompiler.stop()
+            self._precompiler = None
+        self._close_playback_trace()
+
+        # Silence the synth (it stays loaded in the session for the next play)
+        if audio is not None:
+            audio.all_notes_off(chan)
+            audio.stop()
+
+        # Final statistics
+        total = notes_scheduled + notes_dropped
+        if total > 0:
+            drop_pct = 100 * notes_dropped // total
+            if notes_dropped > 0:
+                self.log.emit(f"Stats: played={notes_scheduled}, dropped={notes_dropped} ({drop_pct}%) [accidental={notes_dropped_accidental}, octave-conflict={notes_dropped_octave_conflict}]")
+            else:
+                self.log.emit(f"Stats: played={notes_scheduled}, dropped=0")
+
+        if errors_applied > 0:
+            self.log.emit(f"Errors simulated: {errors_applied}")
+
+        # Output diagnostics (never with the dispatcher process, see remote_dispatch)
+        if self.cfg.enable_diagnostics:
+            self._output_diagnostics()
+
+        # Re-enable IME
+        if ime_disabled_hwnd is not None:
+            if enable_ime_for_window(ime_disabled_hwnd):
+                self.log.emit("IME re-enabled for target window")
+
+        if self._owns_session:
+            self._session.close()
+
+        self.log.emit("Stopped." if self._control.is_stopped() else "Done.")
+        self.finished.emit()
+
+    def _dispatch(self, plan: PlaybackPlan, note_to_key: Dict[int, str], fs, chan: int,
+                  playback_start_time: float) -> int:
+        """Inject the plan's keys (output scheduler + playback loop). Returns errors applied.
+
+        Runs on the PlayerThread, or in the dispatcher child process (see
+        dispatcher_process.py) with the same code path.
+        """
+        def log_scheduler(msg: str):
+            self.log.emit(msg)
+
+        # Stall watchdog (diagnostics): stacks of all threads when a deadline is overrun
+        if self.cfg.enable_diagnostics:
+            self._watchdog = StallWatchdog(
+                self._control.now, threshold_ms=self.cfg.stall_threshold_ms, log_fn=log_scheduler
+            )
+            self._watchdog.start()
+
+        # Key tables for live octave switching (the child process builds its own)
+        self._plan_pitches = plan_pitches(plan.events)
+        self._key_tables = build_key_tables(self.cfg, self._plan_pitches)
+        self._octave_changed = False
+        if self._octave_shift != self.cfg.octave_shift:
+            self._select_key_table(self._octave_shift)  # Changed during the countdown
+
+        # Speed governor: slow the clock down while dispatch is behind
+        self.warp_decisions = []
+        if self.cfg.speed_governor:
+            self._governor = SpeedGovernor(
+                self._control, self._bar_duration, min_rate=self.cfg.governor_min_rate, log_fn=log_scheduler
+            )
 
+        # Create output scheduler for non-blocking key injection
         self._output_scheduler = OutputScheduler(
             press_fn=self._input_manager.press_force,
             release_fn=self._input_manager.release,
             late_drop_ms=self.cfg.late_drop_ms,
             enable_late_drop=self.cfg.enable_late_drop,
+            late_policy=LatePolicy(
+                self.cfg.late_policy,
+                threshold_ms=self.cfg.late_drop_ms,
+                adaptive=self.cfg.adaptive_late_drop,
+                log_fn=log_scheduler,
+            ) if self.cfg.enable_late_drop else None,
             log_fn=log_scheduler,
             event_log_fn=self._trace_actual_event if self._trace_actual_writer else None,
             active_check_fn=self._input_manager.is_pressed if self._trace_actual_writer else None,
             retrigger_release_fn=self._input_manager.release_force,
             retrigger_gap_ms=self._input_manager.config.min_press_interval_ms,
+            control=self._control,
+            watchdog=self._watchdog,
+            idle_fn=self._gc_guard.idle if self._gc_guard is not None and self._gc_guard.defer else None,
+            governor=self._governor,
         )
+        if self._gc_guard is not None:
+            self._output_scheduler.set_horizon(plan.peek().time if plan else float("inf"))
         self._output_scheduler.start(playback_start_time)
         if self.cfg.enable_late_drop:
-            self.log.emit(f"Output scheduler: ON (late_drop={self.cfg.late_drop_ms:.0f}ms)")
+            adaptive = "adaptive from " if self.cfg.adaptive_late_drop else ""
+            self.log.emit(
+                f"Output scheduler: ON (late policy={self.cfg.late_policy}, {adaptive}{self.cfg.late_drop_ms:.0f}ms)"
+            )
+        if self._governor is not None:
+            self.log.emit(f"Speed governor: ON (down to x{self.cfg.governor_min_rate:.2f})")
 
         # Main playback loop
         pressed_keys: Dict[str, int] = {}
         errors_applied = self._run_playback_loop(
-            event_queue, pressed_keys, note_to_key, fs, chan, playback_start_time
+            plan, pressed_keys, note_to_key, fs, chan, playback_start_time
         )
 
         # Stop output scheduler and get stats
         if self._output_scheduler is not None:
             self._output_scheduler.stop()
             stats = self._output_scheduler.get_stats()
+            self.scheduler_stats = stats
+            self._report_late_bars(self._output_scheduler.get_late_report())
+            threshold = ""
+            if "late_threshold_ms" in stats:
+                threshold = f", threshold={stats['late_threshold_ms']:.1f}ms (backend p99={stats['backend_p99_ms']:.1f}ms)"
             if stats["events_dropped"] > 0 or stats["max_late_ms"] > 10:
-                self.log.emit(f"[Scheduler] executed={stats['events_executed']}, dropped={stats['events_dropped']}, max_late={stats['max_late_ms']:.1f}ms, avg_late={stats['avg_late_ms']:.1f}ms")
+                self.log.emit(f"[Scheduler] executed={stats['events_executed']}, dropped={stats['events_dropped']}, max_late={stats['max_late_ms']:.1f}ms, avg_late={stats['avg_late_ms']:.1f}ms{threshold}")
             elif self.cfg.enable_diagnostics:
                 # Always log stats in diagnostics mode
-                self.log.emit(f"[Scheduler] executed={stats['events_executed']}, dropped={stats['events_dropped']}, max_late={stats['max_late_ms']:.1f}ms, avg_late={stats['avg_late_ms']:.1f}ms")
+                self.log.emit(f"[Scheduler] executed={stats['events_executed']}, dropped={stats['events_dropped']}, max_late={stats['max_late_ms']:.1f}ms, avg_late={stats['avg_late_ms']:.1f}ms{threshold}")
             self._output_scheduler = None
-        self._close_playback_trace()
+
+        if self._watchdog is not None:
+            self._watchdog.stop()
+            self.stall_snapshots = self._watchdog.snapshots()
+            self.log.emit(f"[Stall] {len(self.stall_snapshots)} snapshot(s) over {self.cfg.stall_threshold_ms:.0f}ms")
+            self._watchdog = None
+
+        if self._governor is not None:
+            self.warp_decisions = list(self._governor.decisions)
+            self.log.emit(self._governor.summary())
+            self._governor = None
 
         # Release any stuck keys
         released = self._input_manager.release_all()
         if released > 0:
             self.log.emit(f"Cleanup: released {released} stuck keys")
+        return errors_applied
 
-        # Cleanup FluidSynth
-        if fs is not None:
-            try:
-                fs.delete()
-            except Exception:
-                pass
-
-        # Final statistics
-        total = notes_scheduled + notes_dropped
-        if total > 0:
-            drop_pct = 100 * notes_dropped // total
-            if notes_dropped > 0:
-                self.log.emit(f"Stats: played={notes_scheduled}, dropped={notes_dropped} ({drop_pct}%) [accidental={notes_dropped_accidental}, octave-conflict={notes_dropped_octave_conflict}]")
-            else:
-                self.log.emit(f"Stats: played={notes_scheduled}, dropped=0")
-
-        if errors_applied > 0:
-            self.log.emit(f"Errors simulated: {errors_applied}")
+    def _dispatch_remote(self, plan: PlaybackPlan, playback_start_time: float) -> int:
+        """Run _dispatch() in the dispatcher process and relay its telemetry. Returns errors applied."""
+        with self._seek_lock:
+            seek_request, self._seek_request = self._seek_request, None
+        init = {
+            "seed": self._seed,
+            "bar_duration": self._bar_duration,
+            "applied_errors": self._applied_errors,
+            "total_duration": self._total_duration,
+            "created_at": self._created_at,
+            "countdown_s": self._countdown_s,
+            "play_from": self._play_from,
+            "plays": self._session.plays,
+            "session_hits": dict(self._session.hits),
+            "seek_request": seek_request,
+            "tempo": self._control.tempo,  # Speed changed during the countdown
+            "octave_shift": self._octave_shift,
+            "loop_bars": self._loop_bars,  # A-B loop changed during the countdown
+            "playlist_open": bool(self.cfg.playlist),
+        }
+        t0 = time.perf_counter()
+        remote = DispatcherProcess(plan.events, self.cfg, init)
+        remote.start()
+        with self._patch_lock:
+            self._remote = remote
+            for patch in self._patch_requests:  # Edited before the child existed
+                remote.send(CMD_PATCH, patch)
+            self._patch_requests = []
+            for song in self._song_queue:  # Prepared before the child existed
+                remote.send(CMD_SONG, self._share_song(song))
+            self._song_queue = []
+            if not self._playlist_open:
+                remote.send(CMD_SONG, None)
+        if self._control.is_stopped():
+            remote.send(CMD_STOP)  # Stopped while the child was starting
+        self.log.emit(f"Dispatcher process: pid {remote.pid}, {len(plan)} events in shared memory")
 
-        # Output diagnostics
-        if self.cfg.enable_diagnostics:
-            self._output_diagnostics()
+        errors_applied = 0
+        while True:
+            message = remote.poll(0.1)
+            if message is None:
+                if remote.is_alive():
+                    continue
+                message = remote.poll(0)  # Sent just before the child exited
+                if message is None:
+                    self.log.emit("Dispatcher process exited unexpectedly")
+                    break
+            kind = message[0]
+            if kind == MSG_CLOCK:
+                self._remote_snapshot = ClockSnapshot(*message[1])
+            elif kind == MSG_SIGNAL:
+                name, args = message[1], message[2]
+                # Mirror pause state so is_paused() answers without a round trip
+                if name == "paused":
+                    self._control.pause()
+                elif name == "resumed":
+                    self._control.resume()
+                elif name == "song_changed":
+                    song = self._remote_songs.pop(args[0], None)
+                    if song is not None:
+                        self._adopt_song(song)
+                getattr(self, name).emit(*args)
+            elif kind == MSG_READY:
+                # Child startup must not eat into the first notes: push the start back by its latency
+                remote.release_plan()
+                startup = time.perf_counter() - t0
+                if self.cfg.sync_start_at is None:  # LAN sync: the agreed start is kept
+                    playback_start_time += startup
+                if not self._control.is_stopped():
+                    self._control.start(playback_start_time)
+                remote.send(CMD_START, playback_start_time)
+                self.log.emit(f"Dispatcher process: ready in {startup * 1000:.0f}ms")
+            elif kind == MSG_DONE:
+                errors_applied = message[1]
+                for name, value in message[2].items():
+                    setattr(self, name, value)
+                break
 
-        # Re-enable IME
-        if ime_disabled_hwnd is not None:
-            if enable_ime_for_window(ime_disabled_hwnd):
-                self.log.emit("IME re-enabled for target window")
+        self._pause_pending = bool(remote.state[STATE_PAUSE_PENDING])
+        self._current_bar = remote.state[STATE_CURRENT_BAR]
+        self._remote = None
+        remote.close()
+        for shared in self._shared_songs:
+            shared.close()
+        self._shared_songs = []
+        return errors_applied
 
-        self.log.emit("Stopped." if self._stop else "Done.")
-        self.finished.emit()
+    def _load_synth(self):
+        """Create a synth and load the SoundFont. Returns (fs, sfid) or None."""
+        fs = self._init_fluidsynth()
+        if fs is None:
+            return None
+        sfid = fs.sfload(self.cfg.soundfont_path)
+        if sfid == -1:
+            self.log.emit(f"Sound: failed to load SoundFont")
+            fs.delete()
+            return None
+        return fs, sfid
+
+    def _midi_bar_and_beat(self) -> Tuple[float, float]:
+        """Bar/beat duration of cfg.midi_path (cached per file version in the session)."""
+        path = self.cfg.midi_path
+        return self._session.get(
+            "midi_timing", (path, os.path.getmtime(path)),
+            lambda: calculate_bar_and_beat_duration(mido.MidiFile(path, clip=True)),
+        )
 
     def _init_fluidsynth(self):
         """Initialize FluidSynth synthesizer."""
@@ -567,545 +1242,163 @@ class PlayerThread(QThread):
             self.log.emit(traceback.format_exc())
             return None
 
-    def _build_event_queue(self, note_to_key: Dict[int, str], avail_notes: List[int]) -> Tuple[List[KeyEvent], int, int]:
-        """Build the event queue with all press/release events."""
-        event_queue: List[KeyEvent] = []
-        default_press_s = max(0.001, self.cfg.press_ms / 1000.0)
+    def _apply_seek(self, plan: PlaybackPlan, pressed_keys: Dict[str, int], active_tokens: Dict[str, int],
+                    token_keys: Dict[int, Tuple[str, int]], fs, chan: int):
+        """Apply a pending seek request (dispatcher thread only)."""
+        with self._seek_lock:
+            request, self._seek_request = self._seek_request, None
+        if request is None:
+            return
+        t0 = time.perf_counter()
         speed = max(1e-9, self.cfg.speed)
-        start_at_time = max(0.0, self.cfg.start_at_time)
-        start_at_time_scaled = start_at_time / speed
-
-        # Timeline normalization
-        next_free_time: Dict[str, float] = {}
-        min_hold_ms = max(30.0, self._input_manager.config.min_key_hold_ms * 3)
-        min_hold_s = min_hold_ms / 1000.0
-        post_release_s = 0.010  # 10ms
-        token_counter = 0
-
-        # Get input style
-        if self.cfg.strict_midi_timing:
-            style = INPUT_STYLES.get("mechanical", INPUT_STYLES["mechanical"])
+        kind, value = request
+        target = None
+        if kind == "bar":
+            target = self._bar_time(plan, value)
         else:
-            style = INPUT_STYLES.get(self.cfg.input_style, INPUT_STYLES["mechanical"])
-        self.log.emit(f"Input style: {self.cfg.input_style}")
-
-        notes_scheduled = 0
-        notes_dropped = 0
-        notes_dropped_accidental = 0  # 黑键/无法映射到布局
-        notes_dropped_octave_conflict = 0  # 八度冲突
+            target = value / speed
+        target = max(0.0, min(target, plan.end_time()))
 
-        # Calculate bar duration
-        beat_duration_for_filter = 0.5
-        if self.cfg.midi_path and os.path.isfile(self.cfg.midi_path):
-            try:
-                mid_obj = mido.MidiFile(self.cfg.midi_path, clip=True)
-                bar_duration, beat_duration_for_filter = calculate_bar_and_beat_duration(mid_obj)
-                self._bar_duration = bar_duration
-            except Exception:
-                pass
-
-        # Override bar duration from editor BPM (Pitfall #2: must be before event queue build)
-        if self.cfg.bar_duration_override > 0:
-            self._bar_duration = self.cfg.bar_duration_override
-            self.log.emit(f"Using editor bar duration: {self._bar_duration:.3f}s")
-
-        # Use variable bar boundaries if provided (for stretched bars)
-        if self.cfg.bar_boundaries_sec:
-            self._bar_boundaries_sec = list(self.cfg.bar_boundaries_sec)
-            self.log.emit(f"Using {len(self._bar_boundaries_sec)} variable bar boundaries")
-
-        # 8-bar style setup
-        eight_bar = self.cfg.eight_bar_style
-        eight_bar_segments, segment_duration, beat_duration, warp_start = self._setup_eight_bar(eight_bar, speed)
-        use_warp = eight_bar.enabled and eight_bar.mode == "warp"
-        use_beat_lock = eight_bar.enabled and eight_bar.mode == "beat_lock"
-
-        # Pre-filter/trim events for start_at_time (preserve overlaps)
-        source_events = []
-        for ev in self.events:
-            ev_time = ev.time
-            ev_duration = max(0.0, ev.duration)
-            if start_at_time > 0:
-                ev_end = ev_time + ev_duration
-                if ev_duration > 0:
-                    if ev_end <= start_at_time:
-                        continue
-                    if ev_time < start_at_time:
-                        ev_duration = max(0.0, ev_end - start_at_time)
-                        ev_time = start_at_time
-                elif ev_time < start_at_time:
-                    continue
-            source_events.append((ev_time, ev_duration, ev))
-
-        # Precompute chord info for octave policy
-        chord_tolerance = 0.005
-        is_chord_note = [False] * len(source_events)
-        i = 0
-        while i < len(source_events):
-            chord_start = source_events[i][0]
-            j = i + 1
-            while j < len(source_events) and abs(source_events[j][0] - chord_start) < chord_tolerance:
-                j += 1
-            if j - i > 1:
-                for idx in range(i, j):
-                    is_chord_note[idx] = True
-            i = j
-
-        # Build beat pitch info for octave policy
-        beat_pitch_best: Dict[Tuple[int, int], Tuple[float, int]] = {}
-        beat_highest: Dict[int, int] = {}
-        beat_lowest: Dict[int, int] = {}
-
-        if beat_duration_for_filter > 1e-9:
-            for idx, (ev_time, ev_duration, ev) in enumerate(source_events):
-                if is_chord_note[idx]:
-                    continue
-                pitch = ev.note + self.cfg.transpose
-                beat_idx = int(ev_time / beat_duration_for_filter)
-                key = (beat_idx, pitch)
-                best = beat_pitch_best.get(key)
-                if best is None or ev_duration > best[0]:
-                    beat_pitch_best[key] = (ev_duration, idx)
-
-            for (beat_idx, pitch), (duration, idx) in beat_pitch_best.items():
-                if beat_idx not in beat_highest or pitch > beat_highest[beat_idx]:
-                    beat_highest[beat_idx] = pitch
-                if beat_idx not in beat_lowest or pitch < beat_lowest[beat_idx]:
-                    beat_lowest[beat_idx] = pitch
-
-        # First pass: collect notes with quantization
-        effective_policy = self.cfg.accidental_policy if self.cfg.enable_accidental_policy else "drop"
-        processed_notes = []
-        avail_set = set(avail_notes)
-        if self.cfg.octave_range_auto and avail_notes:
-            oct_min = min(avail_notes)
-            oct_max = max(avail_notes)
-        else:
-            oct_min = self.cfg.octave_min_note
-            oct_max = self.cfg.octave_max_note
-            if effective_policy == "octave" and avail_notes:
-                # Clamp to playable range so octave-shift can map notes like E6/D#6.
-                oct_min = max(oct_min, min(avail_notes))
-                oct_max = min(oct_max, max(avail_notes))
-        if oct_min > oct_max:
-            oct_min, oct_max = oct_max, oct_min
-
-        for idx, (ev_time, ev_duration, ev) in enumerate(source_events):
-            note = ev.note + self.cfg.transpose
-            shifted = False
-            if effective_policy == "octave":
-                beat_idx = None
-                if beat_duration_for_filter > 1e-9 and not is_chord_note[idx]:
-                    beat_idx = int(ev.time / beat_duration_for_filter)
-                shift = get_octave_shift(note, oct_min, oct_max)
-                if shift is not None:
-                    shifted = True
-                    # Avoid dropping octave-shifted notes in strict timing mode.
-                    if not self.cfg.strict_midi_timing:
-                        if beat_idx is None and beat_duration_for_filter > 1e-9 and not is_chord_note[idx]:
-                            beat_idx = int(ev.time / beat_duration_for_filter)
-                        if beat_idx is not None:
-                            if shift < 0:
-                                higher = beat_highest.get(beat_idx)
-                                if higher is not None and higher > note:
-                                    notes_dropped += 1
-                                    notes_dropped_octave_conflict += 1
-                                    continue
-                            else:
-                                lower = beat_lowest.get(beat_idx)
-                                if lower is not None and lower < note:
-                                    notes_dropped += 1
-                                    notes_dropped_octave_conflict += 1
-                                    continue
-
-            q = quantize_note(note, avail_notes, effective_policy, oct_min, oct_max)
-            if q is None:
-                notes_dropped += 1
-                notes_dropped_accidental += 1
+        # Silence whatever is held, then move cursor and clock together
+        if self._output_scheduler is not None:
+            self._output_scheduler.clear_queue()
+        self._release_all_pressed(pressed_keys, fs, chan, reason="Seek")
+        active_tokens.clear()
+        token_keys.clear()
+        plan.seek(target)
+        self._control.seek(target)
+
+        # Notes still sounding at the target are pressed again right away
+        sounding = plan.sounding_at(target)
+        for ev in sounding:
+            ev = self._map_press(ev, token_keys)
+            if ev is None:
                 continue
-
-            key = note_to_key[q]
-            if effective_policy == "octave":
-                shifted = (q != note)
-            processed_notes.append((ev_time, ev_duration, key, q, shifted))
-
-        # Second pass: apply humanization and schedule events
-        i = 0
-        while i < len(processed_notes):
-            chord_start = processed_notes[i][0]
-            chord_notes = []
-
-            while i < len(processed_notes) and abs(processed_notes[i][0] - chord_start) < chord_tolerance:
-                chord_notes.append(processed_notes[i])
-                i += 1
-
-            chord_start_scaled = chord_start / speed
-
-            # Get 8-bar multipliers for this chord (use scaled timeline)
-            speed_mult, timing_mult, duration_8bar_mult, section_selected = self._get_section_multipliers(
-                chord_start_scaled, eight_bar_segments, segment_duration
-            )
-
-            bar_index = int(chord_start / self._bar_duration) if self._bar_duration > 0 else 0
-            seg_start = int(chord_start_scaled / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
-
-            # Process each note in chord
-            chord_processed = []
-            for note_idx, (orig_time, orig_duration, key, q, shifted) in enumerate(chord_notes):
-                base_time = orig_time
-
-                # Apply timing offset (humanization)
-                offset_s = 0.0
-                if style.timing_offset_ms != (0, 0):
-                    offset_ms = random.uniform(style.timing_offset_ms[0], style.timing_offset_ms[1])
-                    offset_s += offset_ms / 1000.0
-
-                # Apply stagger for chords
-                if style.stagger_ms > 0 and len(chord_notes) > 1:
-                    stagger_offset = note_idx * (style.stagger_ms / 1000.0)
-                    offset_s += stagger_offset
-
-                base_time += offset_s
-                base_time /= speed
-
-                if eight_bar.enabled:
-                    base_time = seg_start + (base_time - seg_start) * timing_mult
-                    if use_warp:
-                        base_time, _ = self._map_time_warp(
-                            base_time, 1.0, eight_bar_segments, segment_duration, warp_start
-                        )
-                    elif use_beat_lock:
-                        base_time, _ = self._map_time_beat_lock(
-                            base_time, 1.0, eight_bar_segments, segment_duration, beat_duration
-                        )
-
-                desired_time = max(start_at_time_scaled, base_time)
-
-                # Determine note duration
-                if self.cfg.use_midi_duration and orig_duration > 0:
-                    duration = orig_duration
-                else:
-                    duration = default_press_s
-
-                # Apply duration variation
-                if style.duration_variation != 0:
-                    if style.duration_variation > 0:
-                        variation = random.uniform(-style.duration_variation, style.duration_variation)
-                    else:
-                        variation = random.uniform(style.duration_variation, 0)
-                    duration *= (1 + variation)
-                    duration = max(0.01, duration)
-
-                duration = max(duration, min_hold_s)
-                duration /= speed
-                if eight_bar.enabled:
-                    duration *= duration_8bar_mult
-
-                key_lower = key.lower()
-                if self.cfg.strict_midi_timing:
-                    nf = 0.0
-                else:
-                    nf = next_free_time.get(key_lower, 0.0)
-
-                chord_processed.append({
-                    'key': key,
-                    'key_lower': key_lower,
-                    'q': q,
-                    'desired_time': desired_time,
-                    'next_free': nf,
-                    'duration': duration,
-                    'order': note_idx,
-                    'shifted': shifted,
-                })
-
-            # Calculate unified delay (Chord-Lock Normalization)
-            chord_delay = 0.0
-            if not self.cfg.strict_midi_timing:
-                for note_info in chord_processed:
-                    delay_needed = note_info['next_free'] - note_info['desired_time']
-                    if delay_needed > chord_delay:
-                        chord_delay = delay_needed
-                if chord_delay < 0:
-                    chord_delay = 0.0
-
-            # Schedule events (serialize same-key notes within the same chord)
-            key_groups: Dict[str, List[dict]] = {}
-            for note_info in chord_processed:
-                key_groups.setdefault(note_info['key_lower'], []).append(note_info)
-
-            for key_lower, notes in key_groups.items():
-                has_unshifted = any(not item['shifted'] for item in notes)
-                if has_unshifted:
-                    notes = [item for item in notes if not item['shifted']]
-                elif len(notes) > 1:
-                    best = max(notes, key=lambda item: (item['duration'], -item['order']))
-                    notes = [best]
-                notes.sort(key=lambda item: (item['duration'], item['order']))
-                if len(notes) > 1:
-                    total_short = sum(item['duration'] for item in notes[:-1])
-                    total_short += post_release_s * (len(notes) - 1)
-                    long_note = notes[-1]
-                    long_note['duration'] = max(min_hold_s, long_note['duration'] - total_short)
-
-                prev_release = None
-                for note_info in notes:
-                    key = note_info['key']
-                    q = note_info['q']
-                    duration = note_info['duration']
-
-                    start_time = note_info['desired_time'] + chord_delay
-                    if prev_release is not None:
-                        start_time = max(start_time, prev_release + post_release_s)
-                    if not self.cfg.strict_midi_timing and note_info['next_free'] > start_time:
-                        start_time = note_info['next_free']
-
-                    release_time = start_time + duration
-                    if not self.cfg.strict_midi_timing:
-                        next_free_time[key_lower] = release_time + post_release_s
-
-                    token_counter += 1
-                    heapq.heappush(event_queue, KeyEvent(
-                        start_time, 2, "press", key, q, bar_index=bar_index, token=token_counter
-                    ))
-                    heapq.heappush(event_queue, KeyEvent(
-                        release_time, 1, "release", key, q, bar_index=bar_index, token=token_counter
-                    ))
-                    notes_scheduled += 1
-                    prev_release = release_time
-
-        # Insert pause markers at bar boundaries (for pause-at-bar)
-        # 优先使用可变小节边界列表 (支持拉长/压缩的小节)
-        if self._bar_boundaries_sec and self.events:
-            # 使用预计算的小节边界时间
-            for bar_idx, boundary_orig in enumerate(self._bar_boundaries_sec, start=1):
-                if boundary_orig <= 0:
-                    continue  # 跳过 0 时刻 (第 1 小节起点不需要暂停标记)
-                boundary_time = boundary_orig / speed
-                if eight_bar.enabled:
-                    _, timing_mult, _, _ = self._get_section_multipliers(
-                        boundary_time, eight_bar_segments, segment_duration
-                    )
-                    seg_start = int(boundary_time / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
-                    mapped_time = seg_start + (boundary_time - seg_start) * timing_mult
-                    if use_warp:
-                        mapped_time, _ = self._map_time_warp(
-                            mapped_time, 1.0, eight_bar_segments, segment_duration, warp_start
-                        )
-                    elif use_beat_lock:
-                        mapped_time, _ = self._map_time_beat_lock(
-                            mapped_time, 1.0, eight_bar_segments, segment_duration, beat_duration
-                        )
-                    boundary_time = mapped_time
-                pause_marker_time = max(0.0, boundary_time - 0.001)
-                heapq.heappush(
-                    event_queue,
-                    KeyEvent(pause_marker_time, 0, "pause_marker", "", 0, bar_index=bar_idx)
-                )
-        elif self._bar_duration > 1e-9 and self.events:
-            # 兜底: 使用固定小节时长计算边界
-            total_time = max(e.time + e.duration for e in self.events)
-            num_bars = int(total_time / self._bar_duration) + 1
-            for bar_idx in range(1, num_bars + 1):
-                boundary_orig = bar_idx * self._bar_duration
-                boundary_time = boundary_orig / speed
-                if eight_bar.enabled:
-                    _, timing_mult, _, _ = self._get_section_multipliers(
-                        boundary_time, eight_bar_segments, segment_duration
-                    )
-                    seg_start = int(boundary_time / segment_duration) * segment_duration if segment_duration > 1e-9 else 0.0
-                    mapped_time = seg_start + (boundary_time - seg_start) * timing_mult
-                    if use_warp:
-                        mapped_time, _ = self._map_time_warp(
-                            mapped_time, 1.0, eight_bar_segments, segment_duration, warp_start
-                        )
-                    elif use_beat_lock:
-                        mapped_time, _ = self._map_time_beat_lock(
-                            mapped_time, 1.0, eight_bar_segments, segment_duration, beat_duration
-                        )
-                    boundary_time = mapped_time
-                pause_marker_time = max(0.0, boundary_time - 0.001)
-                heapq.heappush(
-                    event_queue,
-                    KeyEvent(pause_marker_time, 0, "pause_marker", "", 0, bar_index=bar_idx)
-                )
-
-        return event_queue, notes_scheduled, notes_dropped, notes_dropped_accidental, notes_dropped_octave_conflict
-
-    def _setup_eight_bar(self, eight_bar, speed: float):
-        """Setup 8-bar style variation parameters."""
-        eight_bar_segments: Dict[int, Tuple[float, float, float, bool]] = {}
-        segment_duration = 16.0
-        beat_duration = 0.5
-        warp_start: List[float] = []
-
-        if not eight_bar.enabled or not self.events:
-            return eight_bar_segments, segment_duration, beat_duration, warp_start
-
-        # Calculate real bar and beat duration from MIDI
-        bar_duration = 2.0
-        if self.cfg.midi_path and os.path.isfile(self.cfg.midi_path):
-            try:
-                mid_obj = mido.MidiFile(self.cfg.midi_path, clip=True)
-                bar_duration, beat_duration = calculate_bar_and_beat_duration(mid_obj)
-                self.log.emit(f"8-Bar: bar_duration={bar_duration:.3f}s, beat_duration={beat_duration:.3f}s")
-            except Exception as e:
-                self.log.emit(f"8-Bar: using defaults (error: {e})")
-
-        if speed > 1e-9:
-            bar_duration /= speed
-            beat_duration /= speed
-
-        segment_duration = bar_duration * 8
-        total_duration = max(e.time + e.duration for e in self.events)
-        num_segments = max(1, int(total_duration / segment_duration) + 1)
-
-        # Determine selection pattern
-        pattern = eight_bar.selection_pattern
-        if pattern == "continuous":
-            period, pick_mod = 1, 0
-        elif pattern == "skip3_pick1":
-            period, pick_mod = 4, 3
-        elif pattern == "skip2_pick1":
-            period, pick_mod = 3, 2
-        else:  # skip1_pick1
-            period, pick_mod = 2, 1
-
-        # Pre-generate multipliers
-        for seg_idx in range(num_segments):
-            selected = (seg_idx % period == pick_mod)
-            if selected:
-                speed_mult = random.uniform(eight_bar.speed_mult_min, eight_bar.speed_mult_max)
-                timing_mult = random.uniform(eight_bar.timing_mult_min, eight_bar.timing_mult_max)
-                duration_mult = random.uniform(eight_bar.duration_mult_min, eight_bar.duration_mult_max)
-                if eight_bar.clamp_enabled:
-                    clamp_min = min(eight_bar.clamp_min, eight_bar.clamp_max)
-                    clamp_max = max(eight_bar.clamp_min, eight_bar.clamp_max)
-                    speed_mult = max(clamp_min, min(speed_mult, clamp_max))
-                    timing_mult = max(clamp_min, min(timing_mult, clamp_max))
-                    duration_mult = max(clamp_min, min(duration_mult, clamp_max))
+            if self._output_scheduler is not None:
+                self._output_scheduler.enqueue(KeyEvent(
+                    target, 2, "press", ev.key, ev.note, bar_index=ev.bar_index, token=ev.token
+                ))
+            if fs is not None:
+                fs.noteon(chan, ev.note, self.cfg.velocity)
+            if self.cfg.strict_midi_timing:
+                active_tokens[ev.key] = ev.token
             else:
-                speed_mult, timing_mult, duration_mult = 1.0, 1.0, 1.0
-            eight_bar_segments[seg_idx] = (speed_mult, timing_mult, duration_mult, selected)
-
-        # Build warp_start array
-        warp_start = [0.0]
-        for seg_idx in range(num_segments):
-            speed_mult_i = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))[0]
-            actual_seg_duration = segment_duration / max(1e-9, speed_mult_i)
-            warp_start.append(warp_start[-1] + actual_seg_duration)
-
-        selected_count = sum(1 for v in eight_bar_segments.values() if v[3])
-        mode_str = "Tempo Warp" if eight_bar.mode == "warp" else "Beat-Lock"
-        self.log.emit(f"8-Bar {mode_str}: {selected_count}/{num_segments} segments selected ({pattern})")
-
-        return eight_bar_segments, segment_duration, beat_duration, warp_start
-
-    def _get_section_multipliers(self, orig_time: float, eight_bar_segments: Dict, segment_duration: float) -> Tuple[float, float, float, bool]:
-        """Get multipliers for the segment at orig_time."""
-        if not eight_bar_segments:
-            return (1.0, 1.0, 1.0, False)
-        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
-        return eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))
-
-    def _map_time_warp(self, orig_time: float, base_speed: float, eight_bar_segments: Dict, segment_duration: float, warp_start: List[float]) -> Tuple[float, float]:
-        """Tempo Warp time mapping."""
-        if not eight_bar_segments or not warp_start:
-            return (orig_time / max(1e-9, base_speed), base_speed)
-
-        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
-        seg_idx = min(seg_idx, len(warp_start) - 2)
-
-        speed_mult = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))[0]
-        effective_speed = base_speed * speed_mult
-
-        seg_start_orig = seg_idx * segment_duration
-        offset_in_seg = orig_time - seg_start_orig
-        mapped_offset = offset_in_seg / max(1e-9, speed_mult)
-        mapped_time = (warp_start[seg_idx] + mapped_offset) / max(1e-9, base_speed)
-
-        return (mapped_time, effective_speed)
-
-    def _map_time_beat_lock(self, orig_time: float, base_speed: float, eight_bar_segments: Dict, segment_duration: float, beat_duration: float) -> Tuple[float, float]:
-        """Beat-Lock time mapping."""
-        if not eight_bar_segments or beat_duration <= 1e-9:
-            return (orig_time / max(1e-9, base_speed), base_speed)
-
-        seg_idx = int(orig_time / segment_duration) if segment_duration > 1e-9 else 0
-
-        speed_mult, timing_mult, _, _ = eight_bar_segments.get(seg_idx, (1.0, 1.0, 1.0, False))
-        effective_speed = base_speed * speed_mult
-
-        seg_start_orig = seg_idx * segment_duration
-        offset_in_seg = orig_time - seg_start_orig
-
-        beat_index = int(offset_in_seg / beat_duration)
-        frac_in_beat = offset_in_seg - (beat_index * beat_duration)
-        scaled_frac = frac_in_beat * timing_mult
-
-        mapped_offset = (beat_index * beat_duration) + scaled_frac
-        mapped_time = (seg_start_orig + mapped_offset) / max(1e-9, base_speed * speed_mult)
+                pressed_keys[ev.key] = pressed_keys.get(ev.key, 0) + 1
+
+        next_event = plan.peek()
+        if next_event is not None and next_event.event_type != "pause_marker":
+            self._current_bar = next_event.bar_index
+        self.log.emit(
+            f"Seek to {target:.2f}s ({plan.remaining()} events ahead, {len(sounding)} held) "
+            f"in {(time.perf_counter() - t0) * 1000:.1f}ms"
+        )
 
-        return (mapped_time, effective_speed)
+    def _run_playback_loop(self, plan: PlaybackPlan, pressed_keys: Dict[str, int], note_to_key: Dict[int, str], fs, chan: int, playback_start_time: float) -> int:
+        """Run the main playback loop.
 
-    def _run_playback_loop(self, event_queue: List[KeyEvent], pressed_keys: Dict[str, int], note_to_key: Dict[int, str], fs, chan: int, playback_start_time: float) -> int:
-        """Run the main playback loop."""
-        error_cfg = self.cfg.error_config
-        bar_duration = 2.0
-        group_duration = bar_duration * 8
-        current_bar_group = -1
-        errors_for_group: List[Tuple[str, float]] = []
-        error_index = 0
+        `fs` is the AudioWorker (or None): synth calls only queue a command,
+        the audio thread performs them.
+        """
         errors_applied = 0
-        speed = max(1e-9, self.cfg.speed)
         use_token_release = self.cfg.strict_midi_timing
         active_tokens: Dict[str, int] = {}
+        token_keys: Dict[int, Tuple[str, int]] = {}  # Press token -> (key, note) in a switched octave
+
+        control = self._control  # Clock started at playback_start_time (shared with scheduler)
+        seek_requested = lambda: self._seek_request is not None
+        watchdog = self._watchdog
+        gc_guard = self._gc_guard
+        scheduler = self._output_scheduler
+        governor = self._governor
+        loop: Optional[LoopSlice] = None
+        loop_pass = 0
+        loop_tempo = control.tempo  # Tempo before the loop's speed-up passes
+
+        while not control.is_stopped():
+            if self._octave_changed:
+                # New key table: silence what the old octave holds; later presses use the new one
+                self._octave_changed = False
+                if scheduler is not None:
+                    scheduler.clear_queue()
+                self._release_all_pressed(pressed_keys, fs, chan, reason="Octave")
+                active_tokens.clear()
+                token_keys.clear()
+                self.log.emit(f"[Octave] {self._octave_shift:+d} @ t={control.now():.3f}s")
+            if self._patch_requests:
+                self._splice_patches(plan)
+                loop = self._resolve_loop(plan)  # Indices moved
+                if gc_guard is not None:
+                    scheduler.set_horizon(plan.peek().time if plan else float("inf"))
+            if self._seek_request is not None:
+                self._apply_seek(plan, pressed_keys, active_tokens, token_keys, fs, chan)
+                if governor is not None:
+                    governor.reset()
+                if gc_guard is not None:
+                    scheduler.set_horizon(plan.peek().time if plan else float("inf"))
+            if self._loop_changed:
+                self._loop_changed = False
+                if loop_pass > 0 and control.tempo != loop_tempo:
+                    control.set_tempo(loop_tempo)  # Speed-up only lasts while looping
+                loop = self._resolve_loop(plan)
+                loop_pass = 0
+                loop_tempo = control.tempo
+                if loop is not None:
+                    self.log.emit(f"[Loop] {loop.start:.3f}s-{loop.end:.3f}s ({loop.end_index - loop.start_index} events)")
+            if loop is not None and plan.cursor >= loop.end_index:
+                # Let the last bar ring out to the loop end, then rewind
+                if control.is_paused():
+                    if not control.wait_resumed(interrupt=seek_requested):
+                        break
+                    continue
+                if not control.wait_until(loop.end, interrupt=seek_requested):
+                    continue
+                self._loop_rewind(plan, loop, loop_pass, pressed_keys, active_tokens, token_keys, fs, chan)
+                loop_pass += 1
+                if governor is not None:
+                    governor.reset()
+                if gc_guard is not None:
+                    scheduler.set_horizon(plan.peek().time if plan else float("inf"))
+                continue
+            if not plan:
+                song = self._take_song()
+                if song is not None:
+                    self._start_next_song(plan, song, pressed_keys, active_tokens, token_keys, fs, chan)
+                    if governor is not None:
+                        governor.reset()
+                    if gc_guard is not None:
+                        scheduler.set_horizon(plan.peek().time if plan else float("inf"))
+                    continue
+                if not self._playlist_open:
+                    break
+                # Next song still compiling (shorter than its compile time): wait for it
+                control.wait_interval(SONG_WAIT_S, until=lambda: bool(self._song_queue) or not self._playlist_open or seek_requested())
+                continue
 
-        if error_cfg.enabled:
-            self.log.emit(f"Error simulation: ON ({error_cfg.errors_per_8bars}/8bars)")
-
-        start = playback_start_time  # Use synchronized start time for scheduler alignment
-
-        while event_queue and not self._stop:
-            # Handle pause state
-            while self._paused and not self._stop:
-                time.sleep(0.05)
-
-            if self._stop:
-                break
+            # Handle pause state (resume/stop/seek wake us immediately)
+            if control.is_paused():
+                if not control.wait_resumed(interrupt=seek_requested):
+                    break
+                continue
 
-            next_event = event_queue[0]
+            next_event = plan.peek()
             target_time = next_event.time
 
-            # Wait until event time
-            now = time.perf_counter() - start - self._total_pause_time
-
-            # Emit progress (throttled to ~10 times/sec)
-            if now - self._last_progress_emit >= 0.1:
-                self.progress.emit(now, self._total_duration)
-                self._last_progress_emit = now
-
-            dt = target_time - now
-            while dt > 0 and not self._stop:
-                if self._paused:
-                    break
-                time.sleep(min(dt, 0.02))
-                now = time.perf_counter() - start - self._total_pause_time
-                # Emit progress at ~10Hz for smooth playhead updates
-                if now - self._last_progress_emit >= 0.1:
-                    self.progress.emit(now, self._total_duration)
-                    self._last_progress_emit = now
-                dt = target_time - now
-
-            if self._paused:
+            # Wait until event time; pause/stop/seek interrupt the wait immediately
+            if watchdog is not None:
+                watchdog.arm("dispatcher", target_time, f"{next_event.event_type} @ bar {next_event.bar_index}")
+            if not control.wait_until(target_time, interrupt=seek_requested):
+                if watchdog is not None:
+                    watchdog.disarm("dispatcher")
                 continue
 
-            if self._stop:
-                break
+            dt = target_time - control.now()
 
             # Timing instrumentation: detect lag (when we're behind schedule)
-            lag_ms = -dt * 1000  # positive when behind schedule
+            lag_ms = -dt * 1000 / control.rate  # positive when behind schedule (real ms)
+            if governor is not None:
+                governor.observe("dispatcher", target_time, lag_ms)
             if lag_ms > 50:  # Log if >50ms behind
-                self.log.emit(f"[Lag] {lag_ms:.1f}ms behind @ t={target_time:.3f}s, queue={len(event_queue)}")
+                self.log.emit(f"[Lag] {lag_ms:.1f}ms behind @ t={target_time:.3f}s, queue={plan.remaining()}")
 
             # Process all events at this time
             eps = 0.001
@@ -1113,19 +1406,20 @@ class PlayerThread(QThread):
             paused_now = False
             batch_start = time.perf_counter()
             batch_count = 0
-            # Deferred synth calls - prioritize key injection over audio
-            deferred_noteon = []   # [(note, velocity), ...]
-            deferred_noteoff = []  # [note, ...]
-            while event_queue and not self._stop:
-                next_event = event_queue[0]
+            while plan and not control.is_stopped():
+                next_event = plan.peek()
                 if next_event.time > target_time + eps:
                     break
+                if loop is not None and plan.cursor >= loop.end_index:
+                    break  # A-B loop end: rewind first
 
-                heapq.heappop(event_queue)
+                plan.pop()
                 processed_bar = next_event.bar_index
                 batch_count += 1
 
                 if next_event.event_type == "pause_marker":
+                    if gc_guard is not None:
+                        gc_guard.bar_boundary()
                     # Check if auto-pause should trigger at this bar
                     should_auto_pause = (
                         self.cfg.pause_every_bars > 0 and
@@ -1143,173 +1437,89 @@ class PlayerThread(QThread):
                         self._do_pause()
                         self.auto_pause_at_bar.emit(next_event.bar_index)
                         paused_now = True
+                        if gc_guard is not None:
+                            gc_guard.collect_full()  # Nothing is due while paused
 
                         if should_auto_pause:
                             # Auto-pause countdown (倒计时结束自动继续，F5可提前跳过)
                             countdown_interrupted = False
                             for remaining in range(self.cfg.auto_resume_countdown, 0, -1):
-                                if self._stop:
+                                if control.is_stopped():
                                     break
-                                if not self._paused:  # User pressed F5 to skip
+                                if not control.is_paused():  # User pressed F5 to skip
                                     self.countdown_tick.emit(0)  # Clear countdown UI
                                     countdown_interrupted = True
                                     break
                                 self.countdown_tick.emit(remaining)
-                                time.sleep(1.0)
+                                # Resume (F5) or stop ends the wait immediately
+                                control.wait_interval(1.0, until=lambda: not control.is_paused())
 
+                            if not control.is_paused() and not control.is_stopped() and not countdown_interrupted:
+                                self.countdown_tick.emit(0)  # Skipped on the last tick
                             # Auto-resume after countdown (if still paused and not interrupted)
-                            if self._paused and not self._stop and not countdown_interrupted:
+                            if control.is_paused() and not control.is_stopped() and not countdown_interrupted:
                                 self.countdown_tick.emit(0)
                                 self.resume()  # 自动继续
 
                         break
                     continue
 
+                if next_event.event_type == "error_marker":
+                    # Simulated error (compiled into the plan ahead of time)
+                    errors_applied += 1
+                    if next_event.token < len(self._applied_errors):
+                        self.log.emit(f"[Error] {self._applied_errors[next_event.token].describe()}")
+                    continue
+
                 if next_event.event_type == "press":
+                    if self.time_to_first_note_ms is None:
+                        self._report_first_note(next_event.time)
+                    next_event = self._map_press(next_event, token_keys)
+                    if next_event is None:
+                        continue  # No key for this pitch in the current octave
                     key = next_event.key
                     note = next_event.note
-                    skip_note = False
-                    extra_key = None
-                    extra_note = None
-                    wrong_note_applied = False
-
-                    # Error simulation
-                    if error_cfg.enabled:
-                        event_time = next_event.time
-                        new_bar_group = int(event_time / group_duration)
-
-                        if new_bar_group != current_bar_group:
-                            current_bar_group = new_bar_group
-                            errors_for_group = plan_errors_for_group(error_cfg)
-                            error_index = 0
-
-                        if error_index < len(errors_for_group):
-                            group_start = current_bar_group * group_duration
-                            event_pos_in_group = (event_time - group_start) / group_duration
-
-                            error_type, error_pos = errors_for_group[error_index]
-                            if event_pos_in_group >= error_pos:
-                                error_index += 1
-                                errors_applied += 1
-
-                                if error_type == "wrong_note":
-                                    offset = random.choice([-1, 1])
-                                    new_note = note + offset
-                                    if new_note in note_to_key:
-                                        key = note_to_key[new_note]
-                                        note = new_note
-                                        wrong_note_applied = True
-                                    self.log.emit(f"[Error] Wrong note @ {event_time:.2f}s")
-
-                                elif error_type == "miss_note":
-                                    skip_note = True
-                                    self.log.emit(f"[Error] Missed note @ {event_time:.2f}s")
-
-                                elif error_type == "extra_note":
-                                    offset = random.choice([-1, 1])
-                                    extra_note_val = note + offset
-                                    if extra_note_val in note_to_key:
-                                        extra_key = note_to_key[extra_note_val]
-                                        extra_note = extra_note_val
-                                    self.log.emit(f"[Error] Extra note @ {event_time:.2f}s")
-
-                                elif error_type == "pause":
-                                    pause_ms = random.randint(error_cfg.pause_min_ms, error_cfg.pause_max_ms)
-                                    time.sleep(pause_ms / 1000.0)
-                                    self.log.emit(f"[Error] Pause {pause_ms}ms @ {event_time:.2f}s")
-
-                    if skip_note:
-                        continue
 
-                    # Press key - enqueue to scheduler for non-blocking execution with late-drop
-                    self._output_scheduler.enqueue(KeyEvent(
-                        time=next_event.time,  # Use event time for late-drop calculation
-                        priority=2,
-                        event_type="press",
-                        key=key,
-                        note=note,
-                        bar_index=next_event.bar_index
-                    ))
+                    # Press key - enqueue to scheduler for non-blocking execution with late-drop.
+                    # Plan events are scheduler-ready (event time, priority), so no per-event allocation.
+                    scheduler.enqueue(next_event)
                     if fs is not None:
-                        deferred_noteon.append((note, self.cfg.velocity))
+                        # AudioWorker: queued, returns at once; sounds at the event's own time
+                        fs.noteon(chan, note, self.cfg.velocity, at=control.wall_time(next_event.time))
                     if use_token_release:
                         active_tokens[key] = next_event.token
                     else:
                         pressed_keys[key] = pressed_keys.get(key, 0) + 1
 
-                    # Handle extra note
-                    if extra_key is not None:
-                        self._output_scheduler.enqueue(KeyEvent(
-                            time=next_event.time,  # Use event time for late-drop calculation
-                            priority=2,
-                            event_type="press",
-                            key=extra_key,
-                            note=extra_note or 0,
-                            bar_index=next_event.bar_index
-                        ))
-                        if fs is not None and extra_note is not None:
-                            deferred_noteon.append((extra_note, self.cfg.velocity))
-                        if use_token_release:
-                            active_tokens[extra_key] = 0
-                        else:
-                            pressed_keys[extra_key] = pressed_keys.get(extra_key, 0) + 1
-                        heapq.heappush(event_queue, KeyEvent(
-                            next_event.time + 0.05, 1, "release", extra_key, extra_note or 0,
-                            bar_index=next_event.bar_index
-                        ))
-
-                    # Handle wrong note release
-                    if wrong_note_applied:
-                        heapq.heappush(event_queue, KeyEvent(
-                            next_event.time + 0.08, 1, "release", key, note,
-                            bar_index=next_event.bar_index
-                        ))
-
                 elif next_event.event_type == "release":
+                    next_event = self._map_release(next_event, token_keys)
+                    if next_event is None:
+                        continue
                     key = next_event.key
                     if use_token_release:
                         if active_tokens.get(key) == next_event.token:
-                            self._output_scheduler.enqueue(KeyEvent(
-                                time=next_event.time,  # Use event time for timing alignment
-                                priority=1,
-                                event_type="release",
-                                key=key,
-                                note=next_event.note,
-                                bar_index=next_event.bar_index,
-                                token=next_event.token,
-                            ))
+                            scheduler.enqueue(next_event)
                             if fs is not None:
-                                deferred_noteoff.append(next_event.note)
+                                fs.noteoff(chan, next_event.note, at=control.wall_time(next_event.time))
                             active_tokens.pop(key, None)
                     else:
                         if key in pressed_keys:
                             pressed_keys[key] -= 1
                             if pressed_keys[key] <= 0:
-                                self._output_scheduler.enqueue(KeyEvent(
-                                    time=next_event.time,  # Use event time for timing alignment
-                                    priority=1,
-                                    event_type="release",
-                                    key=key,
-                                    note=next_event.note,
-                                    bar_index=next_event.bar_index
-                                ))
+                                scheduler.enqueue(next_event)
                                 if fs is not None:
-                                    deferred_noteoff.append(next_event.note)
+                                    fs.noteoff(chan, next_event.note, at=control.wall_time(next_event.time))
                                 pressed_keys[key] = 0
 
-            # Execute deferred synth calls after all key injections are done
-            # This prioritizes key injection (timing-critical) over audio (can tolerate latency)
-            if fs is not None:
-                for note, velocity in deferred_noteon:
-                    fs.noteon(chan, note, velocity)
-                for note in deferred_noteoff:
-                    fs.noteoff(chan, note)
-
             # Batch processing time instrumentation
             if batch_count > 0:
                 batch_elapsed_ms = (time.perf_counter() - batch_start) * 1000
                 if batch_elapsed_ms > 10 and batch_count > 2:  # Log slow batches with multiple events
                     self.log.emit(f"[Batch] {batch_count} events in {batch_elapsed_ms:.1f}ms @ t={target_time:.3f}s")
+            if watchdog is not None:
+                watchdog.disarm("dispatcher")
+            if gc_guard is not None:
+                scheduler.set_horizon(plan.peek().time if plan else float("inf"))
 
             if paused_now:
                 continue
@@ -1319,6 +1529,42 @@ class PlayerThread(QThread):
 
         return errors_applied
 
+    def _report_late_bars(self, report):
+        """Per-bar late-policy report: every bar in diagnostics mode, else bars that dropped/compressed."""
+        self.late_report = bar_report_dicts(report)
+        for stats in report:
+            if self.cfg.enable_diagnostics or stats.dropped or stats.compressed:
+                self.log.emit(f"[LateBar] {stats.describe()}")
+
+    def _enter_gc_guard(self):
+        """Performance mode: freeze + defer GC; diagnostics mode: measure GC pauses."""
+        if self.cfg.performance_mode or self.cfg.enable_diagnostics:
+            self._gc_guard = GcGuard(defer=self.cfg.performance_mode, log_fn=self.log.emit)
+            self._gc_guard.enter()
+
+    def _exit_gc_guard(self):
+        """Restore automatic GC and report pause counts/durations."""
+        if self._gc_guard is None:
+            return
+        self._gc_guard.exit()
+        self.gc_stats = self._gc_guard.stats()
+        self._gc_guard = None
+        self.log.emit(format_gc_stats(self.gc_stats))
+
+    def _report_first_note(self, event_time: float):
+        """Log time from Start to the first dispatched press, split by cause."""
+        total_ms = (time.perf_counter() - self._created_at) * 1000
+        countdown_ms = self._countdown_s * 1000
+        lead_in_ms = max(0.0, event_time - self._play_from) * 1000
+        setup_ms = max(0.0, total_ms - countdown_ms - lead_in_ms)
+        self.time_to_first_note_ms = total_ms
+        built = [name for name, hit in self._session.hits.items() if not hit]
+        warm = f"no (built {', '.join(built)})" if built else "yes"
+        self.log.emit(
+            f"Time to first note: {total_ms:.0f}ms (setup {setup_ms:.0f}ms, countdown {countdown_ms:.0f}ms, "
+            f"lead-in {lead_in_ms:.0f}ms, warm session: {warm})"
+        )
+
     def _output_diagnostics(self):
         """Output InputManager diagnostics."""
         diag = self._input_manager.get_diagnostics()
@@ -1334,6 +1580,10 @@ class PlayerThread(QThread):
             self.log.emit(f"[Input] Focus lost releases: {stats['focus_lost_releases']}")
         if stats.get('stuck_recoveries', 0) > 0:
             self.log.emit(f"[Input] Stuck key recoveries: {stats['stuck_recoveries']}")
+        if stats.get('deferred_releases', 0) > 0:
+            self.log.emit(f"[Input] Min-hold deferred releases: {stats['deferred_releases']} "
+                         f"(total={stats['deferred_total_ms']:.1f}ms, max={stats['deferred_max_ms']:.1f}ms, "
+                         f"flushed by a re-press={stats.get('deferred_flushed', 0)})")
 
         lat_dist = stats.get('latency_distribution', {})
         if lat_dist:
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Piecewise-linear time map: running time -> plan time.
+
+The compiled plan is in plan time (score time / the speed at Start). The
+playback clock measures running time (real seconds since the start, pauses
+excluded) and maps it through a TimeMap. A tempo change (speed hotkeys) or a
+governor warp appends a segment at "now" with the new rate, so the next
+deadline is evaluated at the new tempo without recompiling the plan.
+
+Usage:
+    tmap = TimeMap()
+    tmap.append(running=12.0, rate=1.1)     # 10% faster from running time 12s
+    position = tmap.position(13.0)          # 12.0 + 1.0 * 1.1
+    tmap.rebase(running=20.0, position=5.0) # Seek: drop history, keep the rate
+"""
+
+import bisect
+from typing import List, NamedTuple
+
+
+class TimeSegment(NamedTuple):
+    """One linear piece: position(r) = position + (r - running) * rate for r >= running."""
+    running: float     # Running time where the segment starts
+    position: float    # Plan time at `running`
+    rate: float        # Plan seconds per running second
+
+
+class TimeMap:
+    """
+    Monotonic piecewise-linear map from running time to plan time.
+
+    `last` is replaced as a whole on every change, so lock-free readers of
+    the current segment (PlaybackControl.now) never see a half-updated one.
+    """
+
+    def __init__(self, running: float = 0.0, position: float = 0.0, rate: float = 1.0):
+        self.last = TimeSegment(running, position, rate)
+        self._segments: List[TimeSegment] = [self.last]
+        self._starts: List[float] = [running]
+
+    @property
+    def rate(self) -> float:
+        return self.last.rate
+
+    @property
+    def segments(self) -> List[TimeSegment]:
+        return list(self._segments)
+
+    def position(self, running: float) -> float:
+        """Plan time at `running` (earlier running times use their own segment)."""
+        segment = self.last
+        if running < segment.running and len(self._segments) > 1:
+            index = max(0, bisect.bisect_right(self._starts, running) - 1)
+            segment = self._segments[index]
+        return segment.position + (running - segment.running) * segment.rate
+
+    def append(self, running: float, rate: float) -> TimeSegment:
+        """Continue the map at `running` with a new rate (position stays continuous)."""
+        segment = TimeSegment(running, self.position(running), rate)
+        if running <= self.last.running:
+            # Same instant: replace the current piece instead of adding an empty one
+            self._segments[-1] = segment
+            self._starts[-1] = running
+        else:
+            self._segments.append(segment)
+            self._starts.append(running)
+        self.last = segment
+        return segment
+
+    def rebase(self, running: float, position: float):
+        """Seek: the map restarts at (running, position) with the current rate."""
+        self.last = TimeSegment(running, position, self.last.rate)
+        self._segments = [self.last]
+        self._starts = [running]
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Stall watchdog: forensic snapshots of late dispatch deadlines.
+
+The playback loop and the output scheduler arm a deadline (playback time of
+the event they are waiting for) and disarm it once the event is handled. A
+sampler thread polls the armed deadlines; when one is overrun by more than
+the threshold it captures, while the stall is still in progress, the stacks
+of all threads (sys._current_frames), gc generation counts and the recent
+scheduler latency. If the sampler itself was starved (the stalled thread got
+the GIL back first), the snapshot is taken at disarm instead and marked as
+captured at recovery. Snapshots go into a bounded buffer that the
+diagnostics window shows and exports.
+
+Usage:
+    watchdog = StallWatchdog(control.now, threshold_ms=20)
+    watchdog.start()
+    watchdog.arm("scheduler", event.time, "press 'A'")
+    ...  # wait + execute
+    watchdog.disarm("scheduler")
+    watchdog.stop()
+    print(format_stall_report(watchdog.snapshots()))
+"""
+
+import gc
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_STALL_THRESHOLD_MS = 20.0
+DEFAULT_POLL_MS = 5.0
+DEFAULT_CAPACITY = 32
+STACK_LIMIT = 12        # Innermost frames kept per thread
+RECENT_LATENCY = 64     # Latency samples kept for context
+
+
+@dataclass
+class StallSnapshot:
+    """One overrun deadline, captured while it was overrun."""
+    wall_time: float                     # time.time() at capture
+    playback_time: float                 # Playback clock at capture (s)
+    source: str                          # "dispatcher" or "scheduler"
+    detail: str                          # What was due (e.g. "press 'A'")
+    deadline: float                      # Event time (s)
+    overrun_ms: float                    # Lateness at capture
+    threads: Dict[str, str]              # "name (ident)" -> formatted stack
+    gc_counts: Tuple[int, int, int]      # gc.get_count()
+    gc_collections: Tuple[int, ...]      # Collections per generation so far
+    recent_late_ms: List[float] = field(default_factory=list)
+    resolved_ms: Optional[float] = None  # Total lateness once the deadline was met (None = never)
+    live: bool = True                    # False: captured at recovery (sampler was starved too)
+
+    def summary(self) -> str:
+        """One-line description (log / list view)."""
+        stamp = datetime.fromtimestamp(self.wall_time).strftime("%H:%M:%S.%f")[:-3]
+        resolved = f", resolved at +{self.resolved_ms:.1f}ms" if self.resolved_ms is not None else ""
+        when = "" if self.live else " [at recovery]"
+        return (
+            f"[{stamp}] {self.source} +{self.overrun_ms:.1f}ms @ t={self.deadline:.3f}s "
+            f"({self.detail}){resolved}, gc={self.gc_counts}{when}"
+        )
+
+    def format(self) -> str:
+        """Full multi-line report of this snapshot."""
+        lines = [self.summary()]
+        lines.append(f"  gc collections per generation: {self.gc_collections}")
+        if self.recent_late_ms:
+            recent = ", ".join(f"{v:.1f}" for v in self.recent_late_ms[-16:])
+            lines.append(f"  recent scheduler latency (ms): {recent}")
+        for name, stack in self.threads.items():
+            lines.append(f"  --- {name}")
+            lines.extend("    " + line for line in stack.rstrip().splitlines())
+        return "\n".join(lines)
+
+
+def format_stall_report(snapshots: List[StallSnapshot]) -> str:
+    """Text report of all snapshots (diagnostics export)."""
+    header = f"LyreAutoPlayer stall report - {len(snapshots)} snapshot(s)"
+    return "\n\n".join([header] + [snap.format() for snap in snapshots]) + "\n"
+
+
+class StallWatchdog:
+    """
+    Sampler thread that snapshots deadlines overrun by more than a threshold.
+
+    Deadlines are in playback time (now_fn), so a paused clock never looks
+    like a stall. The overrun is also capped by the wall time since the
+    deadline was armed: a forward seek makes an armed deadline look old
+    until the loop re-arms, which must not count as a stall.
+    """
+
+    def __init__(
+        self,
+        now_fn: Callable[[], float],
+        threshold_ms: float = DEFAULT_STALL_THRESHOLD_MS,
+        poll_ms: float = DEFAULT_POLL_MS,
+        capacity: int = DEFAULT_CAPACITY,
+        log_fn: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            now_fn: Playback clock (PlaybackControl.now)
+            threshold_ms: Overrun that triggers a snapshot
+            poll_ms: Sampler interval
+            capacity: Snapshots kept (oldest dropped first)
+            log_fn: Optional logging function (one line per snapshot)
+        """
+        self._now = now_fn
+        self._threshold_s = threshold_ms / 1000.0
+        self._poll_s = poll_ms / 1000.0
+        self._log_fn = log_fn or (lambda msg: None)
+        # source -> [deadline, armed_at (perf_counter), detail, snapshot or None]
+        self._probes: Dict[str, list] = {}
+        self._capture_lock = threading.Lock()  # One snapshot per probe (sampler vs disarm)
+        self._snapshots: deque = deque(maxlen=capacity)
+        self._recent_late: deque = deque(maxlen=RECENT_LATENCY)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="StallWatchdog")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._probes.clear()
+
+    def arm(self, source: str, deadline: float, detail: str = ""):
+        """Start watching `deadline` (playback time) for `source` (replaces its previous one)."""
+        self._probes[source] = [deadline, time.perf_counter(), detail, None]
+
+    def disarm(self, source: str):
+        """The deadline was met (or abandoned); finish or take its snapshot."""
+        with self._capture_lock:
+            probe = self._probes.pop(source, None)
+            if probe is None:
+                return
+            deadline, armed_at, detail, snapshot = probe
+            now = self._now()
+            if snapshot is None:
+                overrun = min(now - deadline, time.perf_counter() - armed_at)
+                if overrun <= self._threshold_s:
+                    return
+                snapshot = self._capture(source, deadline, detail, overrun, now, live=False)
+            snapshot.resolved_ms = (now - deadline) * 1000
+
+    def disarm_all(self):
+        for source in list(self._probes):
+            self.disarm(source)
+
+    def note_latency(self, late_ms: float):
+        """Record one scheduler latency sample (context for snapshots)."""
+        self._recent_late.append(late_ms)
+
+    def snapshots(self) -> List[StallSnapshot]:
+        return list(self._snapshots)
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def _run(self):
+        while not self._stop_event.wait(self._poll_s):
+            if not self._probes:
+                continue
+            now = self._now()
+            wall = time.perf_counter()
+            for source, probe in list(self._probes.items()):
+                deadline, armed_at, detail, captured = probe
+                if captured is not None:
+                    continue
+                overrun = min(now - deadline, wall - armed_at)
+                if overrun > self._threshold_s:
+                    with self._capture_lock:
+                        if self._probes.get(source) is probe and probe[3] is None:
+                            probe[3] = self._capture(source, deadline, detail, overrun, now)
+
+    def _capture(self, source: str, deadline: float, detail: str, overrun: float,
+                 now: float, live: bool = True) -> StallSnapshot:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own = threading.get_ident()
+        threads = {}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+            threads[f"{names.get(ident, '?')} ({ident})"] = stack
+        snapshot = StallSnapshot(
+            wall_time=time.time(),
+            playback_time=now,
+            source=source,
+            detail=detail,
+            deadline=deadline,
+            overrun_ms=overrun * 1000,
+            threads=threads,
+            gc_counts=gc.get_count(),
+            gc_collections=tuple(s["collections"] for s in gc.get_stats()),
+            recent_late_ms=list(self._recent_late),
+            live=live,
+        )
+        self._snapshots.append(snapshot)
+        self._log_fn(f"[Stall] {snapshot.summary()}")
+        return snapshot
+
+
+# ============== Self-test ==============
+
+def self_test():
+    """Self-test: a thread hogging the GIL past a deadline is captured in the snapshot."""
+    print("=== StallWatchdog Self-Test ===\n")
+
+    t0 = time.perf_counter()
+    now = lambda: time.perf_counter() - t0
+    watchdog = StallWatchdog(now, threshold_ms=20, log_fn=print)
+    watchdog.start()
+
+    def busy_hog():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    hog = threading.Thread(target=busy_hog, name="Hog")
+    watchdog.arm("dispatcher", now(), "press 'A'")
+    hog.start()
+    hog.join()
+    watchdog.disarm("dispatcher")
+
+    # A met deadline is never captured
+    watchdog.arm("scheduler", now() + 0.05, "press 'S'")
+    time.sleep(0.06)
+    watchdog.disarm("scheduler")
+    watchdog.stop()
+
+    snaps = watchdog.snapshots()
+    assert len(snaps) == 1, snaps
+    snap = snaps[0]
+    assert snap.source == "dispatcher"
+    assert snap.resolved_ms is not None and snap.resolved_ms >= snap.overrun_ms
+    assert any(name.startswith("Hog") for name in snap.threads), snap.threads.keys()
+    print(format_stall_report(snaps))
+    print("OK")
+
+
+if __name__ == "__main__":
+    self_test()
@@ -5,6 +5,7 @@ UI module for LyreAutoPlayer.
 Contains:
 - floating: FloatingController for always-on-top control panel
 - diagnostics_window: DiagnosticsWindow for input diagnostics
+- playhead: PlayheadFollower (smooth playhead from the playback clock)
 - main_window: MainWindow main application window
 - constants: UI-related constants (ROOT_CHOICES, etc.)
 - editor: MIDI Editor (EditorWindow)
@@ -12,12 +13,14 @@ Contains:
 
 from .floating import FloatingController
 from .diagnostics_window import DiagnosticsWindow
+from .playhead import PlayheadFollower
 from .constants import ROOT_CHOICES
 from .editor import EditorWindow
 
 __all__ = [
     'FloatingController',
     'DiagnosticsWindow',
+    'PlayheadFollower',
     'ROOT_CHOICES',
     'EditorWindow',
 ]
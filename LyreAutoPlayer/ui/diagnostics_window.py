@@ -8,6 +8,7 @@ Features:
 - Filter modes: All keys / Non-F keys / Non-function keys
 - Copy support and auto-scroll
 - Clear on stop button
+- Stall snapshots (thread stacks of late deadlines) with report export
 """
 
 from datetime import datetime
@@ -16,12 +17,13 @@ from enum import Enum
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QComboBox,
-    QPushButton, QLabel, QCheckBox, QGroupBox
+    QPushButton, QLabel, QCheckBox, QGroupBox, QFileDialog
 )
 from PyQt6.QtCore import pyqtSignal, Qt
 from PyQt6.QtGui import QTextCursor, QFont
 
 from i18n import tr
+from player.watchdog import StallSnapshot, format_stall_report
 
 if TYPE_CHECKING:
     from main import MainWindow
@@ -66,6 +68,7 @@ class DiagnosticsWindow(QWidget):
         self._filter_mode = FilterMode.ALL
         self._auto_scroll = True
         self._max_lines = 1000  # Limit log lines to prevent memory issues
+        self._stall_snapshots: List[StallSnapshot] = []
 
         self._init_ui()
         self._connect_signals()
@@ -126,6 +129,24 @@ class DiagnosticsWindow(QWidget):
 
         layout.addLayout(btn_layout)
 
+        # Stall snapshots (filled when playback ends)
+        self.grp_stalls = QGroupBox(tr("diag_stalls", self.lang))
+        stall_layout = QVBoxLayout(self.grp_stalls)
+        self.txt_stalls = QTextEdit()
+        self.txt_stalls.setReadOnly(True)
+        self.txt_stalls.setFont(QFont("Consolas", 9))
+        self.txt_stalls.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+        stall_layout.addWidget(self.txt_stalls)
+        stall_btn_layout = QHBoxLayout()
+        self.lbl_stalls = QLabel(tr("diag_stalls_none", self.lang))
+        self.btn_export_stalls = QPushButton(tr("diag_stalls_export", self.lang))
+        self.btn_export_stalls.setEnabled(False)
+        stall_btn_layout.addWidget(self.lbl_stalls)
+        stall_btn_layout.addStretch()
+        stall_btn_layout.addWidget(self.btn_export_stalls)
+        stall_layout.addLayout(stall_btn_layout)
+        layout.addWidget(self.grp_stalls)
+
         # Status bar
         self.lbl_status = QLabel(tr("diag_status_ready", self.lang))
         layout.addWidget(self.lbl_status)
@@ -137,6 +158,7 @@ class DiagnosticsWindow(QWidget):
         self.btn_clear.clicked.connect(self.clear_log)
         self.btn_copy.clicked.connect(self._copy_to_clipboard)
         self.sig_log_key.connect(self._on_log_key)
+        self.btn_export_stalls.clicked.connect(self._export_stall_report)
 
     def _on_filter_changed(self, index: int):
         """Handle filter mode change."""
@@ -243,6 +265,36 @@ class DiagnosticsWindow(QWidget):
         if self.chk_clear_on_stop.isChecked():
             self.clear_log()
 
+    def set_stall_snapshots(self, snapshots: List[StallSnapshot]):
+        """Show the stall watchdog snapshots of the last playback."""
+        self._stall_snapshots = list(snapshots)
+        self.txt_stalls.setPlainText("\n\n".join(snap.format() for snap in self._stall_snapshots))
+        self.btn_export_stalls.setEnabled(bool(self._stall_snapshots))
+        self._update_stall_label()
+
+    def _update_stall_label(self):
+        if self._stall_snapshots:
+            self.lbl_stalls.setText(tr("diag_stalls_count", self.lang).format(count=len(self._stall_snapshots)))
+        else:
+            self.lbl_stalls.setText(tr("diag_stalls_none", self.lang))
+
+    def _export_stall_report(self):
+        """Save the stall snapshots as a text report."""
+        if not self._stall_snapshots:
+            return
+        default_name = datetime.now().strftime("stall_report_%Y%m%d_%H%M%S.txt")
+        path, _ = QFileDialog.getSaveFileName(
+            self, tr("diag_stalls_export", self.lang), default_name, "Text (*.txt)"
+        )
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(format_stall_report(self._stall_snapshots))
+            self.lbl_status.setText(tr("diag_stalls_saved", self.lang).format(path=path))
+        except OSError as e:
+            self.lbl_status.setText(str(e))
+
     def _copy_to_clipboard(self):
         """Copy log content to clipboard."""
         from PyQt6.QtWidgets import QApplication
@@ -260,6 +312,9 @@ class DiagnosticsWindow(QWidget):
         self.btn_clear.setText(tr("diag_clear", lang))
         self.btn_copy.setText(tr("diag_copy", lang))
         self.chk_clear_on_stop.setText(tr("diag_clear_on_stop", lang))
+        self.grp_stalls.setTitle(tr("diag_stalls", lang))
+        self.btn_export_stalls.setText(tr("diag_stalls_export", lang))
+        self._update_stall_label()
 
         # Update filter combo items
         current_filter = self._filter_mode
@@ -39,6 +39,7 @@ from .key_list_widget import KeyListWidget
 from .undo_commands import ApplyJitterCommand
 from i18n import tr, LANG_ZH
 from style_manager import get_style_names, INPUT_STYLES
+from player.audio import AudioWorker
 
 
 class EditorWindow(QMainWindow):
@@ -54,6 +55,9 @@ class EditorWindow(QMainWindow):
     # Signal: emitted when audio checkbox changes (for main window sync)
     audio_changed = pyqtSignal(bool)
 
+    # Signal: emitted when "Export Audio" is chosen (main window renders the plan offline)
+    export_audio_requested = pyqtSignal()
+
     # 编辑风格选项
     EDIT_STYLES = ["custom", "simplified", "transposed", "extended", "practice"]
 
@@ -73,7 +77,7 @@ class EditorWindow(QMainWindow):
         self.edit_style = "custom"  # 编辑风格标签
 
         # FluidSynth 相关
-        self._fs = None  # fluidsynth.Synth instance
+        self._fs = None  # AudioWorker (owns the fluidsynth.Synth; calls never block the GUI thread)
         self._sfid = -1  # SoundFont ID
         self._chan = 0   # MIDI channel
         self._active_notes: Dict[int, int] = {}  # 音符 -> 发声计数
@@ -180,6 +184,11 @@ class EditorWindow(QMainWindow):
         self.act_save_as.setShortcut("Ctrl+Shift+S")
         toolbar.addAction(self.act_save_as)
 
+        # 导出音频 (离线渲染)
+        self.act_export_audio = QAction("Export Audio...", self)
+        self.act_export_audio.setToolTip("Render the compiled performance to WAV/FLAC (no audio device needed)")
+        toolbar.addAction(self.act_export_audio)
+
         toolbar.addSeparator()
 
         # 播放/暂停
@@ -475,6 +484,7 @@ class EditorWindow(QMainWindow):
         self.act_open.triggered.connect(self.on_open)
         self.act_save.triggered.connect(self.on_save)
         self.act_save_as.triggered.connect(self.on_save_as)
+        self.act_export_audio.triggered.connect(self.export_audio_requested.emit)
         self.act_play.triggered.connect(self.on_play_pause)
         self.act_stop.triggered.connect(self.on_stop)
 
@@ -1697,6 +1707,11 @@ class EditorWindow(QMainWindow):
 
     def on_seek(self, time_sec: float):
         """跳转到指定时间"""
+        # 跟随模式: 直接让正在运行的 PlayerThread 跳转 (不重建线程)
+        if self._follow_mode and self._main_window is not None:
+            thread = getattr(self._main_window, "thread", None)
+            if thread is not None and thread.isRunning():
+                thread.seek(time_sec)
         self.playback_time = time_sec
         self.piano_roll.set_playhead_position(time_sec)
         self.timeline.set_playhead(time_sec)
@@ -1919,7 +1934,9 @@ class EditorWindow(QMainWindow):
 
             fs.program_select(self._chan, sfid, 0, instrument)  # Use main's instrument
 
-            self._fs = fs
+            # noteon/noteoff from the GUI timer are handed to the audio thread
+            self._fs = AudioWorker(fs, owns_synth=True)
+            self._fs.start()
             self._sfid = sfid
             return True
 
@@ -2313,7 +2330,7 @@ class EditorWindow(QMainWindow):
             self.cmb_input_style.setCurrentText("mechanical")
 
     def on_external_progress(self, current_time: float, total_duration: float):
-        """Called by PlayerThread.progress signal.
+        """Called by the PlayheadFollower (~60 FPS, GUI thread).
 
         Updates playhead position in the editor without playing audio.
         """
@@ -103,6 +103,21 @@ class ConfigMixin:
             # Late-drop policy for output scheduler
             late_drop_ms=self.sp_late_drop_ms.value() if hasattr(self, 'sp_late_drop_ms') else 25.0,
             enable_late_drop=hasattr(self, 'chk_late_drop') and self.chk_late_drop.isChecked(),
+            late_policy=self.cmb_late_policy.currentData() if hasattr(self, 'cmb_late_policy') else "drop",
+            adaptive_late_drop=not hasattr(self, 'chk_late_adaptive') or self.chk_late_adaptive.isChecked(),
+            speed_governor=hasattr(self, 'chk_speed_governor') and self.chk_speed_governor.isChecked(),
+            governor_min_rate=self.sp_governor_min_rate.value() / 100.0 if hasattr(self, 'sp_governor_min_rate') else 0.8,
+            # A-B loop (UI bars are 1-based); strict mode keeps 1.0x
+            loop_enabled=self.chk_loop.isChecked(),
+            loop_start_bar=self.sp_loop_start.value() - 1,
+            loop_end_bar=self.sp_loop_end.value() - 1,
+            loop_speedup_pct=0.0 if strict_mode else float(self.sp_loop_speedup.value()),
+            # Playlist (songs after the loaded one)
+            playlist=list(self.playlist),
+            playlist_gap_s=self.sp_playlist_gap.value(),
+            # Key injection process / GC performance mode (settings.json only)
+            dispatch_process=getattr(self, '_dispatch_process', False),
+            performance_mode=getattr(self, '_performance_mode', False),
         )
 
     def _collect_eight_bar_style(self: "MainWindow") -> EightBarStyle:
@@ -246,6 +261,30 @@ class ConfigMixin:
                         self.cmb_preset.setCurrentIndex(i)
                         break
 
+            # Apply A-B loop
+            if "ab_loop" in settings:
+                loop = settings["ab_loop"]
+                if "enabled" in loop:
+                    self.chk_loop.setChecked(bool(loop["enabled"]))
+                if "start_bar" in loop:
+                    self.sp_loop_start.setValue(int(loop["start_bar"]))
+                if "end_bar" in loop:
+                    self.sp_loop_end.setValue(int(loop["end_bar"]))
+                if "speedup_pct" in loop:
+                    self.sp_loop_speedup.setValue(int(loop["speedup_pct"]))
+
+            # Apply playlist (missing files are dropped)
+            if "playlist" in settings:
+                playlist = settings["playlist"]
+                if "paths" in playlist:
+                    self._set_playlist([p for p in playlist["paths"] if os.path.isfile(p)])
+                if "gap_s" in playlist:
+                    self.sp_playlist_gap.setValue(float(playlist["gap_s"]))
+
+            # LAN sync leader address (the mode always starts Off)
+            if "lan_sync_leader" in settings:
+                self.txt_lan_leader.setText(settings["lan_sync_leader"])
+
             # Apply checkboxes
             if "use_midi_duration" in settings:
                 self.chk_midi_duration.setChecked(settings["use_midi_duration"])
@@ -287,6 +326,14 @@ class ConfigMixin:
             if "input_manager" in settings:
                 self._input_manager_params = settings["input_manager"]
 
+            # Apply dispatcher process mode
+            if "dispatch_process" in settings:
+                self._dispatch_process = bool(settings["dispatch_process"])
+
+            # Apply GC performance mode
+            if "performance_mode" in settings:
+                self._performance_mode = bool(settings["performance_mode"])
+
             # Apply error_config (feature removed from main GUI - just store internal state)
             if "error_config" in settings:
                 ec = settings["error_config"]
@@ -318,6 +365,16 @@ class ConfigMixin:
                     self.chk_late_drop.setChecked(smc["enable_late_drop"])
                 if "late_drop_ms" in smc and hasattr(self, 'sp_late_drop_ms'):
                     self.sp_late_drop_ms.setValue(smc["late_drop_ms"])
+                if "late_policy" in smc and hasattr(self, 'cmb_late_policy'):
+                    idx = self.cmb_late_policy.findData(smc["late_policy"])
+                    if idx >= 0:
+                        self.cmb_late_policy.setCurrentIndex(idx)
+                if "adaptive_late_drop" in smc and hasattr(self, 'chk_late_adaptive'):
+                    self.chk_late_adaptive.setChecked(smc["adaptive_late_drop"])
+                if "speed_governor" in smc and hasattr(self, 'chk_speed_governor'):
+                    self.chk_speed_governor.setChecked(smc["speed_governor"])
+                if "governor_min_rate" in smc and hasattr(self, 'sp_governor_min_rate'):
+                    self.sp_governor_min_rate.setValue(round(smc["governor_min_rate"] * 100))
 
             # Unconditionally sync diagnostics state after loading
             self._sync_diagnostics_state()
@@ -1,12 +1,22 @@
 # ui/mixins/playback_mixin.py
 # PlaybackMixin - Playback control methods
 
+import os
+import threading
 from typing import TYPE_CHECKING
 
-from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtCore import QSettings
+from PyQt6.QtWidgets import QMessageBox, QFileDialog
+
+from core import SETTINGS_MIDI_DIR
 
 from player import PlayerThread
+from player.lan_sync import SyncLeader, SyncFollower, DEFAULT_PORT
+from player.midi_input import MidiPassthrough, list_midi_inputs, open_midi_input
+from input_manager import create_input_manager
 from player.midi_parser import NoteEvent
+from player.render_thread import RenderThread
+from ui.playhead import PlayheadFollower
 from i18n import tr
 
 if TYPE_CHECKING:
@@ -24,52 +34,33 @@ class PlaybackMixin:
         if self.thread and self.thread.isRunning():
             return
 
-        cfg = self.collect_cfg()
-
-        # Unified Playback: Get events from editor if available
-        events_to_use = self.events
+        events_to_use, cfg = self._collect_playback_input()
+        self._apply_lan_sync(cfg)
         editor = getattr(self, 'editor_window', None)
         if editor is not None and editor.isVisible():
-            # Export events from editor (syncs drag offsets)
-            editor_events = editor.export_events()
-            if editor_events:
-                # Convert dict to NoteEvent objects
-                events_to_use = [
-                    NoteEvent(time=ev["time"], note=ev["note"], duration=ev["duration"])
-                    for ev in editor_events
-                ]
-                self.append_log(f"Using {len(events_to_use)} events from editor")
-
-            # Use editor BPM for bar duration calculation
-            cfg.bar_duration_override = editor.get_bar_duration()
-            cfg.editor_bpm = editor.sp_bpm.value() if hasattr(editor, 'sp_bpm') else 0
-
-            # Pass variable bar boundaries for pause marker sync
-            if hasattr(editor, 'get_bar_boundaries'):
-                cfg.bar_boundaries_sec = editor.get_bar_boundaries()
-
-            # Use editor's pause, octave, and input style settings
-            cfg.pause_every_bars = editor.get_pause_bars()
-            cfg.auto_resume_countdown = editor.get_auto_resume_countdown()
-            # Editor octave shift already transposes note data; avoid double shift.
-            cfg.octave_shift = 0
-            cfg.input_style = editor.get_input_style()
-
-            if cfg.strict_mode or cfg.strict_midi_timing:
-                cfg.input_style = "mechanical"
-
             # Start playback at editor playhead (absolute time in seconds).
             cfg.start_at_time = max(0.0, float(editor.playback_time))
             if cfg.start_at_time > 0:
                 self.append_log(f"Start at editor playhead: {cfg.start_at_time:.2f}s")
+                # Resume with the previous seed so the humanized bars match the earlier run
+                if self.thread is not None:
+                    cfg.humanize_seed = self.thread.get_seed()
 
-        self.thread = PlayerThread(events_to_use, cfg)
+        self.thread = PlayerThread(events_to_use, cfg, session=self.playback_session)
         self.thread.log.connect(self.append_log)
         self.thread.finished.connect(self.on_finished)
         self.thread.paused.connect(self._on_thread_paused)
         self.thread.resumed.connect(self._on_thread_resumed)
-        self.thread.progress.connect(self._on_progress_update)
         self.thread.playback_key.connect(self._on_playback_key)
+        self.thread.song_changed.connect(self._on_song_changed)
+
+        # Playhead: GUI-side timer interpolates the thread's published clock (no progress signals)
+        if self._playhead is not None:
+            # Drop the previous run's follower (its timer and editor connections go with it)
+            self._playhead.stop()
+            self._playhead.deleteLater()
+        self._playhead = PlayheadFollower(self.thread.clock_snapshot, parent=self)
+        self._playhead.position_changed.connect(self._on_progress_update)
 
         # Connect countdown signals
         self.thread.countdown_tick.connect(self._on_countdown_tick)
@@ -77,7 +68,7 @@ class PlaybackMixin:
 
         # Connect to EditorWindow if open
         if editor is not None and editor.isVisible():
-            self.thread.progress.connect(editor.on_external_progress)
+            self._playhead.position_changed.connect(editor.on_external_progress)
             self.thread.paused.connect(editor.on_external_paused)
             self.thread.resumed.connect(editor.on_external_resumed)
             self.thread.finished.connect(editor.on_external_stopped)
@@ -92,12 +83,93 @@ class PlaybackMixin:
             self.floating_controller.update_playback_state(True)
         self.append_log(tr("starting", self.lang))
         self.thread.start()
+        self._playhead.start()
+
+    def _collect_playback_input(self: "MainWindow"):
+        """Events + PlayerConfig for playback/export (editor notes and settings when it is open)."""
+        cfg = self.collect_cfg()
+
+        # Unified Playback: Get events from editor if available
+        events_to_use = self.events
+        editor = getattr(self, 'editor_window', None)
+        if editor is not None and editor.isVisible():
+            # Export events from editor (syncs drag offsets)
+            editor_events = self._editor_note_events(editor)
+            if editor_events:
+                events_to_use = editor_events
+                self.append_log(f"Using {len(events_to_use)} events from editor")
+
+            # Use editor BPM for bar duration calculation
+            cfg.bar_duration_override = editor.get_bar_duration()
+            cfg.editor_bpm = editor.sp_bpm.value() if hasattr(editor, 'sp_bpm') else 0
+
+            # Pass variable bar boundaries for pause marker sync
+            if hasattr(editor, 'get_bar_boundaries'):
+                cfg.bar_boundaries_sec = editor.get_bar_boundaries()
+
+            # Use editor's pause, octave, and input style settings
+            cfg.pause_every_bars = editor.get_pause_bars()
+            cfg.auto_resume_countdown = editor.get_auto_resume_countdown()
+            # Editor octave shift already transposes note data; avoid double shift.
+            cfg.octave_shift = 0
+            cfg.input_style = editor.get_input_style()
+
+            if cfg.strict_mode or cfg.strict_midi_timing:
+                cfg.input_style = "mechanical"
+
+        return events_to_use, cfg
+
+    @staticmethod
+    def _editor_note_events(editor) -> list:
+        """Editor notes as NoteEvent objects (time-sorted)."""
+        return [
+            NoteEvent(time=ev["time"], note=ev["note"], duration=ev["duration"])
+            for ev in editor.export_events()
+        ]
+
+    def _on_editor_notes_changed(self: "MainWindow", *_args):
+        """Follow mode: recompile only the edited bars and splice them into the running plan."""
+        editor = self.editor_window
+        if editor is None or not editor._follow_mode:
+            return
+        if self.thread is None or not self.thread.isRunning():
+            return
+        events = self._editor_note_events(editor)
+        if events:
+            self.thread.update_events(events)
+
+    def on_export_audio(self: "MainWindow"):
+        """Render the compiled performance to a WAV/FLAC file (offline, no audio device)."""
+        if not self.events:
+            QMessageBox.information(self, tr("no_midi", self.lang), tr("load_midi_first", self.lang))
+            return
+        if self._render_thread is not None and self._render_thread.isRunning():
+            return
+
+        events_to_use, cfg = self._collect_playback_input()
+        # Same seed as the last performance, so the file sounds like what was heard
+        if cfg.humanize_seed is None and self.thread is not None:
+            cfg.humanize_seed = self.thread.get_seed()
+        seed = cfg.humanize_seed if cfg.humanize_seed is not None else 0
+
+        default_path = os.path.splitext(self.mid_path or "untitled")[0] + ".wav"
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Audio", default_path, "WAV (*.wav);;FLAC (*.flac)"
+        )
+        if not path:
+            return
+
+        self.append_log(f"Rendering audio (seed={seed})...")
+        self._render_thread = RenderThread(events_to_use, cfg, seed, path)
+        self._render_thread.log.connect(self.append_log)
+        self._render_thread.start()
 
     def on_toggle_play_pause(self: "MainWindow"):
         """Toggle between play/pause states (for F5 hotkey).
 
         Behavior:
         - Not playing -> start playback
+        - Start countdown running -> skip countdown
         - Playing -> request pause (at bar end)
         - Pause pending -> cancel pause request
         - Paused -> resume playback
@@ -107,7 +179,10 @@ class PlaybackMixin:
             self.on_start()
         else:
             # Playing -> toggle pause state
-            if self.thread.is_paused():
+            if self.thread.is_counting_down():
+                # Start countdown -> begin playing now
+                self.thread.skip_countdown()
+            elif self.thread.is_paused():
                 # Currently paused -> resume
                 self.on_pause()
                 if self.floating_controller:
@@ -154,6 +229,10 @@ class PlaybackMixin:
 
     def on_finished(self: "MainWindow"):
         """Called when playback finishes."""
+        if self._playhead is not None:
+            self._playhead.stop()
+        if self.diagnostics_window is not None and self.thread is not None:
+            self.diagnostics_window.set_stall_snapshots(self.thread.stall_snapshots)
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
         # Reset progress tracking
@@ -233,9 +312,162 @@ class PlaybackMixin:
         self.append_log(f"Speed: {new_val:.2f}x")
 
     def _on_speed_changed(self: "MainWindow", value: float):
-        """Sync floating controller speed display."""
+        """Sync floating controller speed display; apply the speed live while playing."""
         if self.floating_controller:
             self.floating_controller.sync_speed(value)
+        # Strict mode plays at 1.0x regardless of the speed setting
+        if self.thread is not None and self.thread.isRunning() and not self.thread.cfg.strict_mode:
+            self.thread.set_speed(float(value))
+
+    def _on_octave_changed(self: "MainWindow", _index: int):
+        """Apply the octave shift live while playing (hotkeys F9/F10 or the combo box)."""
+        if self.thread is not None and self.thread.isRunning():
+            self.thread.set_octave_shift(int(self.cmb_octave.currentData()))
+        if self._midi_in is not None:
+            self._midi_in[1].set_octave(int(self.cmb_octave.currentData()))
+
+    def _on_loop_changed(self: "MainWindow", *_args):
+        """Apply the A-B loop settings live while playing."""
+        if self.thread is None or not self.thread.isRunning():
+            return
+        if self.chk_loop.isChecked():
+            speedup = 0.0 if self.thread.cfg.strict_mode else float(self.sp_loop_speedup.value())
+            self.thread.set_loop(self.sp_loop_start.value() - 1, self.sp_loop_end.value() - 1, speedup)
+        else:
+            self.thread.clear_loop()
+
+    def on_playlist_add(self: "MainWindow"):
+        """Append MIDI files to the playlist (played after the loaded song)."""
+        settings = QSettings("LyreAutoPlayer", "LyreAutoPlayer")
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Select MIDI files", settings.value(SETTINGS_MIDI_DIR, ""), "MIDI Files (*.mid *.midi)"
+        )
+        if not paths:
+            return
+        settings.setValue(SETTINGS_MIDI_DIR, os.path.dirname(paths[0]))
+        self._set_playlist(self.playlist + paths)
+        self.save_settings()
+
+    def on_playlist_clear(self: "MainWindow"):
+        self._set_playlist([])
+        self.save_settings()
+
+    def _set_playlist(self: "MainWindow", paths: list):
+        self.playlist = list(paths)
+        self.lbl_playlist_count.setText(tr("playlist_count", self.lang).format(count=len(self.playlist)))
+        self.lbl_playlist_count.setToolTip("\n".join(os.path.basename(p) for p in self.playlist))
+
+    def _on_song_changed(self: "MainWindow", index: int, path: str):
+        """Playlist: the next song started; the editor keeps the first song, so it stops following."""
+        self.lbl_file.setText(f"{path}  ({index}/{len(self.thread.cfg.playlist)})")
+        editor = getattr(self, 'editor_window', None)
+        if editor is not None and editor._follow_mode:
+            try:
+                self._playhead.position_changed.disconnect(editor.on_external_progress)
+            except TypeError:
+                pass
+            editor.on_external_stopped()
+
+    def _on_lan_sync_changed(self: "MainWindow", _index: int = 0):
+        """Open the leader socket / start the follower thread for the selected LAN sync mode."""
+        self._stop_lan_sync()
+        mode = self.cmb_lan_sync.currentData()
+        try:
+            if mode == "leader":
+                self._lan_sync = SyncLeader(DEFAULT_PORT, log_fn=self.sig_log.emit)
+                self._lan_sync.start()
+            elif mode == "follow":
+                host, _, port = self.txt_lan_leader.text().strip().partition(":")
+                if not host:
+                    self.append_log("[Sync] Enter the leader's address first")
+                    self.cmb_lan_sync.setCurrentIndex(0)
+                    return
+                self._lan_sync = SyncFollower(host, int(port or DEFAULT_PORT), log_fn=self.sig_log.emit)
+                threading.Thread(target=self._lan_follow, args=(self._lan_sync,), daemon=True, name="SyncFollower").start()
+                self.append_log(f"[Sync] Following {host}:{port or DEFAULT_PORT}")
+        except (OSError, ValueError) as e:
+            self.append_log(f"[Sync] {e}")
+            self._lan_sync = None
+            self.cmb_lan_sync.setCurrentIndex(0)
+
+    def _lan_follow(self: "MainWindow", follower: SyncFollower):
+        """Follower thread: re-sync until the leader announces a start, then start on the GUI thread."""
+        while True:
+            start_at = follower.wait_for_start()
+            if start_at is None:
+                break
+            self.sig_lan_start.emit(start_at)
+        follower.close()
+
+    def _on_lan_start(self: "MainWindow", start_at: float):
+        if self.thread and self.thread.isRunning():
+            self.append_log("[Sync] Start received while playing: ignored")
+            return
+        self._lan_start_at = start_at
+        self.on_start()
+        self._lan_start_at = None
+
+    def _apply_lan_sync(self: "MainWindow", cfg):
+        """Follower: use the received start; leader: announce a start one countdown ahead."""
+        if self._lan_start_at is not None:
+            cfg.sync_start_at = self._lan_start_at
+        elif isinstance(self._lan_sync, SyncLeader):
+            lead_s = max(1.0, float(cfg.countdown_sec))
+            cfg.sync_start_at = self._lan_sync.announce_start(lead_s, os.path.basename(self.mid_path or ""))
+            for peer in self._lan_sync.peers():
+                self.append_log(f"[Sync]   {peer.describe()}")
+
+    def _stop_lan_sync(self: "MainWindow"):
+        if isinstance(self._lan_sync, SyncLeader):
+            self._lan_sync.stop()
+        elif isinstance(self._lan_sync, SyncFollower):
+            self._lan_sync.cancel()  # The follower thread closes its socket
+        self._lan_sync = None
+
+    def _refresh_midi_inputs(self: "MainWindow"):
+        if self._midi_in is not None:
+            return  # Keep the connected port selected
+        self.cmb_midi_in.clear()
+        names = list_midi_inputs()
+        for name in names:
+            self.cmb_midi_in.addItem(name, name)
+        if not names:
+            self.cmb_midi_in.addItem(tr("midi_in_none", self.lang), None)
+        self.btn_midi_in.setEnabled(bool(names))
+
+    def _on_midi_in_toggled(self: "MainWindow", checked: bool):
+        """Connect the MIDI keyboard: notes are injected live with the current layout and octave."""
+        if not checked:
+            self._disconnect_midi_in()
+            return
+        name = self.cmb_midi_in.currentData()
+        if not name:
+            self.btn_midi_in.setChecked(False)
+            return
+        cfg = self.collect_cfg()
+        manager = create_input_manager(backend=cfg.input_backend, target_hwnd=cfg.target_hwnd)
+        passthrough = MidiPassthrough(cfg, manager, log_fn=self.sig_log.emit)
+        try:
+            port = open_midi_input(name, passthrough.on_message)
+        except Exception as e:
+            manager.stop()
+            self.append_log(f"[MIDI in] {name}: {e}")
+            self.btn_midi_in.setChecked(False)
+            return
+        self._midi_in = (port, passthrough, manager)
+        self.cmb_midi_in.setEnabled(False)
+        self.append_log(f"[MIDI in] {name} connected ({cfg.keyboard_preset}, octave {cfg.octave_shift:+d})")
+
+    def _disconnect_midi_in(self: "MainWindow"):
+        if self._midi_in is None:
+            return
+        port, passthrough, manager = self._midi_in
+        self._midi_in = None
+        port.close()
+        passthrough.close()  # Releases held keys, logs the latency summary
+        manager.stop()
+        self.cmb_midi_in.setEnabled(True)
+        self.btn_midi_in.setChecked(False)
 
     def _on_octave_range_mode_changed(self: "MainWindow", state: int):
         """Sync octave range mode and enable/disable inputs."""
@@ -142,6 +142,17 @@ class SettingsPresetMixin:
             "speed": self.sp_speed.value(),
             "press_ms": self.sp_press.value(),
             "countdown_sec": self.sp_countdown.value(),
+            "ab_loop": {
+                "enabled": self.chk_loop.isChecked(),
+                "start_bar": self.sp_loop_start.value(),
+                "end_bar": self.sp_loop_end.value(),
+                "speedup_pct": self.sp_loop_speedup.value(),
+            },
+            "playlist": {
+                "paths": list(self.playlist),
+                "gap_s": self.sp_playlist_gap.value(),
+            },
+            "lan_sync_leader": self.txt_lan_leader.text().strip(),
             "keyboard_preset": self.cmb_preset.currentData(),
             "use_midi_duration": self.chk_midi_duration.isChecked(),
             "play_sound": self.chk_sound.isChecked(),
@@ -151,6 +162,8 @@ class SettingsPresetMixin:
             "soundfont_path": getattr(self, 'soundfont_path', '') or '',
             "last_midi_path": getattr(self, 'mid_path', '') or '',
             "input_manager": getattr(self, '_input_manager_params', {}),
+            "dispatch_process": getattr(self, '_dispatch_process', False),
+            "performance_mode": getattr(self, '_performance_mode', False),
             # Error config - feature removed from main GUI, use stored state
             "error_config": {
                 "enabled": getattr(self, '_error_enabled', False),
@@ -185,6 +198,10 @@ class SettingsPresetMixin:
                 "auto_resume_countdown": self.sp_auto_resume_countdown.value() if hasattr(self, 'sp_auto_resume_countdown') else 3,
                 "enable_late_drop": hasattr(self, 'chk_late_drop') and self.chk_late_drop.isChecked(),
                 "late_drop_ms": self.sp_late_drop_ms.value() if hasattr(self, 'sp_late_drop_ms') else 25.0,
+                "late_policy": self.cmb_late_policy.currentData() if hasattr(self, 'cmb_late_policy') else "drop",
+                "adaptive_late_drop": not hasattr(self, 'chk_late_adaptive') or self.chk_late_adaptive.isChecked(),
+                "speed_governor": hasattr(self, 'chk_speed_governor') and self.chk_speed_governor.isChecked(),
+                "governor_min_rate": self.sp_governor_min_rate.value() / 100.0 if hasattr(self, 'sp_governor_min_rate') else 0.8,
             },
         }
 
@@ -263,6 +280,11 @@ class SettingsPresetMixin:
         if "input_manager" in settings:
             self._input_manager_params = settings["input_manager"]
 
+        if "dispatch_process" in settings:
+            self._dispatch_process = bool(settings["dispatch_process"])
+        if "performance_mode" in settings:
+            self._performance_mode = bool(settings["performance_mode"])
+
         if "enable_diagnostics" in settings:
             self._enable_diagnostics = settings["enable_diagnostics"]
             if hasattr(self, 'chk_enable_diagnostics'):
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Playhead Follower - smooth playhead from the published playback clock.
+
+The dispatch thread never signals the UI about position. It publishes a
+ClockSnapshot on every state change (start, pause, resume, seek, stop), and
+a PlayheadFollower on the GUI thread interpolates it on a ~60 FPS timer.
+"""
+
+import time
+from typing import Callable, Optional
+
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from player.control import ClockSnapshot
+
+
+class PlayheadFollower(QObject):
+    """
+    GUI-thread timer that turns a ClockSnapshot source into playhead updates.
+
+    Signals:
+        position_changed(float, float): (current_time, total_duration),
+            emitted on the GUI thread only when the position moved
+
+    Usage:
+        follower = PlayheadFollower(thread.clock_snapshot, parent=self)
+        follower.position_changed.connect(editor.on_external_progress)
+        follower.start()
+    """
+    position_changed = pyqtSignal(float, float)
+
+    def __init__(self, source: Callable[[], ClockSnapshot], interval_ms: int = 16, parent=None):
+        super().__init__(parent)
+        self._source = source
+        self._last: Optional[float] = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(interval_ms)  # ~60 FPS
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = None
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_active(self) -> bool:
+        return self._timer.isActive()
+
+    def _tick(self):
+        snapshot = self._source()
+        pos = snapshot.position(time.perf_counter())
+        if snapshot.duration > 0:
+            pos = min(pos, snapshot.duration)
+        pos = max(0.0, pos)
+        if pos == self._last:
+            return
+        self._last = pos
+        self.position_changed.emit(pos, snapshot.duration)
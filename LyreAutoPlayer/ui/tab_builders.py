@@ -122,6 +122,72 @@ def build_main_tab(window: "MainWindow") -> QWidget:
     window.lbl_countdown = QLabel()
     form.addRow(window.lbl_countdown, window.sp_countdown)
 
+    # A-B loop practice: bars (1-based, inclusive) + speed-up per pass
+    loop_row = QHBoxLayout()
+    window.chk_loop = QCheckBox()
+    window.chk_loop.setChecked(False)
+    window.sp_loop_start = QSpinBox()
+    window.sp_loop_start.setRange(1, 9999)
+    window.sp_loop_start.setValue(1)
+    window.lbl_loop_to = QLabel("~")
+    window.sp_loop_end = QSpinBox()
+    window.sp_loop_end.setRange(1, 9999)
+    window.sp_loop_end.setValue(4)
+    window.sp_loop_speedup = QSpinBox()
+    window.sp_loop_speedup.setRange(0, 20)
+    window.sp_loop_speedup.setValue(0)
+    window.sp_loop_speedup.setPrefix("+")
+    window.sp_loop_speedup.setSuffix(" %")
+    loop_row.addWidget(window.chk_loop)
+    loop_row.addWidget(window.sp_loop_start)
+    loop_row.addWidget(window.lbl_loop_to)
+    loop_row.addWidget(window.sp_loop_end)
+    loop_row.addWidget(window.sp_loop_speedup)
+    loop_row.addStretch()
+    window.lbl_loop = QLabel()
+    form.addRow(window.lbl_loop, loop_row)
+
+    # Playlist: songs played after the loaded one (next song compiled in the background)
+    playlist_row = QHBoxLayout()
+    window.btn_playlist_add = QPushButton()
+    window.btn_playlist_clear = QPushButton()
+    window.lbl_playlist_count = QLabel()
+    window.sp_playlist_gap = QDoubleSpinBox()
+    window.sp_playlist_gap.setRange(0.0, 30.0)
+    window.sp_playlist_gap.setSingleStep(0.5)
+    window.sp_playlist_gap.setDecimals(1)
+    window.sp_playlist_gap.setValue(2.0)
+    window.sp_playlist_gap.setSuffix(" s")
+    playlist_row.addWidget(window.btn_playlist_add)
+    playlist_row.addWidget(window.btn_playlist_clear)
+    playlist_row.addWidget(window.lbl_playlist_count)
+    playlist_row.addWidget(window.sp_playlist_gap)
+    playlist_row.addStretch()
+    window.lbl_playlist = QLabel()
+    form.addRow(window.lbl_playlist, playlist_row)
+
+    # LAN sync: several PCs start the same song at the leader's epoch
+    lan_row = QHBoxLayout()
+    window.cmb_lan_sync = QComboBox()
+    for mode in ("off", "leader", "follow"):
+        window.cmb_lan_sync.addItem(mode, mode)  # Text set in apply_language
+    window.txt_lan_leader = QLineEdit()
+    window.txt_lan_leader.setPlaceholderText("192.168.1.10")
+    lan_row.addWidget(window.cmb_lan_sync)
+    lan_row.addWidget(window.txt_lan_leader, 1)
+    window.lbl_lan_sync = QLabel()
+    form.addRow(window.lbl_lan_sync, lan_row)
+
+    # MIDI keyboard pass-through (ports listed by refresh_windows)
+    midi_in_row = QHBoxLayout()
+    window.cmb_midi_in = QComboBox()
+    window.btn_midi_in = QPushButton()
+    window.btn_midi_in.setCheckable(True)
+    midi_in_row.addWidget(window.cmb_midi_in, 1)
+    midi_in_row.addWidget(window.btn_midi_in)
+    window.lbl_midi_in = QLabel()
+    form.addRow(window.lbl_midi_in, midi_in_row)
+
     # Target window selector
     win_row = QHBoxLayout()
     window.cmb_window = QComboBox()
@@ -220,11 +286,32 @@ def build_main_tab(window: "MainWindow") -> QWidget:
     window.sp_late_drop_ms.setSingleStep(5.0)
     window.sp_late_drop_ms.setSuffix(" ms")
     window.lbl_late_drop = QLabel()
+    window.cmb_late_policy = QComboBox()
+    for mode in ("drop", "compress", "melody"):
+        window.cmb_late_policy.addItem(mode, mode)  # Text set in apply_language
+    window.chk_late_adaptive = QCheckBox()
+    window.chk_late_adaptive.setChecked(True)  # Threshold from measured p99
     late_drop_row.addWidget(window.chk_late_drop)
     late_drop_row.addWidget(window.sp_late_drop_ms)
+    late_drop_row.addWidget(window.cmb_late_policy)
+    late_drop_row.addWidget(window.chk_late_adaptive)
     late_drop_row.addStretch()
     strict_form.addRow(window.lbl_late_drop, late_drop_row)
 
+    # Speed governor (slow down instead of dropping when dispatch falls behind)
+    governor_row = QHBoxLayout()
+    window.chk_speed_governor = QCheckBox()
+    window.chk_speed_governor.setChecked(False)
+    window.sp_governor_min_rate = QSpinBox()
+    window.sp_governor_min_rate.setRange(50, 100)
+    window.sp_governor_min_rate.setValue(80)
+    window.sp_governor_min_rate.setSuffix(" %")
+    window.lbl_speed_governor = QLabel()
+    governor_row.addWidget(window.chk_speed_governor)
+    governor_row.addWidget(window.sp_governor_min_rate)
+    governor_row.addStretch()
+    strict_form.addRow(window.lbl_speed_governor, governor_row)
+
     # Diagnostics toggle
     window.chk_enable_diagnostics = QCheckBox()
     window.chk_enable_diagnostics.setChecked(False)